@@ -25,11 +25,33 @@ PROXY_CONFIG = {
     "proxy_type": os.getenv("PROXY_TYPE", "http")
 }
 
+# Extra proxies for the pool, comma-separated URLs (scheme://[user:pass@]host:port)
+PROXY_URLS = [url.strip() for url in os.getenv("PROXY_URLS", "").split(",") if url.strip()]
+
+# Account registry shards this collector works through, comma-separated (empty = all)
+COLLECTOR_SHARDS = [int(s) for s in os.getenv("COLLECTOR_SHARDS", "").split(",") if s.strip()] or None
+
+# Logging: LOG_LEVELS sets per-module levels, e.g. "src.collectors.twitter.timeline=DEBUG,tweety=WARNING"
+LOGGING = {
+    "level": os.getenv("LOG_LEVEL", "INFO").upper(),
+    "fmt": os.getenv("LOG_FORMAT", "text"),  # "text" or "json"
+    "levels": dict(
+        (name.strip(), level.strip().upper())
+        for name, _, level in (item.partition("=") for item in os.getenv("LOG_LEVELS", "").split(","))
+        if name.strip() and level.strip()
+    ),
+    "sample_rate": float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # Share of per-tweet DEBUG lines kept
+}
+
+# Span tracing of workflow steps, API calls and DB batches to data/traces (Chrome trace format)
+TRACING = os.getenv("TRACING", "true").lower() == "true"
+
 # Define available workflows
 WORKFLOWS = {
     "timeline": "src.collectors.twitter.workflows.timeline_focused.timeline_focused",
     "engagement": "src.collectors.twitter.workflows.engagement_focused.engagement_focused",
-    "complete": "src.collectors.twitter.workflows.complete_workflow.complete_workflow"
+    "complete": "src.collectors.twitter.workflows.complete_workflow.complete_workflow",
+    "adaptive": "src.collectors.twitter.workflows.adaptive_workflow.adaptive_workflow"
 }
 
 # Update SCRAPERS to include workflow settings
@@ -38,7 +60,10 @@ SCRAPERS = {
         "username": USER,
         "password": PASSWORD,
         "proxy": PROXY_CONFIG if all([PROXY_CONFIG["host"], PROXY_CONFIG["port"]]) else None,
+        "proxies": PROXY_URLS,
         "verify": os.getenv("VERIFY_SSL", "true").lower() == "true",
-        "workflow": WORKFLOW
+        "workflow": WORKFLOW,
+        "max_accounts": MAX_ACCOUNTS,
+        "shards": COLLECTOR_SHARDS
     }
 }
\ No newline at end of file
@@ -0,0 +1,19 @@
+#!/bin/sh
+# Runs the collector and the API. As PID 1, sh neither handles nor forwards
+# docker stop's SIGTERM by itself, so pass it on to both and wait for them
+# to exit, giving the collector time to checkpoint.
+
+stopping=
+trap 'stopping=1; kill -TERM "$collector" "$api" 2>/dev/null' TERM INT
+
+python -u main.py &
+collector=$!
+uvicorn src.api.main:app --host 0.0.0.0 --port 8000 &
+api=$!
+
+# Returns when the API exits or a trapped signal arrives
+wait "$api"
+# The API stopped by itself: stop the collector with it
+[ -z "$stopping" ] && kill -TERM "$collector" 2>/dev/null
+wait "$collector"
+wait "$api"
@@ -1,10 +1,15 @@
+import logging
 import asyncio
 import importlib
+import signal
 from src.collectors.twitter.collector import TwitterCollector
 from src.utils.logging import setup_logging
+from src.utils.tracing import configure_tracing
 from src.database.db import init_db
 import config
 
+logger = logging.getLogger(__name__)
+
 # Global dict to store collector instances
 collectors = {}
 
@@ -27,18 +32,25 @@ async def create_collector(collector_id: str, scraper_config: dict):
     return collector
 
 async def main():
-    setup_logging()
+    setup_logging(**config.LOGGING)
     init_db()
     
     # Create single collector instance
     scraper_id, scraper_config = next(iter(config.SCRAPERS.items()))
+    configure_tracing(scraper_id, config.TRACING)
     collector = await create_collector(scraper_id, scraper_config)
     
     # Store collector for API use
     collectors[scraper_id] = collector
     
+    # Stop cleanly on SIGTERM (docker stop) so the collector checkpoints its state
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    
     # Run collector workflow
-    await collector.collect_data()
+    try:
+        await collector.collect_data()
+    except asyncio.CancelledError:
+        logger.info(f"[{scraper_id}] Collector stopped")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,14 +1,35 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from datetime import datetime, timedelta
 import sqlite3
 from typing import List, Optional, Dict
 from pydantic import BaseModel
-from src.database.db import DB_PATH
+from src.database.db import connect
 from src.collectors.twitter.collector import TwitterCollector
 import config
 from src.utils.logging import setup_logging
 from src.database.db import init_db
+from src.database.graph import FollowingGraph
+from src.database.accounts import AccountRegistry, parse_accounts
+from src.database.partitions import TweetPartitions
+from src.database.export import ParquetExporter
+from src.database.changes import ChangeLog, ChangesExpired, CHANGE_BATCH_MAX
+from src.database.analytics import AnalyticsEngine, MAX_RESULT_ROWS
+from src.database.near_duplicates import NearDuplicateIndex
+from src.collectors.twitter.yield_tracking import YIELD_COLUMNS
+from src.collectors.twitter.metrics import METRICS_DIR
+from src.collectors.twitter.diagnostics import request_profile, stop_profile, profile_status
+from src.collectors.twitter.constants import PROFILE_MAX_SECONDS, TREND_TOP_K
+from src.collectors.twitter.trends import read_trends
+from src.utils.metrics import REGISTRY, render, read_snapshots
+from src.database.querystats import QUERY_STATS, read_query_stats
+from src.utils.tracing import TRACE_DIR
+import asyncio
+import csv
 import json
+import threading
+import io
+import tempfile
 
 # API Models
 class SearchMetrics(BaseModel):
@@ -17,9 +38,57 @@ class SearchMetrics(BaseModel):
     top_tweets: dict
     recent_tweets: dict
 
+class AnalyticsQuery(BaseModel):
+    sql: str
+    limit: int = 1000
+
+class AccountIn(BaseModel):
+    username: str
+    priority: Optional[int] = None
+    tags: Optional[List[str]] = None
+    shard: Optional[int] = None
+    state: Optional[str] = None
+
+    def row(self):
+        row = self.dict()
+        row["tags"] = ",".join(self.tags) if self.tags is not None else None
+        return row
+
 # Global collectors dict
 collectors: Dict[str, TwitterCollector] = {}
 
+# Following graph, loaded on first use; the /graph endpoints share it across threadpool workers
+following_graph: Optional[FollowingGraph] = None
+following_graph_lock = threading.Lock()
+
+def get_graph() -> FollowingGraph:
+    """Load the following graph and merge in any newly crawled edges"""
+    global following_graph
+    with following_graph_lock:
+        if following_graph is None:
+            following_graph = FollowingGraph()
+    following_graph.refresh()
+    return following_graph
+
+# Monthly tweet archives, written by the collector and routed to by time range
+tweet_partitions = TweetPartitions()
+
+# Columnar copy of the main tables, exported by the collector and queried with DuckDB
+analytics_engine = AnalyticsEngine()
+
+# Change data capture log, appended to by triggers on the collector's writes
+change_log = ChangeLog()
+
+# Near-duplicate clusters, assigned by the collector as tweets are stored
+near_duplicates = NearDuplicateIndex()
+
+# Tracked accounts, shared with the collector process through the database
+account_registry = AccountRegistry()
+
+def tracked_accounts():
+    """Active tracked accounts streamed from the registry, if there are any"""
+    return account_registry.usernames() if account_registry.count() else None
+
 # API Setup
 app = FastAPI(
     title="Twitter Data Collector API",
@@ -30,7 +99,7 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup_event():
     """Initialize collector on startup using existing config"""
-    setup_logging()
+    setup_logging(**config.LOGGING)
     init_db()
     
     # Use first scraper from config
@@ -52,7 +121,9 @@ async def startup_event():
     
     - **limit**: Maximum number of tweets to return
     - **offset**: Number of tweets to skip
-    - **hours**: Only return tweets from the last N hours
+    - **hours**: Only return tweets from the last N hours; only the monthly archives
+      this reaches are opened. Without it, or when it reaches more archives than can
+      be opened at once, archives are read newest first until the page is filled
     - **username**: Filter tweets by author username
     - **min_likes**: Minimum number of likes
     """
@@ -64,34 +135,114 @@ async def get_tweets(
     username: Optional[str] = None,
     min_likes: Optional[int] = None
 ):
+    since = (datetime.now() - timedelta(hours=hours)).isoformat() if hours else None
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            c = conn.cursor()
-            
-            query = "SELECT * FROM tweets WHERE 1=1"
-            params = []
-            
-            if hours:
-                query += " AND created_at > ?"
-                params.append((datetime.now() - timedelta(hours=hours)).isoformat())
+        tweets = []
+        skip = offset
+        # Ranges are disjoint and newest first, so pages fill in created_at order
+        for range_since, range_until in tweet_partitions.ranges(since=since):
+            with tweet_partitions.connect(since=range_since, until=range_until) as conn:
+                conn.row_factory = sqlite3.Row
+                c = conn.cursor()
                 
-            if username:
-                query += " AND author_username = ?"
-                params.append(username)
+                query = "SELECT * FROM tweets_all WHERE 1=1"
+                params = []
                 
-            if min_likes:
-                query += " AND likes >= ?"
-                params.append(min_likes)
+                if since:
+                    query += " AND created_at > ?"
+                    params.append(since)
                 
-            query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-            
-            c.execute(query, params)
-            return [dict(row) for row in c.fetchall()]
+                if range_since and range_since != since:
+                    query += " AND created_at >= ?"
+                    params.append(range_since)
+                
+                if range_until:
+                    query += " AND created_at < ?"
+                    params.append(range_until)
+                    
+                if username:
+                    query += " AND author_username = ?"
+                    params.append(username)
+                    
+                if min_likes:
+                    query += " AND likes >= ?"
+                    params.append(min_likes)
+                    
+                query += " ORDER BY created_at DESC LIMIT ?"
+                params.append(skip + limit - len(tweets))
+                
+                c.execute(query, params)
+                rows = c.fetchall()
+            tweets.extend(dict(row) for row in rows[skip:])
+            skip = max(0, skip - len(rows))
+            if len(tweets) >= limit:
+                break
+        return tweets
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/tweets/partitions",
+    summary="Tweet storage partitions",
+    description="Rows in the hot table and each monthly archive, with archive paths and sizes"
+)
+async def partition_stats():
+    return tweet_partitions.stats()
+
+@app.get("/tweets/{tweet_id}/engagement",
+    summary="Engagement curve of a tweet",
+    description="""
+    Likes, retweets, views, bookmarks, replies and quotes of a tweet at each
+    time its counts were seen to change, oldest first from when it was first
+    collected, with its re-poll state.
+    Points are rebuilt from the current counts and the logged deltas.
+    """
+)
+async def tweet_engagement(tweet_id: str):
+    with connect(readonly=True) as conn:
+        c = conn.cursor()
+        c.execute("""SELECT collected_at, likes, retweets, views, bookmark_count, reply_counts, quote_counts
+                     FROM tweets WHERE id = ?""", (tweet_id,))
+        row = c.fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Tweet {tweet_id} not found")
+        c.execute("""SELECT observed_at, likes, retweets, views, bookmarks, replies, quotes
+                     FROM engagement_snapshots WHERE tweet_id = ? ORDER BY observed_at DESC""", (tweet_id,))
+        snapshots = c.fetchall()
+        c.execute("""SELECT state, polls, interval, next_poll_at, velocity
+                     FROM engagement_repolls WHERE tweet_id = ?""", (tweet_id,))
+        repoll = c.fetchone()
+
+    fields = ("likes", "retweets", "views", "bookmarks", "replies", "quotes")
+    collected_at, *current = row
+    counts = [value or 0 for value in current]
+    curve = []
+    for observed_at, *deltas in snapshots:
+        curve.append({"observed_at": datetime.fromtimestamp(observed_at).isoformat(), **dict(zip(fields, counts))})
+        counts = [count - delta for count, delta in zip(counts, deltas)]
+    # What remains is the first sighting
+    curve.append({"observed_at": collected_at, **dict(zip(fields, counts))})
+    return {
+        "tweet_id": tweet_id,
+        "current": dict(zip(fields, (value or 0 for value in current))),
+        "curve": curve[::-1],
+        "repoll": dict(zip(("state", "polls", "interval", "next_poll_at", "velocity"), repoll)) if repoll else None
+    }
+
+@app.get("/clusters/{cluster_id}",
+    summary="Near-duplicate cluster",
+    description="""
+    A cluster of near-duplicate tweets with its size, spam score and most
+    recently collected members. A cluster is named after its first tweet.
+
+    - **limit**: Maximum number of members to return
+    """
+)
+async def get_cluster(cluster_id: str, limit: int = Query(100, ge=1, le=1000)):
+    cluster = near_duplicates.cluster(cluster_id, limit)
+    if cluster is None:
+        raise HTTPException(status_code=404, detail=f"Cluster {cluster_id} not found")
+    return cluster
+
 @app.get("/search", 
     response_model=SearchMetrics,
     summary="Search Twitter for metrics",
@@ -101,17 +252,19 @@ async def get_tweets(
     - **search_type**: Type of search (ticker, user, etc)
     - **term**: Search term (e.g. AAPL)
     - **collector_id**: Optional specific collector to use
+    - **exclude_spam**: Leave tweets in near-duplicate spam clusters out of the metrics
     """
 )
 async def search_metrics(
     search_type: str = Query(...),
     term: str = Query(...),
     collector_id: Optional[str] = Query(None),
-    force_refresh: bool = Query(False)
+    force_refresh: bool = Query(False),
+    exclude_spam: bool = Query(True)
 ):
     try:
         # Check if we searched this term recently
-        with sqlite3.connect(DB_PATH) as conn:
+        with connect(readonly=True) as conn:
             c = conn.cursor()
             c.execute("""
                 SELECT metrics, last_searched_at 
@@ -126,14 +279,16 @@ async def search_metrics(
             cached = c.fetchone()
             
             if cached and not force_refresh:
-                return json.loads(cached[0])
+                results = json.loads(cached[0])
+                if results.get("metadata", {}).get("exclude_spam", True) == exclude_spam:
+                    return results
         
         # If no recent search or force refresh, get new data
         collector = collectors.get(collector_id) or next(iter(collectors.values()))
-        results = await collector.search_term(search_type, term)
+        results = await collector.search_term(search_type, term, exclude_spam=exclude_spam)
         
         # Update search cache
-        with sqlite3.connect(DB_PATH) as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute("""
                 INSERT OR REPLACE INTO search_cache 
@@ -158,8 +313,481 @@ async def search_metrics(
 )
 async def health_check():
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with connect(readonly=True) as conn:
             conn.cursor().execute("SELECT 1")
-        return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+        return {
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "circuits": {cid: collector.circuit_breakers.status() for cid, collector in collectors.items()}
+        }
     except Exception as e:
-        raise HTTPException(status_code=503, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/metrics",
+    summary="Prometheus metrics",
+    description="Metrics of this API process and the collector processes, in the Prometheus text format",
+    response_class=PlainTextResponse
+)
+def prometheus_metrics():
+    sources = {"api": REGISTRY.snapshot(), **read_snapshots(METRICS_DIR)}
+    return PlainTextResponse(render(sources), media_type="text/plain; version=0.0.4")
+
+@app.get("/db/queries",
+    summary="Query statistics",
+    description="""
+    Top statements by normalized text for this API process and each collector:
+    calls, total/mean/max latency, rows, VM steps (which grow with rows visited),
+    slow executions and the EXPLAIN QUERY PLAN. `full_scan` marks statements
+    whose plan scans a whole table or index, i.e. candidates for a missing index.
+    """
+)
+async def query_stats(
+    limit: int = Query(20, ge=1, le=500),
+    sort: str = Query("total_ms", regex="^(total_ms|mean_ms|max_ms|calls|rows|vm_steps|slow)$")
+):
+    processes = {"api": QUERY_STATS.summary(limit=None), **read_query_stats()}
+    for process, entries in processes.items():
+        processes[process] = sorted(entries, key=lambda entry: entry[sort], reverse=True)[:limit]
+    return processes
+
+@app.get("/trends",
+    summary="Trending hashtags, cashtags and mentions",
+    description="""
+    Terms most used in the last few minutes of collected tweets, per collector,
+    highest z-score first. `count` covers one sliding window; `baseline` is the
+    term's usual count per window and `z` how many deviations above it the
+    count is. `bursting` marks terms that raised a trend event recently.
+    `warm` is false until a collector has observed enough windows to score.
+
+    - **kind**: Only return hashtags, cashtags or mentions
+    - **limit**: Maximum number of terms per kind
+    """
+)
+async def get_trends(
+    kind: Optional[str] = Query(None, regex="^(hashtag|cashtag|mention)$"),
+    limit: int = Query(20, ge=1, le=TREND_TOP_K)
+):
+    collectors_trends = read_trends()
+    for data in collectors_trends.values():
+        data["kinds"] = {name: entries[:limit] for name, entries in data["kinds"].items()
+                         if kind is None or name == kind}
+    return collectors_trends
+
+@app.get("/trends/events",
+    summary="Trend events",
+    description="""
+    Terms detected bursting above their baseline, newest first. Also carried by
+    the change feed as `trend_events`.
+
+    - **hours**: Only return events from the last N hours
+    - **kind**: Only return hashtag, cashtag or mention events
+    - **limit**: Maximum number of events to return
+    """
+)
+async def trend_events(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    kind: Optional[str] = Query(None, regex="^(hashtag|cashtag|mention)$"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    query = "SELECT * FROM trend_events WHERE detected_at > ?"
+    params = [(datetime.now() - timedelta(hours=hours)).isoformat()]
+    if kind:
+        query += " AND kind = ?"
+        params.append(kind)
+    with connect(readonly=True) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(query + " ORDER BY detected_at DESC LIMIT ?", (*params, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+@app.get("/proxies",
+    summary="Proxy pool health",
+    description="Rolling latency, error rate and cooldown of each collector's proxies"
+)
+async def proxy_status():
+    return {
+        cid: collector.proxy_pool.status() if collector.proxy_pool else []
+        for cid, collector in collectors.items()
+    }
+
+def scraper_id(collector_id=None):
+    """The given collector, or the first configured one"""
+    if collector_id is None:
+        return next(iter(config.SCRAPERS))
+    if collector_id not in config.SCRAPERS:
+        raise HTTPException(status_code=404, detail="Unknown collector")
+    return collector_id
+
+@app.post("/debug/profile",
+    summary="Start profiling the collector",
+    description="Sample the running collector's stack for `seconds`; fetch the result from /debug/profile/{profile_id}"
+)
+async def start_profile(
+    seconds: float = Query(30, gt=0, le=PROFILE_MAX_SECONDS),
+    collector_id: Optional[str] = None
+):
+    collector_id = scraper_id(collector_id)
+    profile_id = request_profile(collector_id, seconds)
+    return {"profile_id": profile_id, "collector_id": collector_id, "seconds": seconds}
+
+@app.post("/debug/profile/{profile_id}/stop",
+    summary="Stop a running profile",
+    description="End sampling early and return the profile collected so far as folded stacks",
+    response_class=PlainTextResponse
+)
+async def end_profile(profile_id: str, collector_id: Optional[str] = None):
+    collector_id = scraper_id(collector_id)
+    if profile_status(collector_id, profile_id)[0] is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    stop_profile(collector_id, profile_id)
+    # The collector picks up the stop file within a second
+    for _ in range(10):
+        status, folded = profile_status(collector_id, profile_id)
+        if status == "done":
+            return PlainTextResponse(folded)
+        await asyncio.sleep(0.5)
+    raise HTTPException(status_code=504, detail="Collector did not finish the profile")
+
+@app.get("/debug/profile/{profile_id}",
+    summary="Get a profile",
+    description="""
+    Folded stacks ("outer;inner;leaf count" per line) once the profile is done,
+    ready for flamegraph.pl, speedscope or inferno. Returns 202 with the status
+    while the profile is pending or running.
+    """,
+    response_class=PlainTextResponse
+)
+async def get_profile(profile_id: str, collector_id: Optional[str] = None):
+    status, folded = profile_status(scraper_id(collector_id), profile_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    if status != "done":
+        return PlainTextResponse(status, status_code=202)
+    return PlainTextResponse(folded)
+
+@app.get("/debug/trace",
+    summary="Get a span trace",
+    description="A collector's spans for one day in the Chrome trace format, for chrome://tracing or Perfetto"
+)
+async def get_trace(
+    collector_id: Optional[str] = None,
+    day: Optional[str] = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$")
+):
+    path = TRACE_DIR / f"{scraper_id(collector_id)}_{day or datetime.now().strftime('%Y-%m-%d')}.json"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="No trace for that day")
+    # The file is appended to as spans are flushed, so close the array here
+    events = path.read_text().rstrip().rstrip(",")
+    return PlainTextResponse(events + "\n]\n", media_type="application/json")
+
+@app.post("/analytics/query",
+    summary="Run an analytics query",
+    description="""
+    Run one SELECT against the Parquet export with DuckDB. Views are named after
+    the exported tables (`tweets`, `token_mentions`, `tweet_hashtags`,
+    `account_followings`, `tweet_engagements`) and have a `month` column
+    ('YYYY-MM') that skips the files of other months. Data lags the database
+    by up to an hour. `tweets`, `token_mentions` and `account_followings` show
+    the latest exported version of each row; other rows rewritten since they
+    were exported appear once per version.
+    """
+)
+def analytics_query(query: AnalyticsQuery):
+    if not analytics_engine.available:
+        raise HTTPException(status_code=503, detail="DuckDB is not installed (install the 'analytics' extra)")
+    try:
+        return analytics_engine.query(query.sql, limit=min(query.limit, MAX_RESULT_ROWS))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/analytics/export",
+    summary="Parquet export progress",
+    description="Rowid and change log watermarks, rows exported and last run of each exported table"
+)
+async def export_status():
+    return ParquetExporter().watermarks()
+
+@app.get("/changes",
+    summary="Read the change feed",
+    description="""
+    Inserts and updates of tweets, tweet_mentions, token_mentions and
+    account_followings in the order they were committed, each with its key and
+    row values after the change. A tweet's `cluster_id` and `spam_score` are
+    set after it is stored, and changes to them alone add no entry, so they
+    are as of the tweet's latest entry.
+
+    - **after**: Return changes with a higher sequence number; defaults to the
+      consumer's committed offset, or the start of the log
+    - **consumer**: Consumer name whose offset is used when `after` is omitted
+    - **tables**: Comma-separated tables to include
+    - **limit**: Maximum number of changes to return
+
+    Pass `next` as `after` for the following batch, and acknowledge it with
+    POST /changes/consumers/{consumer}/ack once applied. Returns 410 when
+    `after` is older than the retained log.
+    """
+)
+async def read_changes(
+    after: Optional[int] = Query(None, ge=0),
+    consumer: Optional[str] = None,
+    tables: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=CHANGE_BATCH_MAX)
+):
+    if after is None:
+        after = (change_log.offset(consumer) if consumer else None) or 0
+    table_list = [t.strip() for t in tables.split(",") if t.strip()] if tables else None
+    try:
+        return change_log.read(after, limit=limit, tables=table_list)
+    except ChangesExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/changes/consumers/{consumer}/ack",
+    summary="Commit a consumer offset",
+    description="Record that the consumer has applied every change up to `seq`; offsets never move back"
+)
+async def ack_changes(consumer: str, seq: int = Query(..., ge=0)):
+    change_log.ack(consumer, seq)
+    return {"consumer": consumer, "last_seq": change_log.offset(consumer)}
+
+@app.get("/changes/consumers",
+    summary="List change feed consumers",
+    description="Committed offset of each consumer and the latest sequence number"
+)
+async def change_consumers():
+    return {"head": change_log.head(), "consumers": change_log.consumers()}
+
+@app.get("/accounts",
+    summary="List tracked accounts",
+    description="""
+    Page through the account registry in username order.
+    
+    - **after**: Last username of the previous page
+    - **state**: Only accounts in this state (active or paused)
+    - **tag**: Only accounts with this tag
+    - **shard**: Only accounts in this shard
+    """
+)
+def list_accounts(
+    after: Optional[str] = None,
+    limit: int = Query(100, le=1000),
+    state: Optional[str] = None,
+    tag: Optional[str] = None,
+    shard: Optional[int] = None
+):
+    try:
+        accounts = account_registry.list(after=after, limit=limit, state=state, tag=tag, shard=shard)
+        return {
+            "accounts": accounts,
+            "next": accounts[-1]["username"] if len(accounts) == limit else None
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/accounts/stats",
+    summary="Tracked account counts",
+    description="Accounts per state and how many are due for a fetch"
+)
+def account_stats():
+    try:
+        return account_registry.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/accounts/{username}",
+    summary="Get a tracked account"
+)
+def get_account(username: str):
+    account = account_registry.get(username)
+    if not account:
+        raise HTTPException(status_code=404, detail=f"{username} is not tracked")
+    return account
+
+@app.post("/accounts",
+    summary="Add or update tracked accounts",
+    description="Accounts are picked up by the collector on its next batch, without a restart"
+)
+def add_accounts(accounts: List[AccountIn]):
+    try:
+        return {"written": account_registry.add((account.row() for account in accounts), source="api")}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/accounts/import",
+    summary="Bulk import tracked accounts",
+    description="""
+    Import a text (one username per line) or CSV (header with username and
+    optionally priority, tags, shard, state) request body. The body is
+    spooled to disk and parsed as a stream, so large files use little memory.
+    A body that isn't UTF-8 or valid CSV is rejected with 400.
+    """
+)
+async def import_accounts(request: Request):
+    def import_spool(spool):
+        lines = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        try:
+            return account_registry.add(parse_accounts(lines), source="import")
+        finally:
+            lines.detach()
+
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            async for chunk in request.stream():
+                spool.write(chunk)
+            spool.seek(0)
+            # Parsing and the bulk insert are blocking, so they run off the event loop
+            written = await asyncio.to_thread(import_spool, spool)
+        return {"written": written}
+    except (ValueError, csv.Error) as e:
+        # Not UTF-8 (UnicodeDecodeError is a ValueError), a bad number, or broken CSV quoting;
+        # chunks before the bad row are already imported
+        raise HTTPException(status_code=400, detail=f"Malformed accounts file: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/accounts/{username}",
+    summary="Stop tracking an account"
+)
+def remove_account(username: str):
+    if not account_registry.remove([username]):
+        raise HTTPException(status_code=404, detail=f"{username} is not tracked")
+    return {"removed": username}
+
+@app.get("/graph/stats",
+    summary="Following graph size",
+    description="Number of accounts and follow edges in the following graph"
+)
+def graph_stats():
+    try:
+        return get_graph().stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/graph/in-degree",
+    summary="Most followed accounts",
+    description="""
+    Rank accounts by how many tracked accounts follow them.
+    
+    - **limit**: Maximum number of accounts to return
+    """
+)
+def graph_in_degree(limit: int = Query(50, le=1000)):
+    try:
+        return get_graph().in_degree(tracked=tracked_accounts(), limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/graph/jaccard",
+    summary="Co-following overlap",
+    description="""
+    Jaccard overlap between the followings of two accounts.
+    
+    - **a**: First account username
+    - **b**: Second account username
+    """
+)
+def graph_jaccard(a: str = Query(...), b: str = Query(...)):
+    try:
+        return get_graph().jaccard(a, b)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/graph/similar",
+    summary="Accounts with similar followings",
+    description="""
+    Accounts whose followings overlap most with the given account.
+    
+    - **username**: Account to compare against
+    - **limit**: Maximum number of accounts to return
+    """
+)
+def graph_similar(username: str = Query(...), limit: int = Query(20, le=500)):
+    try:
+        return get_graph().similar(username, limit=limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/graph/reach",
+    summary="Two-hop reach",
+    description="""
+    Number of distinct accounts reachable from an account in one and two follow hops.
+    
+    - **username**: Account to start from
+    """
+)
+def graph_reach(username: str = Query(...)):
+    try:
+        return get_graph().reach(username)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/graph/pagerank",
+    summary="Top accounts by PageRank",
+    description="""
+    PageRank over the following graph, recomputed after new edges are merged.
+    
+    - **limit**: Maximum number of accounts to return
+    """
+)
+def graph_pagerank(limit: int = Query(50, le=1000)):
+    try:
+        return get_graph().pagerank(limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stats/yield",
+    summary="API call yield",
+    description="""
+    Rank endpoints, accounts and workflow steps by new rows written per API call and per second of call latency.
+    
+    - **hours**: Only include calls from the last N hours
+    - **limit**: Maximum number of entries per ranking
+    """
+)
+async def yield_stats(
+    hours: int = Query(24, le=24 * 90),
+    limit: int = Query(20, le=500)
+):
+    try:
+        # Include calls made by this process that haven't been flushed yet
+        for collector in collectors.values():
+            collector.yield_tracker.flush()
+        
+        since = (datetime.now() - timedelta(hours=hours)).strftime('%Y-%m-%dT%H:00')
+        new_rows = ' + '.join(f'SUM({column})' for column in YIELD_COLUMNS.values())
+        rankings = {}
+        
+        with connect(readonly=True) as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            for dimension in ("endpoint", "account", "step"):
+                c.execute(f"""
+                    SELECT {dimension} AS name,
+                           SUM(calls) AS calls,
+                           SUM(errors) AS errors,
+                           ROUND(SUM(latency), 2) AS latency_seconds,
+                           {new_rows} AS new_rows,
+                           ROUND(1.0 * ({new_rows}) / SUM(calls), 3) AS rows_per_call,
+                           ROUND(({new_rows}) / MAX(SUM(latency), 0.001), 3) AS rows_per_second
+                    FROM api_call_yield
+                    WHERE period >= ? AND {dimension} != ''
+                    GROUP BY {dimension}
+                    HAVING SUM(calls) > 0
+                    ORDER BY rows_per_call DESC
+                    LIMIT ?
+                """, (since, limit))
+                rankings[f"{dimension}s"] = [dict(row) for row in c.fetchall()]
+        
+        return rankings
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
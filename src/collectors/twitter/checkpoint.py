@@ -0,0 +1,123 @@
+import logging
+import gzip
+import json
+import os
+from datetime import datetime
+from time import time
+from src.database.db import DB_PATH
+from .constants import (
+    CHECKPOINT_INTERVAL,
+    CHECKPOINT_MAX_AGE
+)
+from .scheduler import ArmStats
+from .circuit_breaker import Circuit
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 2
+
+class Checkpoint:
+    """Snapshot of the collector's in-memory state in a small gzipped JSON file.
+
+    Saved every CHECKPOINT_INTERVAL seconds between workflow steps and on
+    shutdown, and restored by connect(), so a restart resumes the same step,
+    timeline interval, bandit arms, planner pacing, circuit backoffs and
+    proxy scores. Account rotation lives in tracked_accounts, following
+    cursors in following_crawl_state and token buckets in their own file.
+    Checkpoints older than CHECKPOINT_MAX_AGE are ignored.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.path = DB_PATH.parent / f"checkpoint_{collector.collector_id}.json.gz"
+        self.last_save = 0
+
+    def state(self):
+        collector = self.collector
+        proxy_pool = collector.proxy_pool
+        return {
+            "version": CHECKPOINT_VERSION,
+            "saved_at": time(),
+            "workflow": collector.workflow.name,
+            "current_step": collector.current_step,
+            "last_timeline_check": collector.timeline_manager.last_timeline_check,
+            "last_call_time": collector.rate_limiter.last_call_time.isoformat()
+                              if collector.rate_limiter.last_call_time else None,
+            "next_slot": collector.planner.next_slot,
+            "arms": {name: vars(arm) for name, arm in collector.scheduler.arms.items()},
+            "circuits": {name: vars(circuit) for name, circuit in collector.circuit_breakers.circuits.items()},
+            "step_failures": collector.circuit_breakers.step_failures,
+            "proxies": {url: vars(stats) for url, stats in proxy_pool.proxies.items()} if proxy_pool else {}
+        }
+
+    def save(self):
+        """Write the checkpoint atomically so a crash mid-write keeps the previous one"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with gzip.open(tmp_path, "wt") as f:
+                json.dump(self.state(), f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self.last_save = time()
+        except Exception as e:
+            logger.error(f"[{self.collector.collector_id}] Error saving checkpoint: {str(e)}")
+
+    def maybe_save(self):
+        if time() - self.last_save >= CHECKPOINT_INTERVAL:
+            self.save()
+
+    def load(self):
+        """The saved state, or None if missing, unreadable, stale or from another workflow"""
+        if not self.path.exists():
+            return None
+        try:
+            with gzip.open(self.path, "rt") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"[{self.collector.collector_id}] Ignoring unreadable checkpoint: {str(e)}")
+            return None
+
+        if state.get("version") != CHECKPOINT_VERSION or time() - state["saved_at"] > CHECKPOINT_MAX_AGE:
+            return None
+        if state.get("workflow") != self.collector.workflow.name:
+            return None
+        return state
+
+    def restore(self):
+        """Apply a saved checkpoint to the collector; returns whether one was applied.
+
+        Run in connect() before the session is opened, so the proxy chosen
+        reflects the restored scores.
+        """
+        state = self.load()
+        if not state:
+            return False
+
+        collector = self.collector
+        if state["current_step"] in collector.workflow.steps:
+            collector.current_step = state["current_step"]
+        collector.timeline_manager.last_timeline_check = state["last_timeline_check"]
+        if state["last_call_time"]:
+            collector.rate_limiter.last_call_time = datetime.fromisoformat(state["last_call_time"])
+        collector.planner.next_slot.update(state["next_slot"])
+
+        for name, values in state["arms"].items():
+            arm = ArmStats()
+            arm.__dict__.update(values)
+            collector.scheduler.arms[name] = arm
+        for name, values in state["circuits"].items():
+            circuit = Circuit()
+            circuit.__dict__.update(values)
+            collector.circuit_breakers.circuits[name] = circuit
+        collector.circuit_breakers.step_failures.update(state["step_failures"])
+
+        proxy_pool = collector.proxy_pool
+        if proxy_pool:
+            for url, values in state["proxies"].items():
+                if url in proxy_pool.proxies:
+                    proxy_pool.proxies[url].__dict__.update(values)
+
+        age = time() - state["saved_at"]
+        logger.info(f"[{collector.collector_id}] Restored checkpoint from {age:.0f}s ago: "
+                    f"resuming at step {collector.current_step}")
+        return True
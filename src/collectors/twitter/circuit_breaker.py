@@ -0,0 +1,146 @@
+import logging
+import asyncio
+import json
+import random
+import re
+from time import time
+from .constants import (
+    BREAKER_POLICIES,
+    STEP_BACKOFF_BASE,
+    STEP_BACKOFF_MAX
+)
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open"""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"Circuit open for {endpoint}, retry in {retry_in:.0f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+# An HTTP status quoted in an error message, as a whole number so tweet and user ids don't match
+STATUS_PATTERN = re.compile(r'\b(429|401|403|404|50[0-4])\b')
+
+def http_status(error):
+    """HTTP status of a failed call: from the exception or its response, else quoted in its message"""
+    for source in (error, getattr(error, 'response', None)):
+        for attr in ('status_code', 'status'):
+            status = getattr(source, attr, None)
+            if isinstance(status, int):
+                return status
+    match = STATUS_PATTERN.search(str(error))
+    return int(match.group(1)) if match else None
+
+def classify_error(error):
+    """Map an exception from a tweety call to rate_limit, auth, transient, not_found, parse or other"""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+
+    name = type(error).__name__.lower()
+    message = str(error).lower()
+    status = http_status(error)
+    if "ratelimit" in name or "rate limit" in message or status == 429:
+        return "rate_limit"
+    if any(word in name for word in ("credential", "actionrequired", "unauthorized", "suspended", "locked")) \
+            or status in (401, 403):
+        return "auth"
+    if any(word in name for word in ("notfound", "protected", "deleted", "unavailable")) or status == 404:
+        return "not_found"
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError)) \
+            or any(word in name for word in ("timeout", "connect", "network", "proxy", "remoteprotocol")) \
+            or (status is not None and 500 <= status <= 504):
+        return "transient"
+    if isinstance(error, (KeyError, IndexError, TypeError, AttributeError, ValueError, json.JSONDecodeError)):
+        return "parse"
+    return "other"
+
+def backoff_delay(base, level, cap):
+    """Exponential backoff with jitter: between half and all of base * 2^level, capped"""
+    delay = min(cap, base * 2 ** level)
+    return random.uniform(delay / 2, delay)
+
+class Circuit:
+    def __init__(self):
+        self.failures = 0
+        self.level = 0
+        self.open_until = 0.0
+        self.last_error = None
+
+class CircuitBreakers:
+    """One circuit per endpoint class, plus '*' for failures that affect every endpoint.
+
+    Each error class has a policy in BREAKER_POLICIES: how many consecutive
+    failures open the circuit, the base backoff, its cap, and whether it
+    applies to all endpoints (auth). Once the backoff has passed calls go
+    through again: a success resets the circuit, while `threshold` more
+    failures reopen it one level up.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.circuits = {}
+        self.step_failures = {}
+
+    def _circuit(self, name):
+        if name not in self.circuits:
+            self.circuits[name] = Circuit()
+        return self.circuits[name]
+
+    def check(self, endpoint):
+        """Raise CircuitOpenError if the endpoint, or everything, is sidelined"""
+        now = time()
+        for name in ("*", endpoint.split('/')[0]):
+            circuit = self.circuits.get(name)
+            if circuit and circuit.open_until > now:
+                raise CircuitOpenError(name, circuit.open_until - now)
+
+    def record_success(self, endpoint):
+        for name in ("*", endpoint.split('/')[0]):
+            circuit = self.circuits.get(name)
+            if circuit:
+                circuit.failures = 0
+                circuit.level = 0
+
+    def record_failure(self, endpoint, error):
+        """Count a failure and open the circuit when its policy says so"""
+        error_class = classify_error(error)
+        policy = BREAKER_POLICIES.get(error_class)
+        if not policy:
+            return error_class
+
+        threshold, base, cap, everything = policy
+        circuit = self._circuit("*" if everything else endpoint.split('/')[0])
+        circuit.failures += 1
+        circuit.last_error = error_class
+        if circuit.failures >= threshold:
+            delay = backoff_delay(base, circuit.level, cap)
+            circuit.open_until = time() + delay
+            circuit.level += 1
+            circuit.failures = 0
+            logger.warning(f"[{self.collector.collector_id}] {error_class} errors on "
+                           f"{'all endpoints' if everything else endpoint}, pausing it for {delay:.0f}s")
+        return error_class
+
+    def step_backoff(self, step_name):
+        """Sleep before retrying a workflow step that raised, growing with repeated failures"""
+        level = self.step_failures.get(step_name, 0)
+        self.step_failures[step_name] = level + 1
+        return backoff_delay(STEP_BACKOFF_BASE, level, STEP_BACKOFF_MAX)
+
+    def step_succeeded(self, step_name):
+        self.step_failures.pop(step_name, None)
+
+    def status(self):
+        now = time()
+        return {
+            name: {
+                "open": circuit.open_until > now,
+                "retry_in": round(max(0, circuit.open_until - now), 1),
+                "level": circuit.level,
+                "failures": circuit.failures,
+                "last_error": circuit.last_error
+            }
+            for name, circuit in self.circuits.items()
+        }
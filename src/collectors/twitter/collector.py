@@ -1,12 +1,17 @@
+import logging
 from datetime import datetime, timedelta
 import random
 import asyncio
 from tweety import TwitterAsync
 from tweety.exceptions import ActionRequired
 from typing import Optional
+from time import time, perf_counter
 from inspect import signature
 
 from src.collectors.base_collector import BaseCollector
+from src.database.accounts import AccountRegistry
+from src.database.near_duplicates import NearDuplicateIndex
+from src.database.maintenance import DatabaseMaintenance
 from .timeline import TimelineManager
 from .tweets import TweetManager
 from .following import FollowingManager
@@ -15,13 +20,29 @@ from .constants import (
     NIGHT_HOURS,
     NIGHT_CHECK_CHANCE,
     FOLLOWING_CHECK_CHANCE,
-    ACCOUNTS_PER_BATCH
+    ACCOUNTS_PER_BATCH,
+    FRONTIER_PROMOTIONS_PER_BATCH,
+    PROXY_PROBE_INTERVAL
 )
 from .workflow import Workflow, WorkflowStep
 from .engagement import EngagementManager
+from .repoll import RepollManager
+from .trends import TrendDetector
 from .mentions import MentionManager
 from .threads import ThreadManager
 from .search import SearchManager
+from .discovery import DiscoveryManager
+from .scheduler import BanditScheduler
+from .yield_tracking import YieldTracker
+from .planner import RateBudgetPlanner
+from .circuit_breaker import CircuitBreakers, classify_error
+from .profiles import ProfileManager
+from .proxies import ProxyPool, redact
+from .checkpoint import Checkpoint
+from . import metrics
+from src.utils.tracing import TRACER, span
+
+logger = logging.getLogger(__name__)
 
 class TwitterCollector(BaseCollector):
     def __init__(self, collector_id, config, workflow: Optional[Workflow] = None):
@@ -29,8 +50,8 @@ class TwitterCollector(BaseCollector):
         self.session_name = f"session_{collector_id}"
         self.accounts_file = f"accounts_{collector_id}.txt"
         self.app = None
-        self.current_batch_index = 0
-        self.all_accounts = []
+        self.account_registry = AccountRegistry(shards=config.get("shards"))
+        self.max_accounts = config.get("max_accounts", 1000)  # Cap on active accounts for frontier promotion
         self.proxy = None
         self.verify = config.get("verify", True)
         
@@ -40,12 +61,26 @@ class TwitterCollector(BaseCollector):
         self.tweet_manager = TweetManager(self)
         self.following_manager = FollowingManager(self)
         self.engagement_manager = EngagementManager(self)
+        self.repoll_manager = RepollManager(self)
+        self.trend_detector = TrendDetector(self)
+        self.near_duplicates = NearDuplicateIndex()
+        self.db_maintenance = DatabaseMaintenance()
         self.mention_manager = MentionManager(self)
         self.thread_manager = ThreadManager(self)
         self.search_manager = SearchManager(self)
+        self.discovery_manager = DiscoveryManager(self)
+        self.profile_manager = ProfileManager(self)
+        self.scheduler = BanditScheduler(self)
+        self.yield_tracker = YieldTracker(self)
+        self.circuit_breakers = CircuitBreakers(self)
+        self.proxy_pool = None  # Built in connect() once the proxy URLs are resolved
+        self.last_proxy_probe = 0
+        self.current_step = None
         
         # Load default workflow if none provided
         self.workflow = workflow or self.load_default_workflow()
+        self.planner = RateBudgetPlanner(self)
+        self.checkpoint = Checkpoint(self)
         
         # Override constants with workflow constants
         for key, value in self.workflow.constants.items():
@@ -57,7 +92,7 @@ class TwitterCollector(BaseCollector):
     def _setup_proxy(self, proxy_config):
         """Set up proxy configuration"""
         if not proxy_config:
-            print(f"[{self.collector_id}] No proxy configuration found")
+            logger.info(f"[{self.collector_id}] No proxy configuration found")
             return None
         
         try:
@@ -68,22 +103,22 @@ class TwitterCollector(BaseCollector):
             }
             
             proxy_type = proxy_types.get(proxy_config["proxy_type"], "http")
-            print(f"[{self.collector_id}] Using proxy type: {proxy_type}")
+            logger.debug(f"[{self.collector_id}] Using proxy type: {proxy_type}")
             
             proxy_str = f"{proxy_config['host']}:{proxy_config['port']}"
-            print(f"[{self.collector_id}] Base proxy string: {proxy_str}")
+            logger.debug(f"[{self.collector_id}] Base proxy string: {proxy_str}")
             
             if proxy_config.get("username"):
                 auth = f"{proxy_config['username']}:{proxy_config['password']}"
                 proxy_str = f"{auth}@{proxy_str}"
-                print(f"[{self.collector_id}] Added auth to proxy string")
+                logger.debug(f"[{self.collector_id}] Added auth to proxy string")
             
             final_url = f"{proxy_type}://{proxy_str}"
-            print(f"[{self.collector_id}] Final proxy URL: {final_url}")
+            logger.debug(f"[{self.collector_id}] Final proxy URL: {final_url}")
             return final_url
             
         except Exception as e:
-            print(f"[{self.collector_id}] Error setting up proxy: {str(e)}")
+            logger.error(f"[{self.collector_id}] Error setting up proxy: {str(e)}")
             return None
 
     async def connect(self):
@@ -92,38 +127,84 @@ class TwitterCollector(BaseCollector):
             if self.app:  # Already connected
                 return
             
-            proxy_url = self._setup_proxy(self.config.get("proxy"))
-            print(f"[{self.collector_id}] Setting up proxy: {proxy_url}")
+            proxy_urls = [self._setup_proxy(self.config.get("proxy"))] + list(self.config.get("proxies") or [])
+            self.proxy_pool = ProxyPool(dict.fromkeys(url for url in proxy_urls if url))
             
-            self.app = TwitterAsync(
-                self.session_name,
-                proxy=proxy_url
-            )
-            print(f"[{self.collector_id}] TwitterAsync initialized")
-
-            print(f"[{self.collector_id}] Attempting sign-in for {self.config['username']}")
-            try:
-                await self.app.sign_in(
-                    username=self.config["username"],
-                    password=self.config["password"]
-                )
-            except ActionRequired:
-                print(f"[{self.collector_id}] 2FA required")
-                verify_code = input(f"[{self.collector_id}] Enter 2FA code: ")
-                await self.app.sign_in(
-                    username=self.config["username"],
-                    password=self.config["password"],
-                )
+            # Stream the accounts file into the registry if it changed since the last import
+            imported = self.account_registry.sync_file(self.accounts_file)
+            if imported:
+                logger.info(f"[{self.collector_id}] Imported {imported} accounts from {self.accounts_file}")
+            
+            # Accounts promoted from the discovery frontier before the registry existed
+            self.account_registry.import_once('account_frontier', self.discovery_manager.promoted_accounts(), 'frontier')
+            logger.info(f"[{self.collector_id}] Tracking {self.account_registry.count()} active accounts")
             
-            print(f"[{self.collector_id}] Successfully signed in")
+            # Resume batch order, step, pacing and backoffs from the last run
+            self.checkpoint.restore()
             
-            with open(self.accounts_file, 'r') as f:
-                self.all_accounts = [line.strip() for line in f if line.strip()]
-                random.shuffle(self.all_accounts)
-            print(f"[{self.collector_id}] Loaded {len(self.all_accounts)} accounts total")
+            if len(self.proxy_pool.proxies) > 1:
+                await self.proxy_pool.probe()
+                self.last_proxy_probe = time()
+            await self._open_session(self.proxy_pool.assign())
 
         except Exception as e:
-            print(f"[{self.collector_id}] Error in connect(): {str(e)}")
+            logger.error(f"[{self.collector_id}] Error in connect(): {str(e)}")
+
+    async def _open_session(self, proxy_url):
+        """Create a TwitterAsync session on a proxy and sign in.
+
+        The session only replaces the current one once signed in, so a failed
+        sign-in leaves the collector on its working session and proxy.
+        """
+        logger.info(f"[{self.collector_id}] Setting up proxy: {redact(proxy_url)}")
+        app = TwitterAsync(
+            self.session_name,
+            proxy=proxy_url
+        )
+        logger.debug(f"[{self.collector_id}] TwitterAsync initialized")
+
+        logger.info(f"[{self.collector_id}] Attempting sign-in for {self.config['username']}")
+        try:
+            await app.sign_in(
+                username=self.config["username"],
+                password=self.config["password"]
+            )
+        except ActionRequired:
+            logger.warning(f"[{self.collector_id}] 2FA required")
+            verify_code = input(f"[{self.collector_id}] Enter 2FA code: ")
+            await app.sign_in(
+                username=self.config["username"],
+                password=self.config["password"],
+            )
+        
+        self.app, self.proxy = app, proxy_url
+        logger.info(f"[{self.collector_id}] Successfully signed in")
+
+    async def failover_proxy(self):
+        """Move the session to the best proxy in the pool if the current one is down or slow"""
+        if not self.proxy_pool or not self.proxy_pool.should_failover():
+            return False
+        proxy_url = self.proxy_pool.best()
+        logger.warning(f"[{self.collector_id}] Failing over from proxy {redact(self.proxy)}")
+        try:
+            await self._open_session(proxy_url)
+        except Exception as e:
+            # Count the failed sign-in against the new proxy; the next call retries the switch
+            self.proxy_pool.record(0, True, url=proxy_url)
+            logger.error(f"[{self.collector_id}] Error switching proxy: {str(e)}")
+            return False
+        self.proxy_pool.current = proxy_url
+        return True
+
+    async def probe_proxies(self):
+        """Refresh latency scores for the pool every PROXY_PROBE_INTERVAL seconds"""
+        if not self.proxy_pool or len(self.proxy_pool.proxies) < 2:
+            return
+        if time() - self.last_proxy_probe < PROXY_PROBE_INTERVAL:
+            return
+        self.last_proxy_probe = time()
+        await self.proxy_pool.probe()
+        await self.failover_proxy()
 
     def load_default_workflow(self) -> Workflow:
         """Load the original behavior as default workflow"""
@@ -147,11 +228,14 @@ class TwitterCollector(BaseCollector):
 
     async def collect_data(self):
         """Dynamic workflow-based collection with pause support"""
+        monitor = maintenance = None
         try:
             if not self.app:
                 await self.connect()
 
-            current_step = self.workflow.entry_point
+            current_step = self.current_step or self.workflow.entry_point
+            monitor = asyncio.create_task(metrics.monitor(self))
+            maintenance = asyncio.create_task(self.db_maintenance.run())
             
             while True:
                 try:
@@ -161,16 +245,48 @@ class TwitterCollector(BaseCollector):
                         continue
 
                     step = self.workflow.steps[current_step]
-                    result, next_step = await self.execute_step(step)
-                    current_step = next_step if next_step else step.next_steps[0]
+                    self.current_step = current_step
+                    before = self.scheduler.snapshot()
+                    start = perf_counter()
+                    with span(f"step:{current_step}", "step", action=step.action):
+                        result, next_step = await self.execute_step(step)
+                    metrics.STEP_SECONDS.labels(current_step).observe(perf_counter() - start)
+                    self.scheduler.record(current_step, before)
+                    self.yield_tracker.close_pending()
+                    self.circuit_breakers.step_succeeded(current_step)
+                    
+                    if self.workflow.scheduling == "bandit":
+                        current_step = await self.scheduler.choose(self.workflow.steps)
+                    else:
+                        current_step = next_step if next_step else step.next_steps[0]
+                    self.current_step = current_step
+                    self.checkpoint.maybe_save()
                     await self.rate_limiter.handle_rate_limits()
+                    await self.probe_proxies()
 
                 except Exception as e:
-                    print(f"[{self.collector_id}] Error in workflow step: {e}")
-                    await asyncio.sleep(300)
+                    # Back off this step only and move on; endpoint circuits sideline flaky endpoints
+                    wait_time = self.circuit_breakers.step_backoff(current_step)
+                    error_class = classify_error(e)
+                    metrics.STEP_ERRORS.labels(current_step, error_class).inc()
+                    logger.error(f"[{self.collector_id}] Error in workflow step {current_step} "
+                                 f"({error_class}): {e}. Retrying in {wait_time:.0f}s")
+                    metrics.record_sleep("step_backoff", wait_time)
+                    await asyncio.sleep(wait_time)
+                    step = self.workflow.steps.get(current_step)
+                    if step and step.next_steps:
+                        current_step = step.next_steps[-1]
 
         except Exception as e:
-            print(f"[{self.collector_id}] Error in collect_data(): {str(e)}")
+            logger.error(f"[{self.collector_id}] Error in collect_data(): {str(e)}")
+        finally:
+            # Also runs when the task is cancelled on shutdown
+            for task in (monitor, maintenance):
+                if task:
+                    task.cancel()
+            TRACER.flush()
+            if self.app:
+                self.checkpoint.save()
 
     async def execute_step(self, step: WorkflowStep):
         """Execute a workflow step with dynamic path selection"""
@@ -180,6 +296,7 @@ class TwitterCollector(BaseCollector):
             "fetch_tweets": self.tweet_manager.fetch_account_tweets,
             "fetch_following": self.following_manager.fetch_account_followings,
             "check_engagement": self.engagement_manager.check_engagement,
+            "repoll_engagement": self.repoll_manager.repoll_engagement,
             "process_mentions": self.mention_manager.process_mentions,
             "process_thread": self.thread_manager.process_thread
         }
@@ -201,7 +318,7 @@ class TwitterCollector(BaseCollector):
         # Apply workflow-defined sleep
         if step.max_sleep > 0:
             sleep_time = random.uniform(step.min_sleep, step.max_sleep)
-            print(f"[{self.collector_id}] Workflow sleep: {sleep_time:.1f}s")
+            logger.debug(f"[{self.collector_id}] Workflow sleep: {sleep_time:.1f}s")
             await asyncio.sleep(sleep_time)
         
         # Return both result and next step
@@ -209,6 +326,9 @@ class TwitterCollector(BaseCollector):
 
     async def process_account_batch(self):
         """Process a batch of accounts"""
+        # Draw high-signal accounts from the discovery frontier; they are due at once
+        self.discovery_manager.promote(
+            self.workflow.constants.get("FRONTIER_PROMOTIONS_PER_BATCH", FRONTIER_PROMOTIONS_PER_BATCH))
         current_batch = self.get_current_batch()
         
         for account in current_batch:
@@ -218,50 +338,69 @@ class TwitterCollector(BaseCollector):
             if random.random() < self.workflow.constants.get("FOLLOWING_CHECK_CHANCE", FOLLOWING_CHECK_CHANCE):
                 await self.following_manager.fetch_account_followings(account, deep_crawl=True)
             
+            self.account_registry.mark_fetched(account)
             await asyncio.sleep(random.uniform(10, 20))
         
-        self.rotate_batch()
         return True
 
     def get_current_batch(self):
-        """Get current batch of accounts"""
-        start_idx = self.current_batch_index * ACCOUNTS_PER_BATCH
-        end_idx = start_idx + ACCOUNTS_PER_BATCH
-        
-        batch = self.all_accounts[start_idx:end_idx]
-        print(f"[{self.collector_id}] Current batch ({start_idx}:{end_idx}): {', '.join(batch)}")
+        """Get the accounts most overdue for a fetch"""
+        batch = self.account_registry.due_batch(ACCOUNTS_PER_BATCH)
+        logger.info(f"[{self.collector_id}] Current batch: {len(batch)} accounts"
+                    + (f", starting with {batch[0]}" if batch else ""))
         return batch
-    
-    def rotate_batch(self):
-        """Move to next batch of accounts"""
-        total_batches = (len(self.all_accounts) + ACCOUNTS_PER_BATCH - 1) // ACCOUNTS_PER_BATCH
-        self.current_batch_index = (self.current_batch_index + 1) % total_batches
-        
-        print(f"[{self.collector_id}] Rotating to batch {self.current_batch_index + 1} of {total_batches}")
-        return self.get_current_batch()
+
+    async def call_api(self, endpoint, method, *args, account=None, **kwargs):
+        """Call a TwitterAsync method within the rate budget, logging it and recording its yield.
+
+        Raises CircuitOpenError without calling if the endpoint is backing off.
+        """
+        self.circuit_breakers.check(endpoint)
+        await self.planner.acquire(endpoint)
+        await self.rate_limiter.reserve(endpoint)
+        await self.rate_limiter.log_api_call(f"{endpoint}/{account}" if account else endpoint)
+        endpoint_class = endpoint.split('/')[0]
+        with span(f"api:{endpoint_class}", "api", method=method.__name__, account=account):
+            start = perf_counter()
+            try:
+                result = await self.yield_tracker.track(endpoint, account, method, *args, **kwargs)
+            except Exception as e:
+                metrics.API_CALL_SECONDS.labels(endpoint_class, method.__name__).observe(perf_counter() - start)
+                error_class = self.circuit_breakers.record_failure(endpoint, e)
+                metrics.API_CALL_ERRORS.labels(endpoint_class, error_class).inc()
+                # Only network-level failures say anything about the proxy
+                if self.proxy_pool and error_class in ("transient", "other"):
+                    self.proxy_pool.record(perf_counter() - start, True)
+                    await self.failover_proxy()
+                raise
+            metrics.API_CALL_SECONDS.labels(endpoint_class, method.__name__).observe(perf_counter() - start)
+            self.circuit_breakers.record_success(endpoint)
+            if self.proxy_pool:
+                self.proxy_pool.record(perf_counter() - start, False)
+        return result
 
     async def handle_rate_limits(self):
         """Implement abstract method by delegating to RateLimiter"""
         return await self.rate_limiter.handle_rate_limits()
 
-    async def search_term(self, search_type: str, term: str, pages: int = 3) -> dict:
+    async def search_term(self, search_type: str, term: str, pages: int = 3, exclude_spam: bool = True) -> dict:
         """
         Search term and get metrics
         """
         try:
-            return await self.search_manager.search_term(search_type, term, pages)
+            return await self.search_manager.search_term(search_type, term, pages, exclude_spam)
         except Exception as e:
-            print(f"[{self.collector_id}] Search error: {str(e)}")
+            logger.error(f"[{self.collector_id}] Search error: {str(e)}")
             raise
 
     async def pause_workflow(self):
         """Pause the workflow"""
         async with self._pause_lock:
             self.workflow_paused = True
-            print(f"[{self.collector_id}] Workflow paused")
+            logger.info(f"[{self.collector_id}] Workflow paused")
 
     async def resume_workflow(self):
         """Resume the workflow"""
         async with self._pause_lock:
             self.workflow_paused = False
-            print(f"[{self.collector_id}] Workflow resumed")
+            logger.info(f"[{self.collector_id}] Workflow resumed")
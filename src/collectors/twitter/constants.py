@@ -17,6 +17,62 @@ RATE_LIMIT_THRESHOLD = 42
 RATE_LIMIT_MAX = 48
 MAX_CALLS_BEFORE_SLEEP = 45
 
+# Shared token buckets: endpoint class -> (capacity, refill per 15 minutes)
+ENDPOINT_BUCKETS = {
+    'global': (1, 450),            # At most one call every 2s across all processes
+    'home_timeline': (20, 150),
+    'tweets': (10, 45),
+    'user_info': (20, 90),
+    'followings': (10, 45),
+    'follow': (3, 10),
+    'tweet_comments': (20, 140),
+    'tweet_detail': (10, 60),
+    'search': (10, 45)
+}
+
+# Circuit breakers: error class -> (failures to open, base backoff s, max backoff s, affects all endpoints)
+BREAKER_POLICIES = {
+    'rate_limit': (1, 900, 3600, False),
+    'auth': (1, 1800, 6 * 3600, True),
+    'transient': (3, 30, 900, False),
+    'parse': (5, 60, 1800, False),
+    'other': (5, 60, 1800, False)
+}
+STEP_BACKOFF_BASE = 10   # First sleep after a workflow step raises
+STEP_BACKOFF_MAX = 300   # Longest sleep after repeated step errors
+
+# Proxy pool
+PROXY_LATENCY_ALPHA = 0.2     # Weight of the newest sample in rolling latency/error rates
+PROXY_MAX_FAILURES = 3        # Consecutive failures before a proxy cools down
+PROXY_COOLDOWN_BASE = 60      # First cooldown in seconds, doubling on repeat
+PROXY_COOLDOWN_MAX = 3600
+PROXY_SWITCH_RATIO = 2.0      # Switch when a healthy proxy scores this many times better
+PROXY_PROBE_URL = "https://x.com/robots.txt"
+PROXY_PROBE_TIMEOUT = 10      # Seconds; also the assumed latency of untested proxies
+PROXY_PROBE_INTERVAL = 600    # Seconds between probes of the pool
+
+# Daily budget planner
+DAILY_CALL_BUDGET = 3000                          # Calls to spread over a day
+PACED_CALLS_PER_WINDOW = RATE_LIMIT_THRESHOLD - 2 # Max paced calls per 15 minutes, under the threshold
+PLANNER_BURST = 3                                 # Calls an action may run ahead of its pace
+ACTION_BUDGET_SHARES = {                          # Share of each hour's calls per action
+    'timeline': 0.25,
+    'tweets': 0.35,
+    'followings': 0.15,
+    'engagement': 0.15,
+    'search': 0.10                                # Reserved for /search requests
+}
+ENDPOINT_ACTIONS = {                              # call_api endpoint -> budget action
+    'home_timeline': 'timeline',
+    'tweets': 'tweets',
+    'user_info': 'followings',
+    'followings': 'followings',
+    'follow': 'followings',
+    'tweet_comments': 'engagement',
+    'tweet_detail': 'engagement',
+    'search': 'search'
+}
+
 # Following behavior
 FOLLOW_CHANCE = 0.1
 MAX_FOLLOWS_PER_DAY = 20
@@ -24,6 +80,78 @@ MUST_HAVE_TWEETS = 3
 FOLLOWING_CHECK_CHANCE = 0.3  # 30% chance to check followings
 FOLLOWING_CHECK_INTERVAL = 300  # 5 minutes between following checks
 MAX_FOLLOWING_PAGES = 5  # Maximum pages to fetch when checking followings
+FULL_SWEEP_INTERVAL_DAYS = 7  # Re-walk a whole following list after this long; otherwise only refresh new follows
+UNFOLLOW_SWEEP_THRESHOLD = 10  # Unfollows, inferred from the following count, that make a sweep due early
+
+# Engagement queue
+MIN_CANDIDATE_ENGAGEMENT = 50  # likes + retweets needed to enter the engagement queue
+CANDIDATE_MAX_AGE_HOURS = 24   # Older candidates are expired instead of crawled
+ENGAGEMENT_CALL_BUDGET = 8     # Max get_tweet_comments calls per viral tweet
+MIN_REPLIES_TO_EXPAND = 5      # Only open sub-threads of replies with more replies than this
+
+# Engagement re-polling
+REPOLL_BASE_INTERVAL = 15 * 60   # Seconds from queueing a tweet to its first re-poll
+REPOLL_BACKOFF = 2.0             # Each poll of a still-growing tweet waits this many times longer
+REPOLL_MAX_INTERVAL = 6 * 3600   # Longest wait between polls
+REPOLL_MAX_POLLS = 8             # Polls before a tweet is retired regardless of growth
+REPOLL_MAX_AGE_HOURS = 72        # Tweets older than this are retired
+REPOLL_MIN_VELOCITY = 20         # likes + retweets per hour needed to keep polling
+REPOLL_BATCH_SIZE = 10           # Tweets re-polled per workflow step
+
+# Trend detection
+TREND_WINDOW = 300              # Seconds per counting window; trends cover the last window, sliding
+TREND_BASELINE_WINDOWS = 12     # Earlier windows a term's usual count is taken from
+TREND_MIN_BASELINE = 3          # Observed baseline windows needed before bursts are flagged
+TREND_SKETCH_WIDTH = 4096       # Count-Min counters per row
+TREND_SKETCH_DEPTH = 4          # Count-Min rows (hash functions)
+TREND_TOP_K = 100               # Terms tracked per kind and window
+TREND_Z_THRESHOLD = 4.0         # Standard deviations above the baseline that make a burst
+TREND_MIN_COUNT = 5             # Mentions in the window a burst also needs
+TREND_EVENT_COOLDOWN = 1800     # Seconds before a bursting term raises another event
+TREND_SEEN_TWEETS = 50000       # Recent tweet ids remembered so re-sightings aren't counted
+TREND_PUBLISH_INTERVAL = 2      # Seconds between writes of the current trends
+
+# Account discovery
+MIN_FRONTIER_FOLLOWERS = 2        # Tracked accounts that must follow an account before it's queued
+MAX_FRONTIER_SIZE = 10000         # Pending accounts kept on the frontier
+FRONTIER_PROMOTIONS_PER_BATCH = 2 # Discovered accounts added to each batch
+
+# Profile cache
+PROFILE_CACHE_SIZE = 5000  # Profiles kept in memory
+PROFILE_FIELD_TTLS = {     # Seconds before a cached profile field is refetched
+    'twitter_id': 30 * 86400,
+    'created_at': 30 * 86400,
+    'verified': 86400,
+    'description': 86400,
+    'location': 86400,
+    'url': 86400,
+    'profile_image_url': 86400,
+    'profile_banner_url': 86400,
+    'following_count': 6 * 3600,
+    'followers_count': 6 * 3600,
+    'tweet_count': 6 * 3600,
+    'listed_count': 6 * 3600
+}
+
+# Yield accounting
+YIELD_FLUSH_CALLS = 25       # Flush per-call yield totals after this many calls
+YIELD_FLUSH_INTERVAL = 300   # ...or after this many seconds
+
+# Bandit scheduling
+BANDIT_HALF_LIFE = 6 * 3600   # Seconds for a step's observed yield to lose half its weight
+BANDIT_EXPLORATION = 0.5      # UCB exploration weight, relative to the best step's yield
+
+# Warm-start checkpoint
+CHECKPOINT_INTERVAL = 60          # Seconds between checkpoints while collecting
+CHECKPOINT_MAX_AGE = 24 * 3600    # Ignore checkpoints older than this on startup
+
+# Metrics
+METRICS_FLUSH_INTERVAL = 15   # Seconds between metric snapshots for the API's /metrics
+LOOP_LAG_INTERVAL = 1.0       # Seconds between event loop lag samples
+
+# Diagnostics
+PROFILE_MAX_SECONDS = 300     # Longest profile the API may request
+PROFILE_INTERVAL = 0.005      # Seconds between stack samples
 
 # Batch settings
 ACCOUNTS_PER_BATCH = 20  # Process accounts in batches of 20
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import uuid
+from src.database.db import DB_PATH
+from src.utils.profiler import SamplingProfiler
+from .constants import (
+    PROFILE_MAX_SECONDS,
+    PROFILE_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+DEBUG_DIR = DB_PATH.parent / "debug"
+
+def _profile_dir(collector_id):
+    path = DEBUG_DIR / collector_id
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def request_profile(collector_id, seconds, interval=PROFILE_INTERVAL):
+    """Ask the collector process to profile itself; returns the profile id.
+
+    The collector and the API run as separate processes, so requests, stop
+    signals and results are exchanged as files that the collector's monitor
+    task checks every second.
+    """
+    profile_id = uuid.uuid4().hex[:12]
+    path = _profile_dir(collector_id) / f"{profile_id}.request"
+    with open(path.with_suffix(".tmp"), "w") as f:
+        json.dump({"seconds": min(seconds, PROFILE_MAX_SECONDS), "interval": interval}, f)
+    os.replace(path.with_suffix(".tmp"), path)
+    return profile_id
+
+def stop_profile(collector_id, profile_id):
+    (_profile_dir(collector_id) / f"{profile_id}.stop").touch()
+
+def profile_status(collector_id, profile_id):
+    """'pending', 'running', 'done' or None, and the folded stacks once done"""
+    directory = _profile_dir(collector_id)
+    result = directory / f"{profile_id}.folded"
+    if result.exists():
+        return "done", result.read_text()
+    if (directory / f"{profile_id}.running").exists():
+        return "running", None
+    if (directory / f"{profile_id}.request").exists():
+        return "pending", None
+    return None, None
+
+class ProfileRequests:
+    """Runs profiles requested through DEBUG_DIR against this collector process"""
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.running = {}  # profile id -> SamplingProfiler
+
+    def poll(self):
+        directory = _profile_dir(self.collector.collector_id)
+        for request in directory.glob("*.request"):
+            profile_id = request.stem
+            try:
+                with open(request) as f:
+                    options = json.load(f)
+            except (OSError, ValueError):
+                continue
+            os.replace(request, request.with_suffix(".running"))
+            logger.info(f"[{self.collector.collector_id}] Profiling for {options['seconds']}s ({profile_id})")
+            self.running[profile_id] = SamplingProfiler(interval=options.get("interval", PROFILE_INTERVAL)).start(
+                options["seconds"], on_done=lambda profiler, profile_id=profile_id: self._save(profile_id, profiler))
+
+        for profile_id, profiler in list(self.running.items()):
+            stop = directory / f"{profile_id}.stop"
+            if stop.exists():
+                stop.unlink()
+                profiler.stop()
+            if not profiler.running:
+                del self.running[profile_id]
+
+    def _save(self, profile_id, profiler):
+        """Write the result from the profiler thread once sampling ends"""
+        directory = _profile_dir(self.collector.collector_id)
+        result = directory / f"{profile_id}.folded"
+        with open(result.with_suffix(".tmp"), "w") as f:
+            f.write(profiler.folded())
+        os.replace(result.with_suffix(".tmp"), result)
+        (directory / f"{profile_id}.running").unlink(missing_ok=True)
+        logger.info(f"[{self.collector.collector_id}] Profile {profile_id} done: "
+                    f"{profiler.samples} samples over {profiler.duration:.1f}s")
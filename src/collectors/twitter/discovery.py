@@ -0,0 +1,132 @@
+import logging
+import math
+from datetime import datetime
+from src.database.db import connect
+from .constants import (
+    MAX_FRONTIER_SIZE,
+    MIN_FRONTIER_FOLLOWERS
+)
+
+logger = logging.getLogger(__name__)
+
+class DiscoveryManager:
+    """Crawl frontier of accounts discovered through tracked accounts' followings"""
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def discover(self, c, usernames):
+        """Score newly seen followings and push them onto the frontier.
+
+        Takes an open cursor so it runs in the following crawl's transaction.
+        An account scores higher the more tracked accounts follow it and the
+        more engagement its stored tweets get.
+        """
+        usernames = list(usernames)
+        tracked = self.collector.account_registry.tracked(usernames)
+        candidates = {u.lower(): u for u in usernames if u.lower() not in tracked}
+        if not candidates:
+            return 0
+
+        names = list(candidates.values())
+        placeholders = ','.join('?' for _ in names)
+        c.execute(f'''
+            SELECT following, COUNT(*)
+            FROM account_followings
+            WHERE following IN ({placeholders})
+            GROUP BY following
+        ''', names)
+        follower_counts = {name.lower(): count for name, count in c.fetchall()}
+
+        c.execute(f'''
+            SELECT author_username, AVG(COALESCE(likes, 0) + COALESCE(retweets, 0))
+            FROM tweets
+            WHERE author_username IN ({placeholders})
+            GROUP BY author_username
+        ''', names)
+        engagement = {name.lower(): avg for name, avg in c.fetchall()}
+
+        now = datetime.now().isoformat()
+        rows = []
+        for username in candidates:
+            followers = follower_counts.get(username, 0)
+            avg_engagement = engagement.get(username) or 0
+            if followers < MIN_FRONTIER_FOLLOWERS:
+                continue
+            score = followers * (1 + math.log1p(avg_engagement))
+            rows.append((username, score, followers, avg_engagement, now, now))
+
+        c.executemany('''
+            INSERT INTO account_frontier
+            (username, score, tracked_followers, avg_engagement, discovered_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                score = excluded.score,
+                tracked_followers = excluded.tracked_followers,
+                avg_engagement = excluded.avg_engagement,
+                updated_at = excluded.updated_at
+        ''', rows)
+        return len(rows)
+
+    def promote(self, limit):
+        """Pop the best frontier accounts into the account registry, within the account cap.
+
+        Accounts that became tracked some other way are dropped from the
+        frontier on the way, so they never hold up the ones behind them.
+        """
+        registry = self.collector.account_registry
+        room = self.collector.max_accounts - registry.count()
+        limit = min(limit, room)
+        if limit <= 0:
+            return []
+
+        promoted = []
+        with connect() as conn:
+            c = conn.cursor()
+            now = datetime.now().isoformat()
+            while len(promoted) < limit:
+                c.execute('''
+                    SELECT username FROM account_frontier
+                    WHERE promoted_at IS NULL
+                    ORDER BY score DESC
+                    LIMIT ?
+                ''', (limit - len(promoted),))
+                candidates = [row[0] for row in c.fetchall()]
+                if not candidates:
+                    break
+
+                tracked = registry.tracked(candidates)
+                fresh = [username for username in candidates if username.lower() not in tracked]
+                c.executemany('DELETE FROM account_frontier WHERE username = ?',
+                              [(username,) for username in candidates if username.lower() in tracked])
+                c.executemany('UPDATE account_frontier SET promoted_at = ? WHERE username = ?',
+                              [(now, username) for username in fresh])
+                promoted.extend(fresh)
+
+            # Keep only the best MAX_FRONTIER_SIZE pending accounts
+            c.execute('''
+                DELETE FROM account_frontier
+                WHERE promoted_at IS NULL AND username NOT IN (
+                    SELECT username FROM account_frontier
+                    WHERE promoted_at IS NULL
+                    ORDER BY score DESC
+                    LIMIT ?
+                )
+            ''', (MAX_FRONTIER_SIZE,))
+            conn.commit()
+
+        registry.add(promoted, source='frontier')
+        if promoted:
+            logger.info(f"[{self.collector.collector_id}] Promoted {len(promoted)} discovered accounts: {', '.join(promoted)}")
+        return promoted
+
+    def promoted_accounts(self):
+        """Every account ever promoted from the frontier"""
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT username FROM account_frontier
+                WHERE promoted_at IS NOT NULL
+                ORDER BY promoted_at
+            ''')
+            return [row[0] for row in c.fetchall()]
@@ -1,9 +1,21 @@
-import sqlite3
+import logging
 import asyncio
 import random
-from datetime import datetime
-from src.database.db import DB_PATH
-from .constants import RATE_LIMIT_THRESHOLD
+from datetime import datetime, timedelta
+from src.database.db import connect
+from src.database.near_duplicates import SPAM_THRESHOLD
+from .constants import (
+    RATE_LIMIT_THRESHOLD,
+    MIN_CANDIDATE_ENGAGEMENT,
+    CANDIDATE_MAX_AGE_HOURS,
+    ENGAGEMENT_CALL_BUDGET,
+    MIN_REPLIES_TO_EXPAND,
+    THREAD_TYPES
+)
+from .metrics import db_write
+from .repoll import COUNTS_UPSERT
+
+logger = logging.getLogger(__name__)
 
 class EngagementManager:
     def __init__(self, collector):
@@ -12,148 +24,264 @@ class EngagementManager:
             'elonmusk',
         }
 
-    async def check_engagement(self, max_depth=5, min_engagement=100, min_reply_likes=10):
+    async def check_engagement(self, max_depth=5, min_engagement=100, min_reply_likes=10, exclude_spam=True):
         """Collect meaningful engagement data for viral tweets"""
         try:
-            # Find viral tweets from last 24h not yet processed
-            with sqlite3.connect(DB_PATH, timeout=20) as conn:
-                c = conn.cursor()
-                placeholders = ','.join(['?' for _ in self.blacklisted_users])
-                query = f'''
-                    SELECT id, author_username, likes, retweets 
-                    FROM tweets 
-                    WHERE collected_at > datetime('now', '-24 hours')
-                    AND (likes + retweets) > ?
-                    AND author_username NOT IN ({placeholders})
-                    AND id NOT IN (SELECT tweet_id FROM tweet_engagements WHERE engagement_type = 'checked')
-                    ORDER BY (likes + retweets) DESC
-                    LIMIT ?
-                '''
-                params = [min_engagement] + list(self.blacklisted_users) + [max_depth]
-                c.execute(query, params)
-                viral_tweets = c.fetchall()
-                
-                print(f"Found {len(viral_tweets)} viral tweets:")
-                for tweet_id, author, likes, rts in viral_tweets:
-                    print(f"- Tweet {tweet_id} by @{author}: {likes} likes, {rts} RTs")
+            # Pop the highest scoring unprocessed candidates from the queue
+            viral_tweets = self.pop_candidates(min_engagement, max_depth, exclude_spam)
 
-            for tweet_id, author, likes, rts in viral_tweets:
-                print(f"[{self.collector.collector_id}] Processing viral tweet {tweet_id} by @{author}")
-                
-                # Get the full conversation thread
-                conversation = await self.collector.app.get_tweet_comments(
-                    tweet_id, 
-                    pages=random.randint(3, 5),
-                    wait_time=2,
-                    get_hidden=False
-                )
-
-                # Store parent tweets first
-                if conversation and conversation.tweets:
-                    # Each ConversationThread has a tweets list
-                    all_tweets = []
-                    for thread in conversation.tweets:
-                        all_tweets.extend(thread.tweets)
-                    await self._store_engagement_data(tweet_id, all_tweets, [])
-                    print(f"[{self.collector.collector_id}] Found {len(all_tweets)} parent tweets")
-                
-                # Get initial replies
-                replies = []
-                total_pages = random.randint(3, 5)  # Sometimes read more, sometimes less
+            logger.info(f"[{self.collector.collector_id}] Found {len(viral_tweets)} viral tweets")
+
+            for tweet_id, author, score in viral_tweets:
+                logger.info(f"[{self.collector.collector_id}] Processing viral tweet {tweet_id} by @{author} "
+                            f"({score} likes + RTs)")
                 
-                for page in range(total_pages):
-                    await self.collector.rate_limiter.log_api_call(f"tweet_comments/{tweet_id}/page/{page}")
-                    
-                    # More natural reading pause between pages
-                    if page > 0:
-                        read_time = random.uniform(10, 25)  # Longer pause between pages
-                        print(f"[{self.collector.collector_id}] Reading replies, page {page}...")
-                        await asyncio.sleep(read_time)
-                    
-                    page_replies = await self.collector.app.get_tweet_comments(tweet_id, pages=1)
-                    if not page_replies:
-                        break
-                        
-                    # Filter quality replies but keep some lower-engagement ones randomly
-                    quality_replies = [r for r in page_replies if 
-                        getattr(r, 'likes', 0) >= min_reply_likes or 
-                        random.random() < 0.2]  # 20% chance to keep lower-engagement replies
-                    
-                    replies.extend(quality_replies)
-                    
-                    # Sometimes dive into reply threads
-                    for reply in quality_replies:
-                        if getattr(reply, 'reply_counts', 0) > 5 and random.random() < 0.3:
-                            print(f"[{self.collector.collector_id}] This reply looks interesting, checking responses...")
-                            await asyncio.sleep(random.uniform(5, 10))
-                            reply_thread = await self.collector.app.get_tweet_comments(reply.id, pages=1)
-                            if reply_thread:
-                                replies.extend(reply_thread)
+                # Page the conversation once, then expand promising sub-threads
+                replies = await self._crawl_reply_tree(tweet_id, min_reply_likes)
+                stored = await self._store_engagement_data(tweet_id, author, replies)
+                logger.info(f"[{self.collector.collector_id}] Stored {stored} replies for tweet {tweet_id}")
 
                 # More natural pause between tweets
                 think_time = random.uniform(15, 45)
-                print(f"[{self.collector.collector_id}] Taking a {think_time:.1f}s break to process what we read")
+                logger.debug(f"[{self.collector.collector_id}] Taking a {think_time:.1f}s break to process what we read")
                 await asyncio.sleep(think_time)
 
             return True
 
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Engagement check error: {str(e)}")
+            logger.error(f"[{self.collector.collector_id}] Engagement check error: {str(e)}")
             return False
 
-    async def _store_engagement_data(self, tweet_id, replies, quotes):
-        """Store quality replies and quotes"""
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
-            c = conn.cursor()
-            now = datetime.now().isoformat()
+    def enqueue_candidates(self, c, tweets):
+        """Queue tweets whose engagement crossed the threshold, raising the score of queued ones.
 
-            # Store replies as tweets
-            for reply in replies:
-                c.execute('''
-                    INSERT OR IGNORE INTO tweets 
-                    (id, author_username, text, created_at, collected_at,
-                     likes, retweets, views, reply_counts,
-                     in_reply_to_id, conversation_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (reply.id, reply.author.username, reply.text,
-                     reply.created_at, now,
-                     getattr(reply, 'likes', 0),
-                     getattr(reply, 'retweet_counts', 0),
-                     getattr(reply, 'views', 0),
-                     getattr(reply, 'reply_counts', 0),
-                     tweet_id, tweet_id))
-
-            # Store quotes as tweets
-            for quote in quotes:
+        Takes an open cursor so ingestion can queue within its own transaction,
+        and an iterable of (tweet_id, author_username, likes, retweets). Queued
+        tweets are also watched for engagement re-polling.
+        """
+        now = datetime.now().isoformat()
+        rows = []
+        for tweet_id, author, likes, retweets in tweets:
+            score = (likes or 0) + (retweets or 0)
+            if score >= MIN_CANDIDATE_ENGAGEMENT:
+                rows.append((str(tweet_id), author, score, now, now))
+
+        if rows:
+            c.executemany('''
+                INSERT INTO engagement_candidates
+                (tweet_id, author_username, score, queued_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(tweet_id) DO UPDATE SET
+                    score = excluded.score,
+                    updated_at = excluded.updated_at
+                WHERE excluded.score > engagement_candidates.score
+            ''', rows)
+            self.collector.repoll_manager.watch(c, [(tweet_id, score) for tweet_id, _, score, _, _ in rows])
+        return len(rows)
+
+    def pop_candidates(self, min_engagement, limit, exclude_spam=True):
+        """Pop up to `limit` unprocessed candidates scoring above `min_engagement`.
+
+        Walks the partial score index, so each pop is a log-time seek rather than
+        a scan. Stale and blacklisted candidates are retired on the way, as are
+        copies in a near-duplicate spam cluster with `exclude_spam`.
+        """
+        now = datetime.now()
+        cutoff = (now - timedelta(hours=CANDIDATE_MAX_AGE_HOURS)).isoformat()
+        now = now.isoformat()
+        candidates = []
+
+        with connect() as conn:
+            c = conn.cursor()
+            while len(candidates) < limit:
                 c.execute('''
-                    INSERT OR IGNORE INTO tweets 
-                    (id, author_username, text, created_at, collected_at,
-                     likes, retweets, views, reply_counts,
-                     is_quote, original_tweet_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-                ''', (quote.id, quote.author.username, quote.text,
-                     quote.created_at, now,
-                     getattr(quote, 'likes', 0),
-                     getattr(quote, 'retweet_counts', 0),
-                     getattr(quote, 'views', 0),
-                     getattr(quote, 'reply_counts', 0),
-                     tweet_id))
+                    SELECT e.tweet_id, e.author_username, e.score, e.queued_at, t.spam_score
+                    FROM engagement_candidates e
+                    LEFT JOIN tweets t ON t.id = e.tweet_id
+                    WHERE e.processed_at IS NULL AND e.score > ?
+                    ORDER BY e.score DESC
+                    LIMIT ?
+                ''', (min_engagement, limit - len(candidates)))
+                rows = c.fetchall()
+                if not rows:
+                    break
+
+                updates = []
+                for tweet_id, author, score, queued_at, spam_score in rows:
+                    if author in self.blacklisted_users:
+                        status = 'skipped'
+                    elif queued_at < cutoff:
+                        status = 'expired'
+                    elif exclude_spam and (spam_score or 0) >= SPAM_THRESHOLD:
+                        status = 'spam'
+                    else:
+                        status = 'processed'
+                        candidates.append((tweet_id, author, score))
+                    updates.append((now, status, tweet_id))
 
+                c.executemany('''
+                    UPDATE engagement_candidates
+                    SET processed_at = ?, status = ?
+                    WHERE tweet_id = ?
+                ''', updates)
             conn.commit()
 
-            # Store engagement records
-            for reply in replies:
-                c.execute('''
-                    INSERT INTO tweet_engagements
-                    (tweet_id, author_username, engagement_type, engaged_at, collector_id)
-                    VALUES (?, ?, 'reply', ?, ?)
-                ''', (tweet_id, reply.author.username, now, self.collector.collector_id))
+        return candidates
 
-            for quote in quotes:
-                c.execute('''
-                    INSERT INTO tweet_engagements
-                    (tweet_id, author_username, engagement_type, engaged_at, collector_id)
-                    VALUES (?, ?, 'quote', ?, ?)
-                ''', (tweet_id, quote.author.username, now, self.collector.collector_id))
+    async def _fetch_comments(self, tweet_id, cursor=None):
+        """Fetch a single page of replies to a tweet"""
+        return await self.collector.call_api(
+            "tweet_comments",
+            self.collector.app.get_tweet_comments,
+            tweet_id,
+            pages=1,
+            wait_time=2,
+            cursor=cursor,
+            get_hidden=False
+        )
+
+    def _flatten_comments(self, response, parent_id):
+        """Flatten a comments page into (reply, parent_id) pairs.
+
+        Each ConversationThread is a chain: its first tweet replies to
+        `parent_id` and every following tweet replies to the one before it.
+        """
+        pairs = []
+        for thread in getattr(response, 'tweets', None) or []:
+            parent = parent_id
+            for reply in getattr(thread, 'tweets', None) or [thread]:
+                if not hasattr(reply, 'id'):
+                    continue
+                pairs.append((reply, parent))
+                parent = reply.id
+        return pairs
+
+    async def _crawl_reply_tree(self, tweet_id, min_reply_likes):
+        """Collect a reply tree within the per-tweet call budget.
+
+        The conversation is paged once; sub-threads are then expanded
+        breadth-first, most liked replies first, until the budget runs out.
+        Returns (reply, parent_id, depth) tuples keyed by reply id.
+        """
+        budget = ENGAGEMENT_CALL_BUDGET
+        tree = {}
+        depths = {str(tweet_id): 0}
+
+        def add_replies(pairs):
+            added = []
+            for reply, parent in pairs:
+                reply_id = str(reply.id)
+                if reply_id in tree or reply_id == str(tweet_id):
+                    continue
+                depth = depths.get(str(parent), 0) + 1
+                depths[reply_id] = depth
+                tree[reply_id] = (reply, str(parent), depth)
+                added.append(reply)
+            return added
+
+        def worth_expanding(reply):
+            return (getattr(reply, 'reply_counts', 0) > MIN_REPLIES_TO_EXPAND and
+                    getattr(reply, 'likes', 0) >= min_reply_likes)
+
+        # Root conversation, page by page
+        frontier = []
+        cursor = None
+        for page in range(random.randint(3, 5)):  # Sometimes read more, sometimes less
+            if budget <= 0:
+                break
+            if page > 0:
+                read_time = random.uniform(10, 25)  # Longer pause between pages
+                logger.debug(f"[{self.collector.collector_id}] Reading replies, page {page}...")
+                await asyncio.sleep(read_time)
+
+            response = await self._fetch_comments(tweet_id, cursor)
+            budget -= 1
+            added = add_replies(self._flatten_comments(response, tweet_id))
+            frontier.extend(r for r in added if worth_expanding(r))
+
+            cursor = getattr(response, 'cursor', None)
+            if not added or not cursor:
+                break
+
+        # Breadth-first over sub-threads, most liked replies first
+        expanded = {str(tweet_id)}
+        while frontier and budget > 0:
+            frontier.sort(key=lambda r: getattr(r, 'likes', 0), reverse=True)
+            next_frontier = []
+            for reply in frontier:
+                if budget <= 0:
+                    break
+                if str(reply.id) in expanded:
+                    continue
+                expanded.add(str(reply.id))
+
+                logger.debug(f"[{self.collector.collector_id}] This reply looks interesting, checking responses...")
+                await asyncio.sleep(random.uniform(5, 10))
+                response = await self._fetch_comments(reply.id)
+                budget -= 1
+                added = add_replies(self._flatten_comments(response, reply.id))
+                next_frontier.extend(r for r in added if worth_expanding(r))
+            frontier = next_frontier
+
+        logger.info(f"[{self.collector.collector_id}] Collected {len(tree)} replies with "
+                    f"{ENGAGEMENT_CALL_BUDGET - budget} calls for tweet {tweet_id}")
+        return list(tree.values())
+
+    async def _store_engagement_data(self, tweet_id, author, replies):
+        """Bulk-store a reply tree with parent links and mark the tweet checked"""
+        now = datetime.now().isoformat()
+        tweet_rows = []
+        thread_rows = []
+        for reply, parent_id, depth in replies:
+            reply_author = reply.author.username
+            tweet_rows.append((
+                str(reply.id), reply_author, reply.text,
+                str(getattr(reply, 'created_on', None) or getattr(reply, 'date', None)), now,
+                self.collector.collector_id,
+                getattr(reply, 'likes', 0),
+                getattr(reply, 'retweet_counts', 0),
+                getattr(reply, 'views', 0),
+                getattr(reply, 'reply_counts', 0),
+                parent_id, str(tweet_id)
+            ))
+            thread_rows.append((
+                str(reply.id), str(tweet_id),
+                THREAD_TYPES['reply'],
+                depth, parent_id, str(tweet_id),
+                now, self.collector.collector_id
+            ))
+
+        with connect() as conn, db_write(conn, "reply_tree"):
+            c = conn.cursor()
+            marks = self.collector.yield_tracker.mark(c, 'tweets', 'tweet_threads')
+
+            c.executemany(f'''
+                INSERT INTO tweets
+                (id, author_username, text, created_at, collected_at, collector_id,
+                 likes, retweets, views, reply_counts,
+                 in_reply_to_id, conversation_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                {COUNTS_UPSERT}
+            ''', tweet_rows)
+            for row in tweet_rows:
+                self.collector.trend_detector.observe(row[0], row[3], row[2])
+            self.collector.near_duplicates.assign(c, [(row[0], row[2]) for row in tweet_rows])
+
+            c.executemany('''
+                INSERT OR IGNORE INTO tweet_threads
+                (tweet_id, conversation_id, thread_type,
+                 thread_position, parent_tweet_id, root_tweet_id,
+                 discovered_at, collector_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', thread_rows)
+
+            c.execute('''
+                INSERT OR REPLACE INTO tweet_engagements
+                (tweet_id, author_username, engagement_type, engaged_at, collector_id)
+                VALUES (?, ?, 'checked', ?, ?)
+            ''', (str(tweet_id), author, now, self.collector.collector_id))
+
+            self.collector.yield_tracker.credit_since(c, marks)
+            conn.commit()
 
-            conn.commit()
\ No newline at end of file
+        return len(tweet_rows)
@@ -1,13 +1,19 @@
-import sqlite3
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
 import random
 import asyncio
-from src.database.db import DB_PATH
+from src.database.db import connect
 from .constants import (
     MAX_FOLLOWS_PER_DAY,
     MUST_HAVE_TWEETS,
-    MAX_FOLLOWING_PAGES
+    MAX_FOLLOWING_PAGES,
+    FULL_SWEEP_INTERVAL_DAYS,
+    UNFOLLOW_SWEEP_THRESHOLD
 )
+from .circuit_breaker import classify_error
+from .metrics import db_write
+
+logger = logging.getLogger(__name__)
 
 class FollowingManager:
     def __init__(self, collector):
@@ -15,7 +21,7 @@ class FollowingManager:
 
     async def should_follow_account(self, account):
         """Check if we should follow this account"""
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             
             # Check if we already follow
@@ -28,18 +34,16 @@ class FollowingManager:
             # Check daily follow count
             today = datetime.now().date().isoformat()
             c.execute('''SELECT COUNT(*) FROM our_following 
-                        WHERE collector_id = ? AND date(followed_at) = ?''',
+                        WHERE collector_id = ? AND followed_at >= ?''',
                         (self.collector.collector_id, today))
             if c.fetchone()[0] >= MAX_FOLLOWS_PER_DAY:
                 return False
             
-            # Check their tweet count
-            c.execute('''SELECT COUNT(*) FROM tweets 
-                        WHERE author_username = ?''', (account,))
-            if c.fetchone()[0] < MUST_HAVE_TWEETS:
-                return False
-            
-            return True
+        # Check their tweet count, kept running during ingestion
+        if self.collector.profile_manager.stored_tweet_count(account) < MUST_HAVE_TWEETS:
+            return False
+        
+        return True
 
     async def follow_account(self, account):
         """Follow an account and log it"""
@@ -47,10 +51,9 @@ class FollowingManager:
             if not await self.should_follow_account(account):
                 return False
                 
-            await self.collector.rate_limiter.log_api_call(f"follow/{account}")
-            await self.collector.app.follow_user(account)
+            await self.collector.call_api("follow", self.collector.app.follow_user, account, account=account)
             
-            with sqlite3.connect(DB_PATH, timeout=20) as conn:
+            with connect() as conn:
                 c = conn.cursor()
                 c.execute('''INSERT INTO our_following 
                             (username, collector_id, followed_at) 
@@ -58,124 +61,237 @@ class FollowingManager:
                             (account, self.collector.collector_id, datetime.now().isoformat()))
                 conn.commit()
             
-            print(f"[{self.collector.collector_id}] Followed @{account}")
+            logger.info(f"[{self.collector.collector_id}] Followed @{account}")
             await asyncio.sleep(random.uniform(10, 30))
             
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Error following {account}: {str(e)}")
+            logger.error(f"[{self.collector.collector_id}] Error following {account}: {str(e)}")
             return False
 
+    def _load_crawl_state(self, account):
+        """Get the saved following crawl state for an account"""
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT cursor, pages_done, last_full_sweep_at, following_count_at_sweep, sweep_started_at
+                FROM following_crawl_state WHERE username = ?
+            ''', (account,))
+            row = c.fetchone()
+        if not row:
+            return None
+        return {
+            "cursor": row[0],
+            "pages_done": row[1] or 0,
+            "last_full_sweep_at": row[2],
+            "following_count_at_sweep": row[3],
+            "sweep_started_at": row[4]
+        }
+
+    def _save_crawl_state(self, c, account, cursor, pages_done, sweep_started_at=None,
+                          last_full_sweep_at=None, following_count_at_sweep=None):
+        """Checkpoint crawl progress; completed-sweep fields are only overwritten when given"""
+        c.execute('''
+            INSERT INTO following_crawl_state
+            (username, cursor, pages_done, sweep_started_at, last_full_sweep_at, following_count_at_sweep, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                cursor = excluded.cursor,
+                pages_done = excluded.pages_done,
+                sweep_started_at = excluded.sweep_started_at,
+                last_full_sweep_at = COALESCE(excluded.last_full_sweep_at, last_full_sweep_at),
+                following_count_at_sweep = COALESCE(excluded.following_count_at_sweep, following_count_at_sweep),
+                updated_at = excluded.updated_at
+        ''', (account, cursor, pages_done, sweep_started_at, last_full_sweep_at,
+              following_count_at_sweep, datetime.now().isoformat()))
+
+    def _remove_unseen(self, c, account, sweep_started_at):
+        """Drop edges the completed sweep started at `sweep_started_at` didn't see; returns edges dropped.
+
+        Removals are logged for the following graph. A sweep that saw no
+        edges at all removes nothing, and the edge with the highest rowid
+        stays, since SQLite would reuse its rowid and slip the next edge
+        past rowid watermarks.
+        """
+        c.execute('SELECT 1 FROM account_followings WHERE follower = ? AND swept_at = ? LIMIT 1',
+                  (account, sweep_started_at))
+        if not c.fetchone():
+            return 0
+        unseen = '''FROM account_followings
+                    WHERE follower = ? AND (swept_at IS NULL OR swept_at < ?)
+                      AND rowid < (SELECT MAX(rowid) FROM account_followings)'''
+        c.execute(f'''INSERT INTO account_following_removals (follower, following, removed_at)
+                      SELECT follower, following, ? {unseen}''',
+                  (datetime.now().isoformat(), account, sweep_started_at))
+        c.execute(f'DELETE {unseen}', (account, sweep_started_at))
+        return c.rowcount
+
+    def _unfollows_since_sweep(self, account, state, total_following):
+        """Accounts unfollowed since the last completed sweep, going by the following count.
+
+        Refreshes only see new follows, so the count at the sweep plus the edges
+        stored since should match the current count; any shortfall was unfollowed.
+        """
+        if not state["last_full_sweep_at"] or state["following_count_at_sweep"] is None:
+            return 0
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT COUNT(*) FROM account_followings
+                WHERE follower = ? AND discovered_at > ?
+            ''', (account, state["last_full_sweep_at"]))
+            followed = c.fetchone()[0]
+        return state["following_count_at_sweep"] + followed - total_following
+
     async def fetch_account_followings(self, account, deep_crawl=False):
-        """Fetch and store an account's following list"""
+        """Fetch and store an account's following list; returns True once crawled.
+
+        A full sweep walks the whole list, checkpointing its cursor after every
+        page so an interrupted sweep resumes where it stopped. Once a sweep has
+        completed, later crawls only refresh from the top of the list (newest
+        follows first) and stop at the first page with no new edges, unless the
+        following count shows UNFOLLOW_SWEEP_THRESHOLD unfollows since the sweep.
+        A completed sweep removes the stored edges it didn't see. A saved
+        cursor the API rejects is dropped, so the next crawl sweeps afresh.
+        """
         try:
-            # Get user info first
-            await self.collector.rate_limiter.log_api_call(f"user_info/{account}")
-            user_info = await self.collector.app.get_user_info(account)
+            # Get user info first, from the profile cache when it's fresh
+            profile = await self.collector.profile_manager.get_profile(account, fields=('following_count',))
             
-            if not user_info:
-                print(f"[{self.collector.collector_id}] Could not get user info for {account}")
+            if not profile:
+                logger.warning(f"[{self.collector.collector_id}] Could not get user info for {account}")
                 return False
             
-            total_following = getattr(user_info, 'friends_count', 0)
-            max_pages = min(
-                MAX_FOLLOWING_PAGES * (3 if deep_crawl else 1), 
-                (total_following + 49) // 50
+            total_following = profile['following_count'] or 0
+            max_pages = MAX_FOLLOWING_PAGES * (3 if deep_crawl else 1)
+
+            state = self._load_crawl_state(account)
+            sweep_due = (
+                not state or
+                not state["last_full_sweep_at"] or
+                datetime.fromisoformat(state["last_full_sweep_at"]) <
+                    datetime.now() - timedelta(days=FULL_SWEEP_INTERVAL_DAYS) or
+                self._unfollows_since_sweep(account, state, total_following) >= UNFOLLOW_SWEEP_THRESHOLD
             )
+            if state and state["cursor"]:
+                mode = "resume"
+                cursor = state["cursor"]
+                pages_done = state["pages_done"]
+                sweep_started_at = state["sweep_started_at"]  # None for sweeps saved before it was kept
+            elif sweep_due:
+                mode = "sweep"
+                cursor = None
+                pages_done = 0
+                sweep_started_at = datetime.now().isoformat()
+            else:
+                mode = "refresh"
+                cursor = None
+                pages_done = 0
+                sweep_started_at = None
             
-            print(f"[{self.collector.collector_id}] @{account} follows {total_following} accounts")
-            print(f"[{self.collector.collector_id}] Checking {max_pages} pages {'(deep crawl)' if deep_crawl else ''}")
+            logger.info(f"[{self.collector.collector_id}] @{account} follows {total_following} accounts")
+            logger.info(f"[{self.collector.collector_id}] Following crawl mode: {mode}, up to {max_pages} pages "
+                        f"{'(deep crawl)' if deep_crawl else ''}")
             
             followings = []
             seen_ids = set()
-            cursor = None
+            new_total = 0
 
             for current_page in range(max_pages):
                 sleep_time = random.uniform(8, 12)
-                print(f"[{self.collector.collector_id}] Scrolling to page {current_page + 1}, waiting {sleep_time}s...")
+                logger.debug(f"[{self.collector.collector_id}] Scrolling to page {pages_done + 1}, waiting {sleep_time}s...")
                 await asyncio.sleep(sleep_time)
                 
-                response = await self.collector.app.get_user_followings(
-                    username=account,
-                    pages=1,
-                    wait_time=3,
-                    cursor=cursor  # Use cursor from previous response
-                )
+                try:
+                    response = await self.collector.call_api(
+                        "followings",
+                        self.collector.app.get_user_followings,
+                        account=account,
+                        username=account,
+                        pages=1,
+                        wait_time=3,
+                        cursor=cursor  # Use cursor from previous response
+                    )
+                except Exception as e:
+                    # A saved cursor can expire; retrying it would fail every crawl
+                    if mode == "resume" and current_page == 0 and \
+                            classify_error(e) not in ("rate_limit", "auth", "transient", "circuit_open"):
+                        logger.warning(f"[{self.collector.collector_id}] Saved following cursor for @{account} "
+                                       f"failed, restarting the sweep")
+                        with connect() as conn:
+                            self._save_crawl_state(conn.cursor(), account, None, 0)
+                            conn.commit()
+                    raise
 
                 if not response or not response.users:
-                    print(f"[{self.collector.collector_id}] No followings found on page {current_page + 1}")
+                    logger.debug(f"[{self.collector.collector_id}] No followings found on page {pages_done + 1}")
+                    cursor = None
                     break
 
                 # Filter out duplicates
                 new_users = [user for user in response.users if user.id not in seen_ids]
                 seen_ids.update(user.id for user in new_users)
                 followings.extend(new_users)
-                
-                print(f"[{self.collector.collector_id}] Found {len(new_users)} new followings on page {current_page + 1}")
+                pages_done += 1
+                cursor = response.cursor
 
-                # Store followings in database
-                with sqlite3.connect(DB_PATH, timeout=20) as conn:
+                with connect() as conn, db_write(conn, "followings_page"):
                     c = conn.cursor()
                     now = datetime.now().isoformat()
                     
                     # Store the followings
-                    for user in new_users:
-                        c.execute('''
-                            INSERT OR IGNORE INTO account_followings 
-                            (follower, following, following_id, discovered_at)
-                            VALUES (?, ?, ?, ?)
-                        ''', (account, user.username, user.id, now))
-                    
-                    # Log the check
-                    c.execute('''
-                        INSERT OR REPLACE INTO following_check_log
-                        (username, page_checked, checked_at)
-                        VALUES (?, ?, ?)
-                    ''', (account, current_page + 1, now))
+                    c.executemany('''
+                        INSERT OR IGNORE INTO account_followings 
+                        (follower, following, following_id, discovered_at, swept_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', [(account, user.username, user.id, now, sweep_started_at) for user in new_users])
+                    new_edges = c.rowcount
+                    if sweep_started_at:
+                        # Mark known edges as seen, so completing the sweep keeps them
+                        c.executemany('''
+                            UPDATE account_followings SET swept_at = ?
+                            WHERE follower = ? AND following = ?
+                        ''', [(sweep_started_at, account, user.username) for user in new_users])
+                    new_total += new_edges
+                    self.collector.yield_tracker.credit('account_followings', new_edges)
                     
-                    # Update user's following count
-                    c.execute('''
-                        INSERT OR REPLACE INTO users (
-                            username, twitter_id, following_count,
-                            followers_count, tweet_count, listed_count,
-                            created_at, description, location, url,
-                            verified, profile_image_url, profile_banner_url,
-                            last_following_check
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        account, 
-                        user_info.id,
-                        total_following,
-                        getattr(user_info, 'followers_count', 0),
-                        getattr(user_info, 'statuses_count', 0),
-                        getattr(user_info, 'listed_count', 0),
-                        getattr(user_info, 'created_at', None),
-                        getattr(user_info, 'description', None),
-                        getattr(user_info, 'location', None),
-                        getattr(user_info, 'url', None),
-                        getattr(user_info, 'verified', False),
-                        getattr(user_info, 'profile_image_url', None),
-                        getattr(user_info, 'profile_banner_url', None),
-                        now
-                    ))
+                    # Queue newly seen accounts for discovery
+                    self.collector.discovery_manager.discover(c, [user.username for user in new_users])
                     
+                    # Checkpoint sweeps so an interrupted crawl can resume; refreshes never resume
+                    self._save_crawl_state(c, account, cursor if mode != "refresh" else None,
+                                           pages_done if mode != "refresh" else 0, sweep_started_at)
                     conn.commit()
 
-                print(f"[{self.collector.collector_id}] Stored {len(new_users)} followings from page {current_page + 1}")
+                logger.debug(f"[{self.collector.collector_id}] Stored {new_edges} new followings from page {pages_done}")
                 
-                # Get cursor for next page
-                cursor = response.cursor
+                if mode == "refresh" and new_edges == 0:
+                    logger.info(f"[{self.collector.collector_id}] Reached known followings, refresh complete")
+                    break
                 if not cursor:
                     break
 
-            print(f"[{self.collector.collector_id}] Stored {len(followings)} unique followings for @{account}")
+            with connect() as conn:
+                c = conn.cursor()
+                now = datetime.now().isoformat()
+                c.execute('UPDATE users SET last_following_check = ? WHERE username = ?', (now, account))
+                if mode != "refresh" and not cursor:
+                    # Reached the end of the list: the sweep is complete
+                    if sweep_started_at:
+                        removed = self._remove_unseen(c, account, sweep_started_at)
+                        if removed:
+                            logger.info(f"[{self.collector.collector_id}] @{account} unfollowed {removed} accounts")
+                    self._save_crawl_state(c, account, None, 0, None, now, total_following)
+                conn.commit()
+
+            logger.info(f"[{self.collector.collector_id}] Checked {len(followings)} followings for @{account}, {new_total} new")
             
             # Natural pause after following fetch
             sleep_time = random.uniform(30, 60)
-            print(f"[{self.collector.collector_id}] Sleeping {sleep_time:.1f}s after following fetch")
+            logger.debug(f"[{self.collector.collector_id}] Sleeping {sleep_time:.1f}s after following fetch")
             await asyncio.sleep(sleep_time)
+            return True
             
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Error fetching followings for {account}: {str(e)}")
-            # Log error details for debugging
-            print(f"[{self.collector.collector_id}] Error details: {type(e).__name__}")
-            return False
\ No newline at end of file
+            logger.error(f"[{self.collector.collector_id}] Error fetching followings for {account} "
+                         f"({type(e).__name__}): {str(e)}")
+            return False
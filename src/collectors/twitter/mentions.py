@@ -1,9 +1,11 @@
-import sqlite3
+import logging
 from datetime import datetime
 import re
-from src.database.db import DB_PATH
+from src.database.db import connect
 from .constants import MENTION_TYPES
 
+logger = logging.getLogger(__name__)
+
 class MentionManager:
     def __init__(self, collector):
         self.collector = collector
@@ -16,9 +18,10 @@ class MentionManager:
             mentions = self.mention_pattern.findall(tweet.text)
             mention_type = self._determine_mention_type(tweet)
             
-            with sqlite3.connect(DB_PATH, timeout=20) as conn:
+            with connect() as conn:
                 c = conn.cursor()
                 now = datetime.now().isoformat()
+                new_mentions = 0
                 
                 for username in mentions:
                     c.execute('''
@@ -34,10 +37,12 @@ class MentionManager:
                         now,
                         self.collector.collector_id
                     ))
+                    new_mentions += c.rowcount
+                self.collector.yield_tracker.credit('tweet_mentions', new_mentions)
                 conn.commit()
                 
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Error processing mentions: {str(e)}")
+            logger.error(f"[{self.collector.collector_id}] Error processing mentions: {str(e)}")
     
     def _determine_mention_type(self, tweet):
         """Determine the type of mention based on tweet context"""
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from time import perf_counter, time
+from src.database.db import DB_PATH, connect
+from src.database.querystats import QUERY_STATS, QUERY_STATS_DIR
+from src.utils.logging import update_status, log_queue_depth
+from src.utils.metrics import Counter, Gauge, Histogram, SIZE_BUCKETS, write_snapshot
+from src.utils.tracing import TRACER, span
+from .diagnostics import ProfileRequests
+from .constants import (
+    METRICS_FLUSH_INTERVAL,
+    LOOP_LAG_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = DB_PATH.parent / "metrics"
+
+STEP_SECONDS = Histogram('collector_step_seconds', 'Workflow step duration', ['step'])
+STEP_ERRORS = Counter('collector_step_errors', 'Workflow steps that raised', ['step', 'error_class'])
+API_CALL_SECONDS = Histogram('collector_api_call_seconds', 'TwitterAsync call latency', ['endpoint', 'method'])
+API_CALL_ERRORS = Counter('collector_api_call_errors', 'Failed TwitterAsync calls', ['endpoint', 'error_class'])
+DB_WRITE_SECONDS = Histogram('collector_db_write_seconds', 'Duration of a write transaction', ['batch'])
+DB_WRITE_ROWS = Histogram('collector_db_write_rows', 'Rows changed by a write transaction', ['batch'],
+                          buckets=SIZE_BUCKETS)
+RATE_LIMIT_SLEEP = Counter('collector_rate_limit_sleep_seconds', 'Time spent waiting for rate budget', ['source'])
+NEW_ROWS = Counter('collector_new_rows', 'Rows added per table, credited by the yield tracker', ['table'])
+LOOP_LAG = Histogram('collector_event_loop_lag_seconds', 'How late the event loop ran a timed callback',
+                     buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+QUEUE_DEPTH = Gauge('collector_queue_depth', 'Items waiting in work queues', ['queue'])
+TREND_BURSTS = Counter('collector_trend_bursts', 'Terms detected bursting above their baseline', ['kind'])
+DB_WAL_PAGES = Gauge('collector_db_wal_pages', 'Pages in the WAL and how many are checkpointed', ['state'])
+
+# Pending work in the database, counted through partial or covering indexes
+QUEUE_QUERIES = {
+    'engagement_candidates': 'SELECT COUNT(*) FROM engagement_candidates WHERE processed_at IS NULL',
+    'account_frontier': 'SELECT COUNT(*) FROM account_frontier WHERE promoted_at IS NULL',
+    'accounts_due': "SELECT COUNT(*) FROM tracked_accounts WHERE state = 'active' AND next_fetch_at <= ?",
+    'repolls_due': "SELECT COUNT(*) FROM engagement_repolls WHERE state = 'active' AND next_poll_at <= ?"
+}
+
+@contextmanager
+def db_write(conn, batch):
+    """Time a write transaction, count the rows it changed and trace it as a span.
+
+    Used as the second item of `with connect() as conn, db_write(conn, ...)`.
+    It exits before the connection does, so it only times the commit when
+    the block commits itself, as every call site does.
+    """
+    changes = conn.total_changes
+    start = perf_counter()
+    with span(f"db:{batch}", "db") as args:
+        try:
+            yield
+        finally:
+            rows = conn.total_changes - changes
+            args["rows"] = rows
+            DB_WRITE_SECONDS.labels(batch).observe(perf_counter() - start)
+            DB_WRITE_ROWS.labels(batch).observe(rows)
+
+def record_sleep(source, seconds):
+    if seconds > 0:
+        RATE_LIMIT_SLEEP.labels(source).inc(seconds)
+
+def update_queue_depths():
+    with connect() as conn:
+        c = conn.cursor()
+        for name, query in QUEUE_QUERIES.items():
+            c.execute(query, (time(),) if '?' in query else ())
+            QUEUE_DEPTH.labels(name).set(c.fetchone()[0])
+    QUEUE_DEPTH.labels('log_records').set(log_queue_depth())
+
+async def monitor(collector):
+    """Sample event loop lag, pick up profile requests, and publish trends, metrics,
+    query stats, traces and status periodically.
+
+    Snapshots are written for the API process, which serves /metrics and /db/queries.
+    """
+    profiles = ProfileRequests(collector)
+    last_flush = 0
+    while True:
+        start = perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        LOOP_LAG.labels().observe(max(0.0, perf_counter() - start - LOOP_LAG_INTERVAL))
+        profiles.poll()
+        collector.trend_detector.publish()
+
+        if time() - last_flush >= METRICS_FLUSH_INTERVAL:
+            last_flush = time()
+            try:
+                update_queue_depths()
+                if collector.db_maintenance.last_checkpoint:
+                    _, wal_pages, checkpointed = collector.db_maintenance.last_checkpoint
+                    DB_WAL_PAGES.labels('total').set(wal_pages)
+                    DB_WAL_PAGES.labels('checkpointed').set(checkpointed)
+                write_snapshot(METRICS_DIR / f"{collector.collector_id}.json")
+                QUERY_STATS.write(QUERY_STATS_DIR / f"{collector.collector_id}.json")
+                await TRACER.flush_async()
+                update_status(collector.current_step)
+            except Exception as e:
+                logger.warning(f"[{collector.collector_id}] Error publishing metrics: {str(e)}")
@@ -0,0 +1,80 @@
+import logging
+import asyncio
+from time import time
+from datetime import datetime
+from .constants import (
+    DAILY_CALL_BUDGET,
+    ACTION_BUDGET_SHARES,
+    ENDPOINT_ACTIONS,
+    PACED_CALLS_PER_WINDOW,
+    PLANNER_BURST,
+    NIGHT_HOURS,
+    NIGHT_CHECK_CHANCE
+)
+from .metrics import record_sleep
+
+logger = logging.getLogger(__name__)
+
+def default_hourly_profile():
+    """Full weight by day, NIGHT_CHECK_CHANCE of it during NIGHT_HOURS"""
+    return [NIGHT_CHECK_CHANCE if hour in NIGHT_HOURS else 1.0 for hour in range(24)]
+
+class RateBudgetPlanner:
+    """Split the daily call budget across actions and hours, and pace calls within it.
+
+    Each action gets `DAILY_CALL_BUDGET * hour weight * action share` calls
+    in an hour, and its calls are spaced evenly through the hour with a small
+    burst allowance. All calls together are also paced under
+    PACED_CALLS_PER_WINDOW per 15 minutes, below RateLimiter's threshold, so
+    the emergency brake never has to fire. Workflows can override the budget,
+    shares and hourly profile through their constants.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.next_slot = {}  # action -> earliest time the next call is on schedule
+
+    def _setting(self, name, default):
+        return self.collector.workflow.constants.get(name, default)
+
+    def action_for(self, endpoint):
+        return ENDPOINT_ACTIONS.get(endpoint.split('/')[0], 'tweets')
+
+    def hourly_allocation(self, action, hour=None):
+        """Calls planned for an action in the given hour"""
+        hour = datetime.now().hour if hour is None else hour
+        profile = self._setting("HOURLY_CALL_PROFILE", None) or default_hourly_profile()
+        shares = self._setting("ACTION_BUDGET_SHARES", ACTION_BUDGET_SHARES)
+        daily = self._setting("DAILY_CALL_BUDGET", DAILY_CALL_BUDGET)
+
+        hour_calls = min(daily * profile[hour] / sum(profile), 4 * PACED_CALLS_PER_WINDOW)
+        return hour_calls * shares.get(action, 0) / sum(shares.values())
+
+    def plan(self):
+        """Planned calls per hour and action for the day"""
+        shares = self._setting("ACTION_BUDGET_SHARES", ACTION_BUDGET_SHARES)
+        return {
+            hour: {action: round(self.hourly_allocation(action, hour), 1) for action in shares}
+            for hour in range(24)
+        }
+
+    async def acquire(self, endpoint):
+        """Wait until a call to `endpoint` fits its action's pace and the global pace"""
+        action = self.action_for(endpoint)
+        spacings = {
+            action: 3600 / max(self.hourly_allocation(action), 1),
+            "all": 900 / PACED_CALLS_PER_WINDOW
+        }
+
+        now = time()
+        wait = max(self.next_slot.get(key, now) - PLANNER_BURST * spacing - now
+                   for key, spacing in spacings.items())
+        if wait > 0:
+            logger.debug(f"[{self.collector.collector_id}] Pacing {action} call: waiting {wait:.1f}s for budget")
+            record_sleep("planner", wait)
+            await asyncio.sleep(wait)
+
+        now = time()
+        for key, spacing in spacings.items():
+            self.next_slot[key] = max(self.next_slot.get(key, now), now) + spacing
+        return wait
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from datetime import datetime
+from src.database.db import connect
+from .constants import (
+    PROFILE_FIELD_TTLS,
+    PROFILE_CACHE_SIZE
+)
+
+PROFILE_FIELDS = [
+    'twitter_id', 'following_count', 'followers_count', 'tweet_count',
+    'listed_count', 'created_at', 'description', 'location', 'url',
+    'verified', 'profile_image_url', 'profile_banner_url'
+]
+
+class ProfileManager:
+    """LRU cache of user profiles over the users table.
+
+    A profile is served from memory or the users row while every requested
+    field is younger than its TTL in PROFILE_FIELD_TTLS; otherwise it is
+    fetched with get_user_info and written back once.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.cache = OrderedDict()  # username -> (profile, fetched_at)
+
+    def _remember(self, account, profile, fetched_at):
+        self.cache[account] = (profile, fetched_at)
+        self.cache.move_to_end(account)
+        while len(self.cache) > PROFILE_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def _cached(self, account):
+        """Get a profile from memory, falling back to the users row"""
+        if account in self.cache:
+            self.cache.move_to_end(account)
+            return self.cache[account]
+
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute(f'''
+                SELECT {', '.join(PROFILE_FIELDS)}, profile_fetched_at
+                FROM users WHERE username = ?
+            ''', (account,))
+            row = c.fetchone()
+        if not row or not row[-1]:
+            return None
+
+        profile = dict(zip(PROFILE_FIELDS, row[:-1]))
+        fetched_at = datetime.fromisoformat(row[-1])
+        self._remember(account, profile, fetched_at)
+        return profile, fetched_at
+
+    def _is_fresh(self, fetched_at, fields):
+        age = (datetime.now() - fetched_at).total_seconds()
+        return all(age < PROFILE_FIELD_TTLS.get(field, 0) for field in fields)
+
+    def _profile_from(self, user_info):
+        created_at = getattr(user_info, 'created_at', None)
+        return {
+            'twitter_id': str(user_info.id),
+            'following_count': getattr(user_info, 'friends_count', 0),
+            'followers_count': getattr(user_info, 'followers_count', 0),
+            'tweet_count': getattr(user_info, 'statuses_count', 0),
+            'listed_count': getattr(user_info, 'listed_count', 0),
+            'created_at': str(created_at) if created_at else None,
+            'description': getattr(user_info, 'description', None),
+            'location': getattr(user_info, 'location', None),
+            'url': getattr(user_info, 'url', None),
+            'verified': 1 if getattr(user_info, 'verified', False) else 0,
+            'profile_image_url': getattr(user_info, 'profile_image_url', None),
+            'profile_banner_url': getattr(user_info, 'profile_banner_url', None)
+        }
+
+    def _store(self, account, profile, fetched_at):
+        """Upsert the profile columns, leaving crawl bookkeeping columns alone.
+
+        twitter_id is unique, so after a rename the row under the old
+        username gives it up first; that row's own columns are kept.
+        """
+        columns = PROFILE_FIELDS + ['profile_fetched_at']
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns)
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute('UPDATE users SET twitter_id = NULL WHERE twitter_id = ? AND username != ?',
+                      (profile['twitter_id'], account))
+            c.execute(f'''
+                INSERT INTO users (username, {', '.join(columns)})
+                VALUES (?, {', '.join('?' for _ in columns)})
+                ON CONFLICT(username) DO UPDATE SET {updates}
+            ''', [account] + [profile[field] for field in PROFILE_FIELDS] + [fetched_at.isoformat()])
+            conn.commit()
+
+    async def get_profile(self, account, fields=('following_count',)):
+        """Get a profile dict, calling get_user_info only if a requested field is stale"""
+        cached = self._cached(account)
+        if cached and self._is_fresh(cached[1], fields):
+            return cached[0]
+
+        user_info = await self.collector.call_api("user_info", self.collector.app.get_user_info,
+                                                  account, account=account)
+        if not user_info:
+            return None
+
+        profile = self._profile_from(user_info)
+        fetched_at = datetime.now()
+        self._store(account, profile, fetched_at)
+        self._remember(account, profile, fetched_at)
+        return profile
+
+    def stored_tweet_count(self, account):
+        """Tweets we have stored for an author, kept current by an insert trigger"""
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute('SELECT stored_tweet_count FROM users WHERE username = ?', (account,))
+            row = c.fetchone()
+        return (row[0] or 0) if row else 0
@@ -0,0 +1,133 @@
+import asyncio
+from time import time, perf_counter
+import aiohttp
+from .circuit_breaker import backoff_delay
+from .constants import (
+    PROXY_LATENCY_ALPHA,
+    PROXY_MAX_FAILURES,
+    PROXY_COOLDOWN_BASE,
+    PROXY_COOLDOWN_MAX,
+    PROXY_SWITCH_RATIO,
+    PROXY_PROBE_URL,
+    PROXY_PROBE_TIMEOUT
+)
+
+def redact(url):
+    """Proxy URL without its credentials, for logs and status"""
+    if not url:
+        return url
+    scheme, _, address = url.rpartition("://")
+    return f"{scheme}://{address.split('@')[-1]}" if scheme else address.split('@')[-1]
+
+class ProxyStats:
+    def __init__(self, url):
+        self.url = url
+        self.latency = None      # Rolling (EWMA) probe seconds, comparable across proxies
+        self.call_latency = None # Rolling (EWMA) seconds per API call through this proxy
+        self.error_rate = 0.0    # Rolling share of failed calls
+        self.failures = 0        # Consecutive failures
+        self.level = 0           # Cooldown backoff level
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def healthy(self):
+        return self.cooldown_until <= time()
+
+    @property
+    def score(self):
+        """Lower is better; probes are preferred as they time the same request everywhere"""
+        latency = next((l for l in (self.latency, self.call_latency) if l is not None), PROXY_PROBE_TIMEOUT)
+        return latency * (1 + 4 * self.error_rate)
+
+class ProxyPool:
+    """Proxies with rolling latency/error scores and sticky per-session assignment.
+
+    The session keeps its proxy until that proxy fails PROXY_MAX_FAILURES
+    times in a row (it then cools down with backoff) or a healthy proxy
+    becomes PROXY_SWITCH_RATIO times faster; either way `should_failover`
+    tells the collector to rebuild its session on `best()`.
+    """
+
+    def __init__(self, urls):
+        self.proxies = {url: ProxyStats(url) for url in urls}
+        self.current = None
+
+    def __bool__(self):
+        return bool(self.proxies)
+
+    def best(self):
+        """Fastest healthy proxy, or the one leaving cooldown soonest"""
+        healthy = [p for p in self.proxies.values() if p.healthy]
+        if healthy:
+            return min(healthy, key=lambda p: p.score).url
+        return min(self.proxies.values(), key=lambda p: p.cooldown_until).url
+
+    def assign(self):
+        self.current = self.best() if self.proxies else None
+        return self.current
+
+    def record(self, latency, failed, url=None, probe=False):
+        """Update a proxy's rolling stats after an API call or probe through it"""
+        stats = self.proxies.get(url or self.current)
+        if not stats:
+            return
+        stats.calls += 1
+        stats.error_rate = (1 - PROXY_LATENCY_ALPHA) * stats.error_rate + PROXY_LATENCY_ALPHA * (1 if failed else 0)
+        if failed:
+            stats.errors += 1
+            stats.failures += 1
+            if stats.failures >= PROXY_MAX_FAILURES:
+                stats.cooldown_until = time() + backoff_delay(PROXY_COOLDOWN_BASE, stats.level, PROXY_COOLDOWN_MAX)
+                stats.level += 1
+                stats.failures = 0
+        else:
+            stats.failures = 0
+            stats.level = 0
+            attr = 'latency' if probe else 'call_latency'
+            previous = getattr(stats, attr)
+            setattr(stats, attr, latency if previous is None else
+                    (1 - PROXY_LATENCY_ALPHA) * previous + PROXY_LATENCY_ALPHA * latency)
+
+    def should_failover(self):
+        if not self.current or len(self.proxies) < 2:
+            return False
+        current = self.proxies[self.current]
+        best = self.proxies[self.best()]
+        if best.url == current.url:
+            return False
+        return not current.healthy or best.score * PROXY_SWITCH_RATIO < current.score
+
+    async def probe(self):
+        """Time the same lightweight request through every proxy"""
+        async def probe_one(stats):
+            start = perf_counter()
+            try:
+                timeout = aiohttp.ClientTimeout(total=PROXY_PROBE_TIMEOUT)
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.head(PROXY_PROBE_URL, proxy=stats.url) as response:
+                        failed = response.status >= 500
+            except Exception:
+                failed = True
+            self.record(perf_counter() - start, failed, url=stats.url, probe=True)
+
+        # aiohttp only speaks HTTP proxies; SOCKS proxies are scored from real calls
+        targets = [p for p in self.proxies.values() if p.url.startswith("http")]
+        await asyncio.gather(*(probe_one(stats) for stats in targets))
+
+    def status(self):
+        return [
+            {
+                "url": redact(stats.url),
+                "current": stats.url == self.current,
+                "healthy": stats.healthy,
+                "latency": round(stats.latency, 3) if stats.latency is not None else None,
+                "call_latency": round(stats.call_latency, 3) if stats.call_latency is not None else None,
+                "error_rate": round(stats.error_rate, 3),
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "cooldown_in": round(max(0, stats.cooldown_until - time()), 1)
+            }
+            for stats in self.proxies.values()
+        ]
@@ -1,21 +1,51 @@
-import sqlite3
+import logging
 from datetime import datetime, timedelta
 import random
 import asyncio
-from src.database.db import DB_PATH
+from src.database.db import DB_PATH, connect
+from src.utils.token_bucket import SharedTokenBuckets
 from .constants import (
     RATE_LIMIT_MAX,
-    RATE_LIMIT_THRESHOLD
+    RATE_LIMIT_THRESHOLD,
+    ENDPOINT_BUCKETS
 )
+from .metrics import record_sleep
+
+logger = logging.getLogger(__name__)
 
 class RateLimiter:
     def __init__(self, collector):
         self.collector = collector
         self.last_call_time = None
+        self.call_count = 0  # Calls logged by this process, for per-step yield accounting
+        self._buckets = None
+
+    @property
+    def buckets(self):
+        """Token buckets shared by every process using this collector's account"""
+        if self._buckets is None:
+            self._buckets = SharedTokenBuckets(
+                DB_PATH.parent / f"token_buckets_{self.collector.collector_id}.bin",
+                {name: (capacity, per_window / 900) for name, (capacity, per_window) in ENDPOINT_BUCKETS.items()}
+            )
+        return self._buckets
+
+    async def reserve(self, endpoint):
+        """Reserve a token for the endpoint and the global spacing bucket, then wait for them"""
+        endpoint_class = endpoint.split('/')[0]
+        waits = [self.buckets.reserve('global')]
+        if endpoint_class in ENDPOINT_BUCKETS:
+            waits.append(self.buckets.reserve(endpoint_class))
+        
+        wait = max(waits)
+        if wait > 0:
+            record_sleep("token_bucket", wait)
+            await asyncio.sleep(wait)
+        return wait
 
     async def check_rate_limit(self):
         """Get current number of API calls in last 15 minutes"""
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             fifteen_mins_ago = (datetime.now() - timedelta(minutes=15)).isoformat()
             c.execute('SELECT COUNT(*) FROM api_calls WHERE timestamp > ? AND collector_id = ?', 
@@ -23,18 +53,13 @@ class RateLimiter:
             return c.fetchone()[0]
 
     async def log_api_call(self, endpoint):
-        """Log an API call and enforce minimum delay"""
-        # Enforce minimum 2s between calls
+        """Log an API call; spacing is enforced by the shared 'global' bucket in reserve()"""
         now = datetime.now()
-        if self.last_call_time:
-            elapsed = (now - self.last_call_time).total_seconds()
-            if elapsed < 2:
-                await asyncio.sleep(2 - elapsed)
-        
         self.last_call_time = now
+        self.call_count += 1
 
         # Log the call
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute('INSERT INTO api_calls (timestamp, endpoint, collector_id) VALUES (?, ?, ?)',
                      (now.isoformat(), endpoint, self.collector.collector_id))
@@ -47,14 +72,16 @@ class RateLimiter:
         if calls >= RATE_LIMIT_MAX:
             # Emergency brake - sleep longer
             wait_time = random.uniform(600, 900)  # 10-15 mins
-            print(f"[{self.collector.collector_id}] Rate limit max reached ({calls}/50). Sleeping {wait_time/60:.1f}m")
+            logger.warning(f"[{self.collector.collector_id}] Rate limit max reached ({calls}/50). Sleeping {wait_time/60:.1f}m")
+            record_sleep("rate_window", wait_time)
             await asyncio.sleep(wait_time)
             return True
         
         elif calls >= RATE_LIMIT_THRESHOLD:
             # Getting close - quick pause
             wait_time = random.uniform(60, 180)  # 1-3 mins
-            print(f"[{self.collector.collector_id}] Rate limit threshold ({calls}/50). Pausing {wait_time/60:.1f}m")
+            logger.warning(f"[{self.collector.collector_id}] Rate limit threshold ({calls}/50). Pausing {wait_time/60:.1f}m")
+            record_sleep("rate_window", wait_time)
             await asyncio.sleep(wait_time)
             return True
         
@@ -66,13 +93,15 @@ class RateLimiter:
         
         if calls >= RATE_LIMIT_MAX:
             wait_time = random.uniform(600, 900)  # 10-15 mins
-            print(f"[{self.collector.collector_id}] Rate limit max reached ({calls}/50 calls). Sleeping {wait_time/60:.1f}m")
+            logger.warning(f"[{self.collector.collector_id}] Rate limit max reached ({calls}/50 calls). Sleeping {wait_time/60:.1f}m")
+            record_sleep("rate_window", wait_time)
             await asyncio.sleep(wait_time)
             return True
         
         elif calls >= RATE_LIMIT_THRESHOLD:
             wait_time = random.uniform(60, 180)  # 1-3 mins
-            print(f"[{self.collector.collector_id}] Rate limit threshold ({calls}/50 calls). Pausing {wait_time/60:.1f}m")
+            logger.warning(f"[{self.collector.collector_id}] Rate limit threshold ({calls}/50 calls). Pausing {wait_time/60:.1f}m")
+            record_sleep("rate_window", wait_time)
             await asyncio.sleep(wait_time)
             return True
         
@@ -0,0 +1,146 @@
+import logging
+from datetime import datetime
+from time import time
+from src.database.db import connect
+from .constants import (
+    REPOLL_BASE_INTERVAL,
+    REPOLL_BACKOFF,
+    REPOLL_MAX_INTERVAL,
+    REPOLL_MAX_POLLS,
+    REPOLL_MAX_AGE_HOURS,
+    REPOLL_MIN_VELOCITY,
+    REPOLL_BATCH_SIZE
+)
+from .metrics import db_write
+
+logger = logging.getLogger(__name__)
+
+# Engagement counts a tweet is sighted with, in the order of COUNT_ATTRS
+COUNT_COLUMNS = ('likes', 'retweets', 'views', 'bookmark_count', 'reply_counts', 'quote_counts')
+COUNT_ATTRS = ('likes', 'retweet_counts', 'views', 'bookmark_count', 'reply_counts', 'quote_counts')
+
+# Appended to `INSERT INTO tweets ... VALUES (...)` in place of INSERT OR IGNORE: a
+# tweet seen again only has its counts updated, and only upwards, so a sighting
+# missing a count never lowers it. trg_tweets_engagement_snapshot logs the deltas.
+COUNTS_UPSERT = 'ON CONFLICT(id) DO UPDATE SET ' + ', '.join(
+    f'{column} = COALESCE(MAX({column}, excluded.{column}), {column}, excluded.{column})'
+    for column in COUNT_COLUMNS
+)
+
+def tweet_counts(tweet):
+    return tuple(getattr(tweet, attr, None) for attr in COUNT_ATTRS)
+
+def tweet_age_seconds(created_at):
+    """Seconds since a tweet's created_at, or None if it can't be parsed.
+
+    Managers store created_at as str(datetime) or isoformat(), in UTC, so it
+    is parsed rather than compared as text.
+    """
+    try:
+        created = created_at if isinstance(created_at, datetime) else datetime.fromisoformat(str(created_at))
+    except ValueError:
+        return None
+    return (datetime.now(created.tzinfo) - created).total_seconds()
+
+class RepollManager:
+    """Re-fetches tweets whose engagement is still growing, with decaying frequency.
+
+    Tweets queued for the engagement crawl are also watched here. Each due
+    tweet is fetched again and its counts upserted, which appends a row to
+    `engagement_snapshots`. While likes + retweets keep growing by at least
+    REPOLL_MIN_VELOCITY an hour the next poll is scheduled REPOLL_BACKOFF
+    times later than the last; otherwise, or once the tweet is too old or
+    polled too often, it cools and is left alone.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def watch(self, c, tweets):
+        """Schedule the first re-poll of tweets not watched yet, within the caller's transaction.
+
+        Takes (tweet_id, likes + retweets) pairs; the score is the baseline for the first velocity.
+        """
+        now = time()
+        c.executemany('''
+            INSERT OR IGNORE INTO engagement_repolls
+            (tweet_id, next_poll_at, interval, polls, last_score, last_polled_at)
+            VALUES (?, ?, ?, 0, ?, ?)
+        ''', [(str(tweet_id), now + REPOLL_BASE_INTERVAL, REPOLL_BASE_INTERVAL, score, now)
+              for tweet_id, score in tweets])
+
+    def due(self, limit):
+        """Due tweets, retiring those too old or polled too often"""
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT r.tweet_id, r.interval, r.polls, r.last_score, r.last_polled_at, t.created_at
+                FROM engagement_repolls r
+                LEFT JOIN tweets t ON t.id = r.tweet_id
+                WHERE r.state = 'active' AND r.next_poll_at <= ?
+                ORDER BY r.next_poll_at
+                LIMIT ?
+            ''', (time(), limit))
+            rows = c.fetchall()
+
+            due, retired = [], []
+            for tweet_id, interval, polls, score, last_polled_at, created_at in rows:
+                age = tweet_age_seconds(created_at) if created_at is not None else None
+                if age is None or age > REPOLL_MAX_AGE_HOURS * 3600 or polls >= REPOLL_MAX_POLLS:
+                    retired.append((tweet_id,))
+                else:
+                    due.append((tweet_id, interval, score, last_polled_at))
+            c.executemany("UPDATE engagement_repolls SET state = 'done' WHERE tweet_id = ?", retired)
+            conn.commit()
+        return due
+
+    async def repoll_engagement(self, limit=REPOLL_BATCH_SIZE):
+        """Re-fetch due tweets and reschedule them by engagement velocity; returns tweets polled"""
+        polled = 0
+        for tweet_id, interval, score, last_polled_at in self.due(limit):
+            try:
+                tweet = await self.collector.call_api("tweet_detail", self.collector.app.tweet_detail, tweet_id)
+            except Exception as e:
+                logger.warning(f"[{self.collector.collector_id}] Re-poll of tweet {tweet_id} failed: {str(e)}")
+                tweet = None
+
+            now = time()
+            if tweet is None:
+                # Retried at the same interval; the poll still counts towards REPOLL_MAX_POLLS
+                state, velocity, next_interval = 'active', None, interval
+            else:
+                counts = tweet_counts(tweet)
+                new_score = (counts[0] or 0) + (counts[1] or 0)
+                velocity = (new_score - (score or 0)) / max((now - last_polled_at) / 3600, 1 / 60)
+                score = new_score
+                if velocity >= REPOLL_MIN_VELOCITY:
+                    state, next_interval = 'active', min(interval * REPOLL_BACKOFF, REPOLL_MAX_INTERVAL)
+                else:
+                    state, next_interval = 'cooled', interval
+
+            with connect() as conn, db_write(conn, "engagement_repoll"):
+                c = conn.cursor()
+                if tweet is not None:
+                    c.execute(f'''
+                        UPDATE tweets SET {', '.join(f'{column} = COALESCE(MAX({column}, ?), {column}, ?)'
+                                                     for column in COUNT_COLUMNS)}
+                        WHERE id = ?
+                    ''', (*(value for count in counts for value in (count, count)), str(tweet_id)))
+                    self.collector.engagement_manager.enqueue_candidates(
+                        c, [(tweet_id, tweet.author.username, counts[0], counts[1])])
+                c.execute('''
+                    UPDATE engagement_repolls
+                    SET state = ?, interval = ?, next_poll_at = ?, polls = polls + 1,
+                        last_score = ?, last_polled_at = ?, velocity = COALESCE(?, velocity)
+                    WHERE tweet_id = ?
+                ''', (state, next_interval, now + next_interval, score, now, velocity, tweet_id))
+                conn.commit()
+
+            polled += 1
+            logger.debug("[%s] Re-polled tweet %s: %s/h, %s",
+                         self.collector.collector_id, tweet_id,
+                         f"{velocity:.1f}" if velocity is not None else "n/a", state)
+
+        if polled:
+            logger.info(f"[{self.collector.collector_id}] Re-polled {polled} tweets for engagement")
+        return polled
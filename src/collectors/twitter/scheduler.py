@@ -0,0 +1,140 @@
+import logging
+import math
+import random
+from time import time
+from src.database.db import connect
+from .constants import (
+    BANDIT_HALF_LIFE,
+    BANDIT_EXPLORATION,
+    RATE_LIMIT_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+# Tables whose new rows count as yield: tweets covers timeline, account and reply tweets
+YIELD_TABLES = ['tweets', 'account_followings']
+
+class ArmStats:
+    """Exponentially decayed yield and call totals for one workflow step"""
+
+    def __init__(self):
+        self.rows = 0.0
+        self.calls = 0.0
+        self.pulls = 0.0
+        self.last_update = time()
+        self.last_run = None
+
+    def decay(self, now):
+        factor = 0.5 ** ((now - self.last_update) / BANDIT_HALF_LIFE)
+        self.rows *= factor
+        self.calls *= factor
+        self.pulls *= factor
+        self.last_update = now
+
+    @property
+    def yield_per_call(self):
+        return self.rows / self.calls if self.calls > 0 else 0.0
+
+    @property
+    def calls_per_pull(self):
+        return self.calls / self.pulls if self.pulls > 0 else 1.0
+
+class BanditScheduler:
+    """Choose the next workflow step with a UCB1 bandit on new rows per API call.
+
+    Steps run more recently than their `min_interval` are not eligible, a step
+    idle for longer than its `max_interval` is forced, and steps expected to
+    spend more calls than remain under the rate threshold are held back.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.arms = {}
+
+    def _arm(self, name):
+        if name not in self.arms:
+            self.arms[name] = ArmStats()
+        return self.arms[name]
+
+    def snapshot(self):
+        """Current API call count and row high-water marks, to diff after a step"""
+        with connect() as conn:
+            c = conn.cursor()
+            marks = {}
+            for table in YIELD_TABLES:
+                c.execute(f'SELECT MAX(rowid) FROM {table}')
+                marks[table] = c.fetchone()[0] or 0
+        return self.collector.rate_limiter.call_count, marks
+
+    def record(self, name, before):
+        """Credit a step with the rows and calls it produced since `before`"""
+        calls_before, marks_before = before
+        calls_after, marks_after = self.snapshot()
+        rows = sum(marks_after[t] - marks_before[t] for t in YIELD_TABLES)
+        calls = calls_after - calls_before
+
+        now = time()
+        arm = self._arm(name)
+        arm.decay(now)
+        arm.rows += rows
+        arm.calls += calls
+        arm.pulls += 1
+        arm.last_run = now
+        logger.info(f"[{self.collector.collector_id}] Step {name}: {rows} new rows from {calls} calls "
+                    f"({arm.yield_per_call:.2f} rows/call decayed)")
+        return rows, calls
+
+    async def choose(self, steps):
+        """Pick the next step name from the workflow's steps"""
+        now = time()
+        for name in steps:
+            self._arm(name).decay(now)
+
+        # Steps past their max interval run first, most overdue first
+        overdue = [
+            (now - (self.arms[name].last_run or 0) - step.max_interval, name)
+            for name, step in steps.items()
+            if step.max_interval and now - (self.arms[name].last_run or 0) > step.max_interval
+        ]
+        if overdue:
+            return max(overdue)[1]
+
+        eligible = [
+            name for name, step in steps.items()
+            if not self.arms[name].last_run or now - self.arms[name].last_run >= step.min_interval
+        ]
+        if not eligible:
+            # Everything ran recently; take the step that frees up soonest
+            return min(steps, key=lambda n: self.arms[n].last_run + steps[n].min_interval - now)
+
+        # Respect the remaining call budget in the current rate window
+        remaining = RATE_LIMIT_THRESHOLD - await self.collector.rate_limiter.check_rate_limit()
+        affordable = [name for name in eligible if self.arms[name].calls_per_pull <= remaining]
+        if not affordable:
+            return min(eligible, key=lambda n: self.arms[n].calls_per_pull)
+
+        untried = [name for name in affordable if self.arms[name].pulls == 0]
+        if untried:
+            return random.choice(untried)
+
+        total_pulls = sum(self.arms[name].pulls for name in affordable)
+        best_yield = max(self.arms[name].yield_per_call for name in affordable) or 1.0
+
+        def ucb(name):
+            arm = self.arms[name]
+            bonus = BANDIT_EXPLORATION * math.sqrt(math.log(total_pulls + 1) / arm.pulls)
+            return arm.yield_per_call / best_yield + bonus
+
+        return max(affordable, key=ucb)
+
+    def stats(self):
+        return {
+            name: {
+                "rows": round(arm.rows, 2),
+                "calls": round(arm.calls, 2),
+                "pulls": round(arm.pulls, 2),
+                "yield_per_call": round(arm.yield_per_call, 3),
+                "last_run": arm.last_run
+            }
+            for name, arm in self.arms.items()
+        }
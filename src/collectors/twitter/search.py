@@ -1,15 +1,18 @@
 import sqlite3
 from datetime import datetime
 from src.database.db import Database, DB_PATH
+from src.database.near_duplicates import SPAM_THRESHOLD
+from .repoll import COUNTS_UPSERT
 
 class SearchManager:
     def __init__(self, collector):
         self.collector = collector
         self.db = Database()
     
-    async def search_term(self, search_type: str, term: str, pages: int = 3) -> dict:
+    async def search_term(self, search_type: str, term: str, pages: int = 3, exclude_spam: bool = True) -> dict:
         """
-        Search for term and get metrics from both top and recent tweets
+        Search for term and get metrics from both top and recent tweets,
+        leaving out copies in near-duplicate spam clusters with `exclude_spam`
         """
         try:
             # Pause workflow before search
@@ -42,19 +45,14 @@ class SearchManager:
             await self.collector.rate_limiter.handle_rate_limits()
             
             # Get top tweets
-            await self.collector.rate_limiter.log_api_call(f"search/{search_term}/top")
-            top_tweets = await self.collector.app.search(search_term, pages=pages, filter_="Top")
+            top_tweets = await self.collector.call_api("search/top", self.collector.app.search,
+                                                       search_term, pages=pages, filter_="Top")
             
             # Process top tweets
             for tweet in top_tweets:
                 if not hasattr(tweet, 'id'):
                     continue
                         
-                metrics["top"]["total_tweets"] += 1
-                metrics["top"]["unique_authors"].add(tweet.author.username)
-                metrics["top"]["total_likes"] += tweet.likes
-                metrics["top"]["total_retweets"] += tweet.retweet_counts
-                
                 all_users.add(tweet.author.username)
                 
                 has_media = hasattr(tweet, 'media') and tweet.media
@@ -73,31 +71,16 @@ class SearchManager:
                     media_type, 
                     media_url
                 ))
-                
-                tweet_date = datetime.fromisoformat(str(tweet.date))
-                metrics["top"]["oldest_tweet"] = min(
-                    metrics["top"]["oldest_tweet"] or tweet_date,
-                    tweet_date
-                )
-                metrics["top"]["newest_tweet"] = max(
-                    metrics["top"]["newest_tweet"] or tweet_date,
-                    tweet_date
-                )
             
             # Get recent tweets
-            await self.collector.rate_limiter.log_api_call(f"search/{search_term}/recent")
-            recent_tweets = await self.collector.app.search(search_term, pages=pages, filter_="Latest")
+            recent_tweets = await self.collector.call_api("search/recent", self.collector.app.search,
+                                                          search_term, pages=pages, filter_="Latest")
             
             # Process recent tweets
             for tweet in recent_tweets:
                 if not hasattr(tweet, 'id'):
                     continue
                         
-                metrics["recent"]["total_tweets"] += 1
-                metrics["recent"]["unique_authors"].add(tweet.author.username)
-                metrics["recent"]["total_likes"] += tweet.likes
-                metrics["recent"]["total_retweets"] += tweet.retweet_counts
-                
                 all_users.add(tweet.author.username)
                 
                 has_media = hasattr(tweet, 'media') and tweet.media
@@ -116,32 +99,56 @@ class SearchManager:
                     media_type, 
                     media_url
                 ))
-                
-                tweet_date = datetime.fromisoformat(str(tweet.date))
-                metrics["recent"]["oldest_tweet"] = min(
-                    metrics["recent"]["oldest_tweet"] or tweet_date,
-                    tweet_date
-                )
-                metrics["recent"]["newest_tweet"] = max(
-                    metrics["recent"]["newest_tweet"] or tweet_date,
-                    tweet_date
-                )
             
             # Batch insert all data
             with self.db.get_connection() as conn:
                 c = conn.cursor()
+                marks = self.collector.yield_tracker.mark(c, 'tweets')
                 
                 # Batch insert users
                 c.executemany('INSERT OR IGNORE INTO users (username) VALUES (?)', 
                             [(u,) for u in all_users])
                 
                 # Batch insert tweets
-                c.executemany('''INSERT OR IGNORE INTO tweets 
+                c.executemany(f'''INSERT INTO tweets 
                     (id, author_username, text, created_at, likes, retweets, collected_at,
                      has_media, media_type, media_url)
-                    VALUES (?,?,?,?,?,?,?,?,?,?)''', all_tweets)
+                    VALUES (?,?,?,?,?,?,?,?,?,?)
+                    {COUNTS_UPSERT}''', all_tweets)
+                
+                # Cluster near-duplicates before metrics, so copy-paste spam can be left out
+                spam_scores = self.collector.near_duplicates.assign(c, [(t[0], t[2]) for t in all_tweets])
                 
+                # Queue high-engagement results for the engagement crawl
+                self.collector.engagement_manager.enqueue_candidates(
+                    c, [(t[0], t[1], t[4], t[5]) for t in all_tweets])
+                
+                self.collector.yield_tracker.credit_since(c, marks)
                 conn.commit()
+            
+            spam_excluded = 0
+            for section, section_tweets in (("top", top_tweets), ("recent", recent_tweets)):
+                for tweet in section_tweets:
+                    if not hasattr(tweet, 'id'):
+                        continue
+                    if exclude_spam and spam_scores.get(str(tweet.id), 0) >= SPAM_THRESHOLD:
+                        spam_excluded += 1
+                        continue
+                    
+                    metrics[section]["total_tweets"] += 1
+                    metrics[section]["unique_authors"].add(tweet.author.username)
+                    metrics[section]["total_likes"] += tweet.likes
+                    metrics[section]["total_retweets"] += tweet.retweet_counts
+                    
+                    tweet_date = datetime.fromisoformat(str(tweet.date))
+                    metrics[section]["oldest_tweet"] = min(
+                        metrics[section]["oldest_tweet"] or tweet_date,
+                        tweet_date
+                    )
+                    metrics[section]["newest_tweet"] = max(
+                        metrics[section]["newest_tweet"] or tweet_date,
+                        tweet_date
+                    )
                 
             # Calculate time-based metrics
             now = datetime.now()
@@ -186,6 +193,8 @@ class SearchManager:
                 },
                 "metadata": {
                     "pages_fetched": pages,
+                    "exclude_spam": exclude_spam,
+                    "spam_excluded": spam_excluded,
                     "tweets_per_page": round((metrics["top"]["total_tweets"] + metrics["recent"]["total_tweets"]) / (2 * pages), 2)
                 }
             }
@@ -1,8 +1,10 @@
-import sqlite3
+import logging
 from datetime import datetime
-from src.database.db import DB_PATH
+from src.database.db import connect
 from .constants import THREAD_TYPES
 
+logger = logging.getLogger(__name__)
+
 class ThreadManager:
     def __init__(self, collector):
         self.collector = collector
@@ -13,7 +15,7 @@ class ThreadManager:
             thread_type = self._determine_thread_type(tweet)
             thread_position = await self._calculate_thread_position(tweet)
             
-            with sqlite3.connect(DB_PATH, timeout=20) as conn:
+            with connect() as conn:
                 c = conn.cursor()
                 now = datetime.now().isoformat()
                 
@@ -33,10 +35,11 @@ class ThreadManager:
                     now,
                     self.collector.collector_id
                 ))
+                self.collector.yield_tracker.credit('tweet_threads', c.rowcount)
                 conn.commit()
                 
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Error processing thread: {str(e)}")
+            logger.error(f"[{self.collector.collector_id}] Error processing thread: {str(e)}")
     
     def _determine_thread_type(self, tweet):
         """Determine the type of thread position"""
@@ -53,7 +56,7 @@ class ThreadManager:
         if not getattr(tweet, 'in_reply_to_status_id', None):
             return 0
             
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute('''
                 SELECT COUNT(*) FROM tweet_threads 
@@ -68,7 +71,7 @@ class ThreadManager:
         if not getattr(tweet, 'in_reply_to_status_id', None):
             return None
             
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute('''
                 SELECT author_username FROM tweets 
@@ -82,7 +85,7 @@ class ThreadManager:
         if not getattr(tweet, 'conversation_id', None):
             return tweet.id
             
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute('''
                 SELECT tweet_id FROM tweet_threads 
@@ -95,7 +98,7 @@ class ThreadManager:
             
     def _has_branch_replies(self, tweet):
         """Check if tweet has spawned its own discussion thread"""
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute('''
                 SELECT COUNT(*) FROM tweets 
@@ -1,5 +1,5 @@
+import logging
 from datetime import datetime, timedelta
-import sqlite3
 import random
 import asyncio
 from time import time
@@ -12,9 +12,15 @@ from .constants import (
     MAX_TIMELINE_PAGES,
     MIN_NEW_TWEETS_TO_CONTINUE
 )
-from src.database.db import DB_PATH
+from .metrics import db_write
+from .repoll import COUNTS_UPSERT
+from src.database.db import connect
+from src.utils.logging import sampled
 import json
 
+logger = logging.getLogger(__name__)
+tweet_logger = sampled(logger)
+
 class TimelineManager:
     def __init__(self, collector):
         self.collector = collector
@@ -32,18 +38,20 @@ class TimelineManager:
             await self.collector.rate_limiter.rate_limit_sleep()
             
             timeline_type = random.choice([HOME_TIMELINE_TYPE_FOR_YOU, HOME_TIMELINE_TYPE_FOLLOWING])
-            print(f"\n[{self.collector.collector_id}] Deep scrolling {timeline_type}...")
+            logger.info(f"[{self.collector.collector_id}] Deep scrolling {timeline_type}...")
             
             new_tweets_total = 0
             consecutive_low_pages = 0
             cursor = None  # Initialize cursor
             
             max_pages = max_pages or MAX_TIMELINE_PAGES
-            print(f"[{self.collector.collector_id}] Scrolling up to {max_pages} pages")
+            logger.info(f"[{self.collector.collector_id}] Scrolling up to {max_pages} pages")
             
             for page in range(max_pages):
                 # Get tweets from timeline
-                tweets = await self.collector.app.get_home_timeline(
+                tweets = await self.collector.call_api(
+                    "home_timeline",
+                    self.collector.app.get_home_timeline,
                     timeline_type=timeline_type,
                     pages=1,
                     wait_time=3,
@@ -54,71 +62,85 @@ class TimelineManager:
                 new_tweets = 0
                 
                 # Process tweets...
-                with sqlite3.connect(DB_PATH, timeout=20) as conn:
+                with connect() as conn, db_write(conn, "timeline_page"):
                     c = conn.cursor()
+                    candidates = []
+                    texts = []
                     for tweet in tweets:
                         if not hasattr(tweet, 'id'):
                             continue
                         
-                        print(f"[{self.collector.collector_id}] Processing tweet {tweet.id} by @{tweet.author.username}")
+                        candidates.append((tweet.id, tweet.author.username, tweet.likes,
+                                           getattr(tweet, 'retweet_counts', 0)))
+                        
+                        tweet_logger.debug("[%s] Processing tweet %s by @%s",
+                                           self.collector.collector_id, tweet.id, tweet.author.username)
                         
                         c.execute('SELECT id FROM tweets WHERE id = ?', (tweet.id,))
                         exists = c.fetchone()
                         
-                        if not exists:
-                            try:
-                                c.execute('''
-                                    INSERT INTO tweets (
-                                        id, author_id, author_username, text, 
-                                        created_at, collected_at, collector_id,
-                                        likes, retweets, views, bookmark_count,
-                                        reply_counts, quote_counts, source, language,
-                                        conversation_id, possibly_sensitive,
-                                        is_retweet, is_quote, original_tweet_id, original_author,
-                                        has_media, media_type, media_url,
-                                        place_id, place_full_name, coordinates_lat, coordinates_long,
-                                        edit_history_tweet_ids, edit_controls
-                                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                ''', (
-                                    tweet.id,
-                                    tweet.author.id,
-                                    tweet.author.username,
-                                    tweet.text,
-                                    tweet.created_on.isoformat(),
-                                    datetime.now().isoformat(),
-                                    self.collector.collector_id,
-                                    tweet.likes,
-                                    tweet.retweet_counts if hasattr(tweet, 'retweet_counts') else 0,
-                                    getattr(tweet, 'views', 0),
-                                    getattr(tweet, 'bookmark_count', 0),
-                                    getattr(tweet, 'reply_counts', 0),
-                                    getattr(tweet, 'quote_counts', 0),
-                                    getattr(tweet, 'source', None),
-                                    getattr(tweet, 'language', None),
-                                    getattr(tweet, 'conversation_id', None),
-                                    1 if getattr(tweet, 'possibly_sensitive', False) else 0,
-                                    1 if hasattr(tweet, 'is_retweet') and tweet.is_retweet else 0,
-                                    1 if hasattr(tweet, 'is_quoted') and tweet.is_quoted else 0,
-                                    None,  # original_tweet_id
-                                    None,  # original_author
-                                    1 if hasattr(tweet, 'media') and tweet.media else 0,
-                                    tweet.media[0].type if hasattr(tweet, 'media') and tweet.media else None,
-                                    tweet.media[0].url if hasattr(tweet, 'media') and tweet.media else None,
-                                    getattr(tweet, 'place_id', None),
-                                    getattr(tweet, 'place_full_name', None),
-                                    getattr(tweet, 'coordinates_lat', None),
-                                    getattr(tweet, 'coordinates_long', None),
-                                    json.dumps(getattr(tweet, 'edit_history_tweet_ids', [])),
-                                    json.dumps(getattr(tweet, 'edit_controls', {}))
-                                ))
+                        try:
+                            c.execute(f'''
+                                INSERT INTO tweets (
+                                    id, author_id, author_username, text, 
+                                    created_at, collected_at, collector_id,
+                                    likes, retweets, views, bookmark_count,
+                                    reply_counts, quote_counts, source, language,
+                                    conversation_id, possibly_sensitive,
+                                    is_retweet, is_quote, original_tweet_id, original_author,
+                                    has_media, media_type, media_url,
+                                    place_id, place_full_name, coordinates_lat, coordinates_long,
+                                    edit_history_tweet_ids, edit_controls
+                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                {COUNTS_UPSERT}
+                            ''', (
+                                tweet.id,
+                                tweet.author.id,
+                                tweet.author.username,
+                                tweet.text,
+                                tweet.created_on.isoformat(),
+                                datetime.now().isoformat(),
+                                self.collector.collector_id,
+                                tweet.likes,
+                                tweet.retweet_counts if hasattr(tweet, 'retweet_counts') else 0,
+                                getattr(tweet, 'views', 0),
+                                getattr(tweet, 'bookmark_count', 0),
+                                getattr(tweet, 'reply_counts', 0),
+                                getattr(tweet, 'quote_counts', 0),
+                                getattr(tweet, 'source', None),
+                                getattr(tweet, 'language', None),
+                                getattr(tweet, 'conversation_id', None),
+                                1 if getattr(tweet, 'possibly_sensitive', False) else 0,
+                                1 if hasattr(tweet, 'is_retweet') and tweet.is_retweet else 0,
+                                1 if hasattr(tweet, 'is_quoted') and tweet.is_quoted else 0,
+                                None,  # original_tweet_id
+                                None,  # original_author
+                                1 if hasattr(tweet, 'media') and tweet.media else 0,
+                                tweet.media[0].type if hasattr(tweet, 'media') and tweet.media else None,
+                                tweet.media[0].url if hasattr(tweet, 'media') and tweet.media else None,
+                                getattr(tweet, 'place_id', None),
+                                getattr(tweet, 'place_full_name', None),
+                                getattr(tweet, 'coordinates_lat', None),
+                                getattr(tweet, 'coordinates_long', None),
+                                json.dumps(getattr(tweet, 'edit_history_tweet_ids', [])),
+                                json.dumps(getattr(tweet, 'edit_controls', {}))
+                            ))
+                            if not exists:
                                 new_tweets += 1
-                            except Exception as e:
-                                print(f"[{self.collector.collector_id}] ERROR inserting tweet {tweet.id}: {str(e)}")
+                            self.collector.trend_detector.observe(tweet.id, tweet.created_on, tweet.text)
+                            texts.append((tweet.id, tweet.text))
+                        except Exception as e:
+                            logger.error(f"[{self.collector.collector_id}] ERROR inserting tweet {tweet.id}: {str(e)}")
                         
                         conn.commit()
+                    
+                    self.collector.near_duplicates.assign(c, texts)
+                    self.collector.engagement_manager.enqueue_candidates(c, candidates)
+                    conn.commit()
                 
                 # Add this page's new tweets to total
                 new_tweets_total += new_tweets
+                self.collector.yield_tracker.credit('tweets', new_tweets)
                 
                 # Calculate quality of the page
                 new_tweet_ratio = new_tweets / total_tweets if total_tweets > 0 else 0
@@ -127,46 +149,36 @@ class TimelineManager:
                 # Adjust scroll behavior based on page quality
                 if is_quality_page:
                     scroll_time = random.uniform(*SCROLL_TIME_NEW)
-                    print(f"[{self.collector.collector_id}] Quality page ({new_tweet_ratio:.1%} new), reading carefully: {scroll_time:.1f}s")
+                    logger.debug(f"[{self.collector.collector_id}] Quality page ({new_tweet_ratio:.1%} new), reading carefully: {scroll_time:.1f}s")
                     consecutive_low_pages = 0
                 else:
                     scroll_time = random.uniform(*SCROLL_TIME_OLD)
-                    print(f"[{self.collector.collector_id}] Low quality page ({new_tweet_ratio:.1%} new), quick scroll: {scroll_time:.1f}s")
+                    logger.debug(f"[{self.collector.collector_id}] Low quality page ({new_tweet_ratio:.1%} new), quick scroll: {scroll_time:.1f}s")
                     consecutive_low_pages += 1
                 
                 # Exit if we've seen too many low quality pages
                 if consecutive_low_pages >= 2:
-                    print(f"[{self.collector.collector_id}] Too many low quality pages, moving on...")
+                    logger.debug(f"[{self.collector.collector_id}] Too many low quality pages, moving on...")
                     break
                 
                 await asyncio.sleep(scroll_time)
                 
-                await self.collector.rate_limiter.log_api_call("home_timeline")
-                
-                # Debug: Print what we got from the API
-                print(f"[{self.collector.collector_id}] DEBUG: Got {len(tweets) if tweets else 0} tweets from timeline")
-                if tweets:
-                    first_tweet = tweets[0]
-                    print(f"[{self.collector.collector_id}] DEBUG: First tweet: {vars(first_tweet) if hasattr(first_tweet, '__dict__') else 'No vars'}")
-                    print(f"[{self.collector.collector_id}] DEBUG: Tweet text: {first_tweet.text if hasattr(first_tweet, 'text') else 'No text'}")
-                else:
-                    print(f"[{self.collector.collector_id}] DEBUG: tweets is empty or None")
-                
-                print(f"[{self.collector.collector_id}] Found {new_tweets} new tweets on page {page + 1}")
+                logger.debug("[%s] Found %d new of %d tweets on page %d",
+                             self.collector.collector_id, new_tweets, total_tweets, page + 1)
                 
                 # Update cursor for next page
                 cursor = tweets.cursor if hasattr(tweets, 'cursor') else None
                 if not cursor:
                     break
             
-            print(f"[{self.collector.collector_id}] Deep scroll complete - Saved {new_tweets_total} new tweets")
+            logger.info(f"[{self.collector.collector_id}] Deep scroll complete - Saved {new_tweets_total} new tweets")
             
             self.last_timeline_check = current_time
             if new_tweets_total < MIN_NEW_TWEETS_TO_CONTINUE:
-                print(f"[{self.collector.collector_id}] Few new tweets, will check again in {MAX_TIMELINE_INTERVAL/60:.1f}m")
+                logger.info(f"[{self.collector.collector_id}] Few new tweets, will check again in {MAX_TIMELINE_INTERVAL/60:.1f}m")
                 self.last_timeline_check = current_time + (MAX_TIMELINE_INTERVAL - MIN_TIMELINE_INTERVAL)
             
             return new_tweets_total > 0
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Timeline fetch error: {str(e)}")
+            logger.error(f"[{self.collector.collector_id}] Timeline fetch error: {str(e)}")
             return False
\ No newline at end of file
@@ -1,7 +1,10 @@
+import logging
 import re
-import sqlite3
 from datetime import datetime
-from src.database.db import DB_PATH
+from src.database.db import connect
+from src.utils.logging import sampled
+
+logger = sampled(logging.getLogger(__name__))
 
 class TokenManager:
     def __init__(self, collector):
@@ -12,18 +15,21 @@ class TokenManager:
         """Extract and store token mentions from tweet"""
         mentions = re.finditer(self.token_pattern, text.upper())
         
-        with sqlite3.connect(DB_PATH, timeout=20) as conn:
+        with connect() as conn:
             c = conn.cursor()
             now = datetime.now().isoformat()
+            new_mentions = 0
             
             for match in mentions:
                 symbol = match.group(1)
-                print(f"[{self.collector.collector_id}] Found token mention: ${symbol} by @{author}")
+                logger.debug("[%s] Found token mention: $%s by @%s", self.collector.collector_id, symbol, author)
                 
                 c.execute('''
                     INSERT INTO token_mentions 
                     (tweet_id, token_symbol, author_username, mentioned_at, collector_id)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (tweet_id, symbol, author, now, self.collector.collector_id))
+                new_mentions += c.rowcount
             
+            self.collector.yield_tracker.credit('token_mentions', new_mentions)
             conn.commit() 
\ No newline at end of file
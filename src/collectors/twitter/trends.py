@@ -0,0 +1,191 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from time import time
+from src.database.db import DB_PATH, connect
+from src.utils.sketches import WindowedCountMin, SpaceSaving
+from .constants import (
+    TREND_WINDOW,
+    TREND_BASELINE_WINDOWS,
+    TREND_MIN_BASELINE,
+    TREND_SKETCH_WIDTH,
+    TREND_SKETCH_DEPTH,
+    TREND_TOP_K,
+    TREND_Z_THRESHOLD,
+    TREND_MIN_COUNT,
+    TREND_EVENT_COOLDOWN,
+    TREND_SEEN_TWEETS,
+    TREND_PUBLISH_INTERVAL
+)
+from .metrics import db_write, TREND_BURSTS
+from .repoll import tweet_age_seconds
+
+logger = logging.getLogger(__name__)
+
+TRENDS_DIR = DB_PATH.parent / "trends"
+
+# Term kind -> (pattern over tweet text, normalization)
+TERM_PATTERNS = {
+    'hashtag': (re.compile(r'#(\w+)'), str.lower),
+    'cashtag': (re.compile(r'\$([A-Za-z]{2,10})\b'), str.upper),
+    'mention': (re.compile(r'@(\w{1,15})'), str.lower)
+}
+
+class TrendDetector:
+    """Streaming burst detection over hashtags, cashtags and mentions in ingested tweets.
+
+    Terms are counted per TREND_WINDOW in a ring of Count-Min sketches, with
+    a Space-Saving top-K per window for the candidates, so memory stays fixed
+    however many terms appear. A term's current count is the sliding last
+    window (the current window plus the overlapping part of the previous
+    one); its z-score is taken against the mean and deviation of its counts
+    in the TREND_BASELINE_WINDOWS before that. Each tweet counts once, and
+    only while it is recent enough to fall within the baseline horizon.
+
+    Bursts are written to `trend_events`, which the change feed carries, and
+    the current trends to TRENDS_DIR for the API's /trends.
+    """
+
+    def __init__(self, collector, window=TREND_WINDOW, baseline_windows=TREND_BASELINE_WINDOWS):
+        self.collector = collector
+        self.window = window
+        self.slots = baseline_windows + 2  # Current, previous and the baseline
+        self.sketches = {kind: WindowedCountMin(self.slots, TREND_SKETCH_WIDTH, TREND_SKETCH_DEPTH)
+                         for kind in TERM_PATTERNS}
+        self.top = {kind: [SpaceSaving(TREND_TOP_K) for _ in range(self.slots)] for kind in TERM_PATTERNS}
+        self.current = int(time() // window)
+        self.started = self.current  # Windows up to this one were not fully observed
+        self.seen = OrderedDict()
+        self.bursting = {}
+        self.pending_events = []
+        self.last_publish = 0
+
+    def _advance(self, now):
+        """Move to the window containing `now`, clearing the slots it reuses"""
+        window = int(now // self.window)
+        if window <= self.current:
+            return
+        for skipped in range(max(self.current + 1, window - self.slots + 1), window + 1):
+            slot = skipped % self.slots
+            for kind in TERM_PATTERNS:
+                self.sketches[kind].clear(slot)
+                self.top[kind][slot].clear()
+        self.current = window
+
+    def _score(self, kind, indexes, now):
+        """(sliding count, baseline mean, z-score); z is None until enough windows are observed"""
+        estimates = self.sketches[kind].estimates(indexes)
+        overlap = 1 - (now % self.window) / self.window
+        count = float(estimates[self.current % self.slots] + overlap * estimates[(self.current - 1) % self.slots])
+        baseline = [window % self.slots for window in range(self.current - self.slots + 1, self.current - 1)
+                    if window > self.started]
+        if len(baseline) < TREND_MIN_BASELINE:
+            return count, None, None
+        counts = estimates[baseline]
+        mean = float(counts.mean())
+        z = (count - mean) / max(float(counts.std()), math.sqrt(mean), 1.0)
+        return count, mean, z
+
+    def observe(self, tweet_id, created_at, text):
+        """Count the terms of one ingested tweet and flag the ones now bursting"""
+        tweet_id = str(tweet_id)
+        if not text or tweet_id in self.seen:
+            return
+        self.seen[tweet_id] = None
+        if len(self.seen) > TREND_SEEN_TWEETS:
+            self.seen.popitem(last=False)
+        age = tweet_age_seconds(created_at)
+        if age is not None and age > self.window * self.slots:
+            return
+
+        now = time()
+        self._advance(now)
+        slot = self.current % self.slots
+        for kind, (pattern, normalize) in TERM_PATTERNS.items():
+            sketch = self.sketches[kind]
+            for term in {normalize(match) for match in pattern.findall(text)}:
+                indexes = sketch.indexes(term)
+                sketch.add(slot, indexes)
+                self.top[kind][slot].add(term)
+                count, baseline, z = self._score(kind, indexes, now)
+                if z is not None and z >= TREND_Z_THRESHOLD and count >= TREND_MIN_COUNT:
+                    self._burst(kind, term, count, baseline, z, now)
+
+    def _burst(self, kind, term, count, baseline, z, now):
+        key = (kind, term)
+        if now - self.bursting.get(key, 0) < TREND_EVENT_COOLDOWN:
+            return
+        self.bursting[key] = now
+        TREND_BURSTS.labels(kind).inc()
+        logger.info(f"[{self.collector.collector_id}] Trending {kind} {term}: "
+                    f"{count:.0f} in the last {self.window}s vs {baseline:.1f} usual (z={z:.1f})")
+        self.pending_events.append((kind, term, round(count, 1), round(baseline, 2), round(z, 2),
+                                    datetime.fromtimestamp(now).isoformat(), self.collector.collector_id))
+
+    def trends(self, limit=TREND_TOP_K):
+        """Top terms of the sliding window per kind, highest z-score first"""
+        now = time()
+        self._advance(now)
+        current, previous = self.current % self.slots, (self.current - 1) % self.slots
+        result = {}
+        for kind in TERM_PATTERNS:
+            candidates = set(self.top[kind][current].counts) | set(self.top[kind][previous].counts)
+            entries = []
+            for term in candidates:
+                count, baseline, z = self._score(kind, self.sketches[kind].indexes(term), now)
+                entries.append({
+                    'term': term,
+                    'count': round(count, 1),
+                    'baseline': round(baseline, 2) if baseline is not None else None,
+                    'z': round(z, 2) if z is not None else None,
+                    'bursting': now - self.bursting.get((kind, term), 0) < TREND_EVENT_COOLDOWN
+                })
+            entries.sort(key=lambda entry: (entry['z'] if entry['z'] is not None else -math.inf, entry['count']),
+                         reverse=True)
+            result[kind] = entries[:limit]
+        return result
+
+    def publish(self, directory=TRENDS_DIR):
+        """Store new burst events and write the current trends, at most every TREND_PUBLISH_INTERVAL"""
+        now = time()
+        if now - self.last_publish < TREND_PUBLISH_INTERVAL:
+            return
+        self.last_publish = now
+        try:
+            if self.pending_events:
+                with connect() as conn, db_write(conn, "trend_events"):
+                    conn.executemany('''INSERT INTO trend_events
+                                        (kind, term, count, baseline, z_score, detected_at, collector_id)
+                                        VALUES (?, ?, ?, ?, ?, ?, ?)''', self.pending_events)
+                    conn.commit()
+                self.pending_events = []
+            self.bursting = {key: at for key, at in self.bursting.items() if now - at < TREND_EVENT_COOLDOWN}
+
+            path = Path(directory) / f"{self.collector.collector_id}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'written_at': now, 'window': self.window,
+                           'warm': self.current - self.started - 2 >= TREND_MIN_BASELINE,
+                           'kinds': self.trends()}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"[{self.collector.collector_id}] Error publishing trends: {str(e)}")
+
+def read_trends(directory=TRENDS_DIR, max_age=60):
+    """Trends written by collector processes, keyed by collector id; stale files are skipped"""
+    trends = {}
+    for path in Path(directory).glob('*.json'):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if time() - data.get('written_at', 0) <= max_age:
+            trends[path.stem] = data
+    return trends
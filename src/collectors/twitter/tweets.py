@@ -1,14 +1,22 @@
+import logging
 import sqlite3
 from datetime import datetime
 import random
 import asyncio
 import json
-from src.database.db import DB_PATH
+from src.database.db import connect
 from .constants import (
     FOLLOW_CHANCE,
-    MUST_HAVE_TWEETS
+    MUST_HAVE_TWEETS,
+    MAX_CALLS_BEFORE_SLEEP
 )
+from .metrics import db_write, record_sleep
+from .repoll import COUNTS_UPSERT
 from src.collectors.twitter.tokens import TokenManager
+from src.utils.logging import sampled
+
+logger = logging.getLogger(__name__)
+tweet_logger = sampled(logger)
 
 class TweetManager:
     def __init__(self, collector):
@@ -18,28 +26,35 @@ class TweetManager:
     async def fetch_account_tweets(self, account):
         """Fetch and process tweets for an account"""
         try:
-            if await self.collector.rate_limiter.check_rate_limit() >= 45:
+            if await self.collector.rate_limiter.check_rate_limit() >= MAX_CALLS_BEFORE_SLEEP:
                 base_wait = 15 * 60
                 jitter = random.uniform(-5 * 60, 5 * 60)
                 wait_time = base_wait + jitter
-                print(f"[{self.collector.collector_id}] Rate limit hit, sleeping {wait_time/60:.1f}m")
+                logger.warning(f"[{self.collector.collector_id}] Rate limit hit, sleeping {wait_time/60:.1f}m")
+                record_sleep("rate_window", wait_time)
                 await asyncio.sleep(wait_time)
                 
-            await self.collector.rate_limiter.log_api_call(f"tweets/{account}")
-            print(f"\n[{self.collector.collector_id}] Fetching tweets for @{account}")
+            logger.info(f"[{self.collector.collector_id}] Fetching tweets for @{account}")
             
-            tweets = await self.collector.app.get_tweets(account, pages=1)
+            tweets = await self.collector.call_api("tweets", self.collector.app.get_tweets,
+                                                   account, pages=1, account=account)
             if not tweets:
-                print(f"[{self.collector.collector_id}] No tweets found for {account}")
+                logger.info(f"[{self.collector.collector_id}] No tweets found for {account}")
                 return False
 
-            with sqlite3.connect(DB_PATH, timeout=20) as conn:
+            with connect() as conn, db_write(conn, "account_tweets"):
                 c = conn.cursor()
+                marks = self.collector.yield_tracker.mark(c, 'tweets', 'tweet_hashtags')
                 c.execute('INSERT OR IGNORE INTO users (username) VALUES (?)', (account,))
+                candidates = []
+                texts = []
                 for tweet in tweets:
                     if not hasattr(tweet, 'id'):
                         continue
                     
+                    candidates.append((tweet.id, account, tweet.likes,
+                                       getattr(tweet, 'retweet_counts', 0)))
+                    
                     # Check for media
                     has_media = hasattr(tweet, 'media') and tweet.media
                     media_type = None
@@ -47,11 +62,11 @@ class TweetManager:
                     if has_media:
                         media_type = tweet.media[0].type if tweet.media else None
                         media_url = tweet.media[0].url if tweet.media else None
-                        print(f"  └ Media: {media_type} - {media_url}")
                     
-                    print(f"\nTweet from @{account}: {tweet.text[:100]}...")
+                    tweet_logger.debug("Tweet from @%s: %.100s (media: %s %s)",
+                                       account, tweet.text, media_type, media_url)
                     
-                    c.execute('''INSERT OR IGNORE INTO tweets 
+                    c.execute(f'''INSERT INTO tweets 
                                (id, author_username, text, created_at, likes, retweets, collected_at,
                                 is_retweet, is_quote, original_tweet_id, original_author,
                                 has_media, media_type, media_url,
@@ -59,7 +74,8 @@ class TweetManager:
                                 source, language, conversation_id, possibly_sensitive,
                                 place_id, place_full_name, coordinates_lat, coordinates_long,
                                 edit_history_tweet_ids, edit_controls)
-                               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
+                               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                               {COUNTS_UPSERT}''',
                              (str(tweet.id), 
                               account, 
                               tweet.text, 
@@ -88,14 +104,18 @@ class TweetManager:
                               getattr(tweet, 'coordinates_long', None),
                               json.dumps(getattr(tweet, 'edit_history_tweet_ids', [])),
                               json.dumps(getattr(tweet, 'edit_controls', {}))))
+                    self.collector.trend_detector.observe(tweet.id, tweet.date, tweet.text)
+                    texts.append((tweet.id, tweet.text))
                     
                     # Handle retweets
                     if hasattr(tweet, 'is_retweet') and tweet.is_retweet:
                         rt = getattr(tweet, 'retweeted_tweet', None)
                         if rt and hasattr(rt, 'author'):
-                            print(f"  └─ Retweet of @{rt.author.username}: {rt.text[:100]}...")
+                            tweet_logger.debug("  └─ Retweet of @%s: %.100s", rt.author.username, rt.text)
+                            candidates.append((rt.id, rt.author.username, rt.likes,
+                                               getattr(rt, 'retweet_counts', 0)))
                             
-                            c.execute('''INSERT OR IGNORE INTO tweets 
+                            c.execute(f'''INSERT INTO tweets 
                                        (id, author_username, text, created_at, likes, retweets, collected_at,
                                         is_retweet, is_quote, original_tweet_id, original_author,
                                         has_media, media_type, media_url,
@@ -103,7 +123,8 @@ class TweetManager:
                                         source, language, conversation_id, possibly_sensitive,
                                         place_id, place_full_name, coordinates_lat, coordinates_long,
                                         edit_history_tweet_ids, edit_controls)
-                                       VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
+                                       VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                                       {COUNTS_UPSERT}''',
                                      (str(rt.id), 
                                       rt.author.username, 
                                       rt.text, 
@@ -127,6 +148,8 @@ class TweetManager:
                                       getattr(rt, 'coordinates_long', None),
                                       json.dumps(getattr(rt, 'edit_history_tweet_ids', [])),
                                       json.dumps(getattr(rt, 'edit_controls', {}))))
+                            self.collector.trend_detector.observe(rt.id, rt.date, rt.text)
+                            texts.append((rt.id, rt.text))
                             
                             c.execute('''UPDATE tweets 
                                        SET original_tweet_id = ?, 
@@ -136,15 +159,17 @@ class TweetManager:
                                        WHERE id = ?''',
                                      (str(rt.id), rt.author.username, str(tweet.id)))
                         else:
-                            print(f"  └─ Retweet found but missing author info")
+                            logger.debug("Retweet %s found but missing author info", tweet.id)
                             continue
                     
                     # Handle quotes
                     if hasattr(tweet, 'is_quoted') and tweet.is_quoted and hasattr(tweet, 'quoted_tweet'):
                         qt = tweet.quoted_tweet
-                        print(f"  └─ Quote of @{qt.author.username}: {qt.text[:100]}...")
+                        tweet_logger.debug("  └─ Quote of @%s: %.100s", qt.author.username, qt.text)
+                        candidates.append((qt.id, qt.author.username, qt.likes,
+                                           getattr(qt, 'retweet_counts', 0)))
                         
-                        c.execute('''INSERT OR IGNORE INTO tweets 
+                        c.execute(f'''INSERT INTO tweets 
                                    (id, author_username, text, created_at, likes, retweets, collected_at,
                                     is_retweet, is_quote, original_tweet_id, original_author,
                                     has_media, media_type, media_url,
@@ -152,7 +177,8 @@ class TweetManager:
                                     source, language, conversation_id, possibly_sensitive,
                                     place_id, place_full_name, coordinates_lat, coordinates_long,
                                     edit_history_tweet_ids, edit_controls)
-                                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
+                                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                                   {COUNTS_UPSERT}''',
                                  (str(qt.id), 
                                   qt.author.username, 
                                   qt.text, 
@@ -176,6 +202,8 @@ class TweetManager:
                                   getattr(qt, 'coordinates_long', None),
                                   json.dumps(getattr(qt, 'edit_history_tweet_ids', [])),
                                   json.dumps(getattr(qt, 'edit_controls', {}))))
+                        self.collector.trend_detector.observe(qt.id, qt.date, qt.text)
+                        texts.append((qt.id, qt.text))
                         
                         c.execute('''UPDATE tweets 
                                    SET original_tweet_id = ?, 
@@ -193,13 +221,16 @@ class TweetManager:
                             VALUES (?, ?, ?)
                         ''', (tweet.id, tag.lower(), datetime.now().isoformat()))
                 
+                self.collector.near_duplicates.assign(c, texts)
+                self.collector.engagement_manager.enqueue_candidates(c, candidates)
+                self.collector.yield_tracker.credit_since(c, marks)
                 conn.commit()
         except sqlite3.Error as e:
-            print(f"[{self.collector.collector_id}] Database error processing tweets for {account}: {str(e)}")
+            logger.error(f"[{self.collector.collector_id}] Database error processing tweets for {account}: {str(e)}")
             return False
         except Exception as e:
-            print(f"[{self.collector.collector_id}] Error fetching tweets for {account}: {str(e)}")
-            print(f"[{self.collector.collector_id}] Error type: {type(e).__name__}")
+            logger.error(f"[{self.collector.collector_id}] Error fetching tweets for {account} "
+                         f"({type(e).__name__}): {str(e)}")
             return False
         
         if random.random() < FOLLOW_CHANCE:
@@ -1,8 +1,11 @@
+import logging
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 import random
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 @dataclass
 class WorkflowStep:
     action: str  # e.g., "fetch_timeline", "fetch_tweets", "fetch_following"
@@ -12,6 +15,8 @@ class WorkflowStep:
     min_sleep: float = 0  # Minimum sleep after action
     max_sleep: float = 0  # Maximum sleep after action
     rate_limit_sleep: bool = True  # Whether to check rate limits after action
+    min_interval: float = 0  # Bandit scheduling: minimum seconds between runs of this step
+    max_interval: Optional[float] = None  # Bandit scheduling: force a run after this many idle seconds
     
     def choose_next_step(self, result: Any) -> Optional[str]:
         """Choose next step based on action result"""
@@ -30,11 +35,13 @@ class WorkflowStep:
     
 @dataclass
 class Workflow:
-    def __init__(self, name: str, steps: Dict[str, WorkflowStep], entry_point: str, constants: Dict[str, Any]):
+    def __init__(self, name: str, steps: Dict[str, WorkflowStep], entry_point: str, constants: Dict[str, Any],
+                 scheduling: str = "graph"):
         self.name = name
         self.steps = steps
         self.entry_point = entry_point
         self.constants = constants
+        self.scheduling = scheduling  # "graph" follows next_steps, "bandit" picks by observed yield
 
     async def execute(self, collector):
         """Execute workflow with error handling"""
@@ -52,14 +59,14 @@ class Workflow:
                     await collector.rate_limiter.rate_limit_sleep()
                 if step.min_sleep > 0:
                     sleep_time = random.uniform(step.min_sleep, step.max_sleep)
-                    print(f"[{collector.collector_id}] Workflow sleep: {sleep_time:.1f}s")
+                    logger.debug(f"[{collector.collector_id}] Workflow sleep: {sleep_time:.1f}s")
                     await asyncio.sleep(sleep_time)
                 
                 # Determine next step
                 current_step = step.choose_next_step(result)
                 
             except Exception as e:
-                print(f"[{collector.collector_id}] Error in workflow step {current_step}: {str(e)}")
+                logger.error(f"[{collector.collector_id}] Error in workflow step {current_step}: {str(e)}")
                 # Log error but continue to next step
                 current_step = step.next_steps[0] if step.next_steps else None
                 continue
\ No newline at end of file
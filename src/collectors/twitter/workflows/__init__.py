@@ -1,9 +1,11 @@
 from .timeline_focused import timeline_focused
 from .engagement_focused import engagement_focused
 from .complete_workflow import complete_workflow
+from .adaptive_workflow import adaptive_workflow
 
 __all__ = [
     'timeline_focused', 
     'engagement_focused',
-    'complete_workflow'
+    'complete_workflow',
+    'adaptive_workflow'
 ] 
\ No newline at end of file
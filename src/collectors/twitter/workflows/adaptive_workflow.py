@@ -0,0 +1,52 @@
+from ..workflow import Workflow, WorkflowStep
+
+adaptive_workflow = Workflow(
+    name="adaptive_workflow",
+    entry_point="timeline_check",
+    scheduling="bandit",               # Next step chosen by new rows per API call
+    constants={
+        "FOLLOWING_CHECK_CHANCE": 0.3,
+        "FOLLOW_CHANCE": 0.15,
+        "MAX_TIMELINE_PAGES": 10
+    },
+    steps={
+        "timeline_check": WorkflowStep(
+            action="fetch_timeline",
+            params={"max_pages": 10},
+            next_steps=["process_batch"],
+            min_sleep=30,
+            max_sleep=60,
+            min_interval=300,          # Timeline refreshes slowly
+            max_interval=1800
+        ),
+        "process_batch": WorkflowStep(
+            action="process_batch",
+            params={},
+            next_steps=["timeline_check"],
+            min_sleep=45,
+            max_sleep=90,
+            max_interval=3600          # Keep cycling through tracked accounts
+        ),
+        "check_viral": WorkflowStep(
+            action="check_engagement",
+            params={
+                "max_depth": 3,
+                "min_engagement": 75,
+                "min_reply_likes": 8
+            },
+            next_steps=["timeline_check"],
+            min_sleep=120,
+            max_sleep=180,
+            min_interval=600
+        ),
+        "repoll_hot": WorkflowStep(
+            action="repoll_engagement",
+            params={"limit": 10},
+            next_steps=["timeline_check"],
+            min_sleep=30,
+            max_sleep=60,
+            min_interval=600,
+            max_interval=1800          # Yields no new rows, so the bandit alone would starve it
+        )
+    }
+)
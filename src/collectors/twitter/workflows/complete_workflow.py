@@ -40,10 +40,18 @@ complete_workflow = Workflow(
                 "min_engagement": 75,
                 "min_reply_likes": 8
             },
-            next_steps=["timeline_check", "process_batch"],
+            next_steps=["repoll_hot", "process_batch"],
             min_sleep=120,
             max_sleep=180,
             rate_limit_sleep=True
+        ),
+        "repoll_hot": WorkflowStep(
+            action="repoll_engagement",
+            params={"limit": 10},
+            next_steps=["timeline_check", "process_batch"],
+            min_sleep=30,
+            max_sleep=60,
+            rate_limit_sleep=True
         )
     }
 ) 
\ No newline at end of file
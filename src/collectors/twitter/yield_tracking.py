@@ -0,0 +1,145 @@
+from time import time, perf_counter
+from datetime import datetime
+from src.database.db import connect
+from .circuit_breaker import classify_error
+from .constants import (
+    YIELD_FLUSH_CALLS,
+    YIELD_FLUSH_INTERVAL
+)
+from .metrics import db_write, NEW_ROWS
+
+# Tables whose new rows are credited to the API call that produced them,
+# with the api_call_yield column each one is summed into
+YIELD_COLUMNS = {
+    'tweets': 'new_tweets',
+    'account_followings': 'new_followings',
+    'tweet_threads': 'new_threads',
+    'tweet_mentions': 'new_mentions',
+    'token_mentions': 'new_tokens',
+    'tweet_hashtags': 'new_hashtags'
+}
+
+def response_size(result):
+    """Number of items in an API response"""
+    for attr in ('tweets', 'users'):
+        items = getattr(result, attr, None)
+        if items is not None:
+            return len(items)
+    try:
+        return len(result)
+    except TypeError:
+        return 1 if result else 0
+
+class YieldTracker:
+    """Per-call latency, response size, errors and new rows, aggregated in memory.
+
+    Managers credit the rows they write with `credit`, or `mark` and
+    `credit_since` where a row count can't tell new rows from updated ones.
+    Rows are credited to the last call, since managers store a response
+    right after fetching it, so rows written by other processes are never
+    counted. Totals are kept per hour, endpoint, account, workflow step and
+    error class, and flushed to api_call_yield in batches.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.pending = None  # Key of the call still collecting rows
+        self.totals = {}
+        self.calls_since_flush = 0
+        self.last_flush = time()
+
+    def _totals_for(self, key):
+        if key not in self.totals:
+            self.totals[key] = {
+                "calls": 0, "errors": 0, "latency": 0.0, "response_size": 0,
+                **{column: 0 for column in YIELD_COLUMNS.values()}
+            }
+        return self.totals[key]
+
+    def credit(self, table, rows):
+        """Credit `rows` new rows of `table` to the last call"""
+        if not rows or table not in YIELD_COLUMNS:
+            return
+        NEW_ROWS.labels(table).inc(rows)
+        if self.pending:
+            self._totals_for(self.pending)[YIELD_COLUMNS[table]] += rows
+
+    def mark(self, c, *tables):
+        """Row high-water marks of `tables`, taken in the caller's write transaction.
+
+        Opens the transaction with BEGIN IMMEDIATE if it isn't open yet, so no
+        other writer can move the marks before `credit_since` is called, ahead
+        of the commit.
+        """
+        if not c.connection.in_transaction:
+            c.execute('BEGIN IMMEDIATE')
+        marks = {}
+        for table in tables:
+            c.execute(f'SELECT MAX(rowid) FROM {table}')
+            marks[table] = c.fetchone()[0] or 0
+        return marks
+
+    def credit_since(self, c, marks):
+        """Credit the rows added since `mark` to the last call"""
+        for table, mark in self.mark(c, *marks).items():
+            self.credit(table, max(0, mark - marks[table]))
+
+    def close_pending(self):
+        """Stop crediting rows to the last call, at the end of a workflow step"""
+        self.pending = None
+
+    async def track(self, endpoint, account, method, *args, **kwargs):
+        """Run an API call and record its latency, size and classified error"""
+        self.close_pending()
+
+        key = (
+            datetime.now().strftime('%Y-%m-%dT%H:00'),
+            endpoint,
+            account or '',
+            getattr(self.collector, 'current_step', None) or '',
+        )
+        start = perf_counter()
+        error_class = ''
+        result = None
+        try:
+            result = await method(*args, **kwargs)
+            return result
+        except Exception as e:
+            error_class = classify_error(e)
+            raise
+        finally:
+            totals = self._totals_for(key + (error_class,))
+            totals["calls"] += 1
+            totals["errors"] += 1 if error_class else 0
+            totals["latency"] += perf_counter() - start
+            totals["response_size"] += response_size(result)
+            self.pending = key + (error_class,)
+
+            self.calls_since_flush += 1
+            if (self.calls_since_flush >= YIELD_FLUSH_CALLS or
+                    time() - self.last_flush >= YIELD_FLUSH_INTERVAL):
+                self.flush()
+
+    def flush(self):
+        """Add in-memory totals to api_call_yield; rows credited later are added by the next flush"""
+        if not self.totals:
+            return
+        columns = ["calls", "errors", "latency", "response_size"] + list(YIELD_COLUMNS.values())
+        rows = [
+            (*key, self.collector.collector_id, *[totals[column] for column in columns])
+            for key, totals in self.totals.items()
+        ]
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in columns)
+        with connect() as conn, db_write(conn, "api_call_yield"):
+            c = conn.cursor()
+            c.executemany(f'''
+                INSERT INTO api_call_yield
+                (period, endpoint, account, step, error_class, collector_id, {', '.join(columns)})
+                VALUES ({', '.join('?' for _ in range(6 + len(columns)))})
+                ON CONFLICT(period, endpoint, account, step, error_class, collector_id)
+                DO UPDATE SET {updates}
+            ''', rows)
+            conn.commit()
+        self.totals = {}
+        self.calls_since_flush = 0
+        self.last_flush = time()
@@ -0,0 +1,307 @@
+import csv
+import heapq
+import os
+import random
+import zlib
+from itertools import chain
+from datetime import datetime
+from time import time
+from src.database.db import DB_PATH, connect
+
+ACCOUNT_SHARDS = 16                 # Accounts hash into this many shards for splitting across collectors
+ACCOUNT_REFETCH_INTERVAL = 6 * 3600 # Seconds before a priority 0 account is due again; halves per priority level
+IMPORT_CHUNK_SIZE = 5000            # Rows per executemany during bulk import
+ACCOUNT_FIELDS = ('username', 'priority', 'tags', 'shard', 'state')
+
+def normalize_username(username):
+    username = (username or '').strip().lstrip('@')
+    return username if username and not username.startswith('#') else None
+
+def shard_for(username):
+    """Stable shard of an account, independent of insert order or process"""
+    return zlib.crc32(username.lower().encode()) % ACCOUNT_SHARDS
+
+def parse_accounts(lines):
+    """Stream account rows from text lines: one username per line, or CSV with a header.
+
+    CSV files need a `username` column and may carry priority, tags
+    (separated by `;` or `|`), shard and state. Rows are yielded one at a
+    time so files of any size parse in constant memory.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+
+    header = [field.strip().lower() for field in next(csv.reader([first]), [])]
+    if 'username' not in header:
+        # Plain list, the first line is already an account
+        for line in chain([first], lines):
+            username = normalize_username(line.split(',')[0])
+            if username:
+                yield {'username': username}
+        return
+
+    for values in csv.reader(lines):
+        row = dict(zip(header, values))
+        username = normalize_username(row.get('username'))
+        if not username:
+            continue
+        tags = row.get('tags')
+        yield {
+            'username': username,
+            'priority': int(row['priority']) if row.get('priority', '').strip() else None,
+            'tags': ','.join(t.strip() for t in tags.replace('|', ';').split(';') if t.strip()) if tags else None,
+            'shard': int(row['shard']) if row.get('shard', '').strip() else None,
+            'state': row.get('state', '').strip() or None
+        }
+
+class AccountRegistry:
+    """Tracked accounts with per-account metadata, kept in the `tracked_accounts` table.
+
+    Each account has a priority, comma-separated tags, a shard, a state
+    ('active' or 'paused'), where it came from and when it was last fetched.
+    `due_batch` hands out the accounts most overdue for a fetch using an
+    index, so collectors cycle through millions of accounts without
+    loading them, and accounts added or removed through the API are picked
+    up on the next batch. Higher priorities are due again sooner; new
+    accounts are due at once, in random order like the old shuffled list.
+    """
+
+    def __init__(self, db_path=DB_PATH, shards=None):
+        self.db_path = db_path
+        self.shards = sorted(shards) if shards is not None else None  # None covers every shard
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _row(self, row):
+        return dict(zip(('username', 'priority', 'tags', 'shard', 'state', 'source',
+                         'added_at', 'last_fetched_at', 'next_fetch_at'), row))
+
+    def add(self, rows, source='api'):
+        """Insert or update accounts from dict rows (or plain usernames), in chunks.
+
+        Fields left as None keep their stored value on existing accounts.
+        Returns the number of rows written.
+        """
+        now = datetime.now().isoformat()
+        written = 0
+        chunk = []
+        with self._connect() as conn:
+            c = conn.cursor()
+            for row in rows:
+                if isinstance(row, str):
+                    row = {'username': row}
+                username = normalize_username(row.get('username'))
+                if not username:
+                    continue
+                shard = row.get('shard')
+                chunk.append({
+                    'username': username,
+                    'priority': row.get('priority'),
+                    'tags': row.get('tags'),
+                    'shard': shard if shard is not None else shard_for(username),
+                    'state': row.get('state'),
+                    'source': source,
+                    'added_at': now,
+                    'sort_key': random.getrandbits(31)
+                })
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    written += self._write(c, chunk)
+                    conn.commit()
+                    chunk = []
+            if chunk:
+                written += self._write(c, chunk)
+            conn.commit()
+        return written
+
+    def _write(self, c, chunk):
+        c.executemany('''
+            INSERT INTO tracked_accounts
+            (username, priority, tags, shard, state, source, added_at, sort_key)
+            VALUES (:username, COALESCE(:priority, 0), :tags, :shard,
+                    COALESCE(:state, 'active'), :source, :added_at, :sort_key)
+            ON CONFLICT(username) DO UPDATE SET
+                priority = COALESCE(:priority, priority),
+                tags = COALESCE(:tags, tags),
+                state = COALESCE(:state, state)
+        ''', chunk)
+        return len(chunk)
+
+    def import_file(self, path, source='file'):
+        """Stream a text or CSV account file into the registry"""
+        with open(path, newline='') as f:
+            return self.add(parse_accounts(f), source=source)
+
+    def sync_file(self, path):
+        """Import the collector's accounts file when it changed since the last import"""
+        if not os.path.exists(path):
+            return 0
+        stat = os.stat(path)
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('SELECT mtime, size FROM account_imports WHERE path = ?', (str(path),))
+            if c.fetchone() == (stat.st_mtime, stat.st_size):
+                return 0
+
+        written = self.import_file(path)
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO account_imports (path, mtime, size, rows, imported_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (str(path), stat.st_mtime, stat.st_size, written, datetime.now().isoformat()))
+            conn.commit()
+        return written
+
+    def import_once(self, name, rows, source):
+        """Add rows under an import name only the first time, so later removals stick"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('SELECT 1 FROM account_imports WHERE path = ?', (name,))
+            if c.fetchone():
+                return 0
+
+        written = self.add(rows, source=source)
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT INTO account_imports (path, rows, imported_at) VALUES (?, ?, ?)
+            ''', (name, written, datetime.now().isoformat()))
+            conn.commit()
+        return written
+
+    def remove(self, usernames):
+        usernames = [u for u in map(normalize_username, usernames) if u]
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.executemany('DELETE FROM tracked_accounts WHERE username = ?', [(u,) for u in usernames])
+            conn.commit()
+            return c.rowcount
+
+    def update(self, username, **fields):
+        """Set priority, tags, shard or state of one account"""
+        fields = {k: v for k, v in fields.items() if k in ACCOUNT_FIELDS[1:] and v is not None}
+        if not fields:
+            return False
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute(f'UPDATE tracked_accounts SET {assignments} WHERE username = ?',
+                      list(fields.values()) + [normalize_username(username)])
+            conn.commit()
+            return c.rowcount > 0
+
+    def get(self, username):
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT username, priority, tags, shard, state, source, added_at, last_fetched_at, next_fetch_at
+                FROM tracked_accounts WHERE username = ?
+            ''', (normalize_username(username),))
+            row = c.fetchone()
+            return self._row(row) if row else None
+
+    def list(self, after=None, limit=100, state=None, tag=None, shard=None):
+        """One page of accounts in username order; pass the last username as `after` for the next"""
+        query = '''
+            SELECT username, priority, tags, shard, state, source, added_at, last_fetched_at, next_fetch_at
+            FROM tracked_accounts WHERE username > ?
+        '''
+        params = [after or '']
+        if state:
+            query += ' AND +state = ?'
+            params.append(state)
+        if shard is not None:
+            query += ' AND shard = ?'
+            params.append(shard)
+        if tag:
+            query += " AND ',' || tags || ',' LIKE ?"
+            params.append(f'%,{tag},%')
+        query += ' ORDER BY username LIMIT ?'
+        params.append(limit)
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute(query, params)
+            return [self._row(row) for row in c.fetchall()]
+
+    def usernames(self, state='active', page_size=IMPORT_CHUNK_SIZE):
+        """Iterate usernames page by page so memory stays bounded"""
+        after = ''
+        while True:
+            with self._connect() as conn:
+                c = conn.cursor()
+                c.execute('''
+                    SELECT username FROM tracked_accounts
+                    WHERE username > ? AND +state = ?  -- walk the primary key, not the due index
+                    ORDER BY username LIMIT ?
+                ''', (after, state, page_size))
+                page = [row[0] for row in c.fetchall()]
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def tracked(self, usernames):
+        """The subset of `usernames` already in the registry, lowercased"""
+        usernames = list(usernames)
+        found = set()
+        with self._connect() as conn:
+            c = conn.cursor()
+            for start in range(0, len(usernames), 500):
+                chunk = usernames[start:start + 500]
+                c.execute(f'''
+                    SELECT username FROM tracked_accounts
+                    WHERE username IN ({','.join('?' for _ in chunk)})
+                ''', chunk)
+                found.update(row[0].lower() for row in c.fetchall())
+        return found
+
+    def count(self, state='active'):
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*) FROM tracked_accounts WHERE state = ?', (state,))
+            return c.fetchone()[0]
+
+    def due_batch(self, size):
+        """The `size` active accounts in our shards most overdue for a fetch"""
+        query = '''
+            SELECT username, next_fetch_at, sort_key FROM tracked_accounts
+            WHERE state = 'active' {shard_filter}
+            ORDER BY next_fetch_at, sort_key
+            LIMIT ?
+        '''
+        with self._connect() as conn:
+            c = conn.cursor()
+            if self.shards is None:
+                c.execute(query.format(shard_filter=''), (size,))
+                rows = c.fetchall()
+            else:
+                # One index range per shard, merged, rather than sorting every matching row
+                rows = []
+                for shard in self.shards:
+                    c.execute(query.format(shard_filter='AND shard = ?'), (shard, size))
+                    rows.extend(c.fetchall())
+                rows = heapq.nsmallest(size, rows, key=lambda row: (row[1], row[2]))
+        return [row[0] for row in rows]
+
+    def mark_fetched(self, username):
+        """Record a fetch and schedule the next one by priority"""
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE tracked_accounts
+                SET last_fetched_at = ?,
+                    next_fetch_at = ? + ? / (1 << MIN(MAX(priority, 0), 10)),
+                    sort_key = ?
+                WHERE username = ?
+            ''', (datetime.now().isoformat(), time(), ACCOUNT_REFETCH_INTERVAL,
+                  random.getrandbits(31), username))
+            conn.commit()
+
+    def stats(self):
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT state, COUNT(*), SUM(next_fetch_at <= ?)
+                FROM tracked_accounts GROUP BY state
+            ''', (time(),))
+            return {state: {"accounts": total, "due": due or 0} for state, total, due in c.fetchall()}
@@ -0,0 +1,77 @@
+import re
+import threading
+from pathlib import Path
+from src.database.db import CDC_TABLES
+from src.database.export import EXPORT_DIR, EXPORT_TABLES
+
+try:
+    import duckdb
+except ImportError:  # Optional "analytics" extra; /analytics/query reports it as unavailable
+    duckdb = None
+
+QUERY_TIMEOUT = 60        # Seconds before a query is interrupted
+MAX_RESULT_ROWS = 10_000
+
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+class AnalyticsEngine:
+    """Aggregate SQL over the Parquet export using DuckDB, outside SQLite entirely.
+
+    Each exported table is a view over its Hive-partitioned files, so the
+    `month` partition column prunes files and only the referenced columns
+    are read. Tables whose rows are exported again when updated show only
+    the copy from the last file per key. Queries run on a fresh in-memory connection that can read
+    nothing but the export directory.
+    """
+
+    def __init__(self, export_dir=EXPORT_DIR, tables=EXPORT_TABLES):
+        self.export_dir = Path(export_dir)
+        self.tables = tables
+
+    @property
+    def available(self):
+        return duckdb is not None
+
+    def _connect(self):
+        conn = duckdb.connect(":memory:")
+        for table in self.tables:
+            files = self.export_dir / table
+            if not any(files.glob("month=*/*.parquet")):
+                continue
+            if table in CDC_TABLES and any(files.glob("month=*/update-*.parquet")):
+                keys = ', '.join(CDC_TABLES[table])
+                conn.execute(f"""CREATE VIEW {table} AS SELECT * EXCLUDE (filename) FROM read_parquet(
+                                     '{files.resolve()}/*/*.parquet', hive_partitioning = true, union_by_name = true,
+                                     filename = true)
+                                 QUALIFY row_number() OVER (PARTITION BY {keys} ORDER BY filename DESC) = 1""")
+            else:
+                conn.execute(f"""CREATE VIEW {table} AS SELECT * FROM read_parquet(
+                                     '{files.resolve()}/*/*.parquet', hive_partitioning = true, union_by_name = true)""")
+        conn.execute(f"SET allowed_directories = ['{self.export_dir.resolve()}']")
+        conn.execute("SET enable_external_access = false")
+        conn.execute("SET lock_configuration = true")
+        return conn
+
+    def query(self, sql, limit=MAX_RESULT_ROWS, timeout=QUERY_TIMEOUT):
+        """Run one SELECT and return its column names and up to `limit` rows.
+
+        Raises ValueError for anything but a single SELECT/WITH statement,
+        and TimeoutError when the query runs longer than `timeout`.
+        """
+        sql = sql.strip().rstrip(";")
+        if not _READ_ONLY.match(sql) or ";" in sql:
+            raise ValueError("Only a single SELECT or WITH query is allowed")
+
+        conn = self._connect()
+        timer = threading.Timer(timeout, conn.interrupt)
+        timer.start()
+        try:
+            result = conn.execute(sql)
+            rows = result.fetchmany(limit + 1)
+            columns = [column[0] for column in result.description]
+        except duckdb.InterruptException:
+            raise TimeoutError(f"Query ran longer than {timeout}s")
+        finally:
+            timer.cancel()
+            conn.close()
+        return {"columns": columns, "rows": rows[:limit], "truncated": len(rows) > limit}
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime
+from time import time
+from src.database.db import DB_PATH, CDC_TABLES, connect
+
+CHANGE_LOG_RETENTION = 7 * 24 * 3600  # Seconds changes are kept for consumers to catch up
+CHANGE_BATCH_MAX = 5000               # Most changes served per request
+PRUNE_CHUNK = 10000                   # Changes deleted per transaction while pruning
+
+class ChangesExpired(Exception):
+    """The requested position is older than the retained change log"""
+
+class ChangeLog:
+    """Reads, consumer offsets and retention for the `change_log` table.
+
+    Triggers on CDC_TABLES append one row per insert or update, holding the
+    row's key and its values after the change, with a sequence number in
+    commit order; updates of CDC_UNLOGGED_COLUMNS alone are not logged. Rows written late are logged when they are written, not
+    when they were created, so consumers reading `after` their last
+    position see everything exactly once by committing that position with
+    `ack()` once they have applied a batch. Every read is a range seek on
+    the sequence number.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def _pruned_through(self, c):
+        c.execute('SELECT through_seq FROM change_log_pruned WHERE id = 1')
+        row = c.fetchone()
+        return row[0] if row else 0
+
+    def head(self):
+        """Sequence number of the latest change"""
+        with connect(self.db_path, readonly=True) as conn:
+            return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+
+    def read(self, after=0, limit=CHANGE_BATCH_MAX, tables=None):
+        """Changes with seq > `after`, oldest first; `next` is the position to read from next.
+
+        With `tables`, at most `limit` sequence numbers are examined, so a
+        rare table does not turn the read into a scan; `next` still moves
+        past the changes skipped. Raises ChangesExpired if changes after
+        `after` were already pruned.
+        """
+        if tables:
+            unknown = set(tables) - set(CDC_TABLES)
+            if unknown:
+                raise ValueError(f"Not captured: {', '.join(sorted(unknown))}")
+        limit = min(limit, CHANGE_BATCH_MAX)
+
+        with connect(self.db_path, readonly=True) as conn:
+            c = conn.cursor()
+            # One snapshot for the head and the rows, so none of them lies past `next`
+            c.execute('BEGIN')
+            pruned = self._pruned_through(c)
+            if after < pruned:
+                raise ChangesExpired(f"Changes up to {pruned} were pruned; resync and continue from there")
+            c.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log')
+            head = c.fetchone()[0]
+
+            query = 'SELECT seq, table_name, op, row_key, row_data, changed_at FROM change_log WHERE seq > ?'
+            params = [after]
+            if tables:
+                query += f" AND seq <= ? AND table_name IN ({','.join('?' for _ in tables)})"
+                params += [after + limit, *tables]
+            c.execute(query + ' ORDER BY seq LIMIT ?', (*params, limit))
+            rows = c.fetchall()
+            conn.commit()
+
+        changes = [
+            {'seq': seq, 'table': table, 'op': op, 'key': json.loads(key),
+             'row': json.loads(data) if data else None, 'changed_at': changed_at}
+            for seq, table, op, key, data, changed_at in rows
+        ]
+        if tables:
+            next_seq = min(after + limit, head)
+        else:
+            next_seq = changes[-1]['seq'] if changes else after
+        return {'changes': changes, 'next': max(next_seq, after), 'head': head}
+
+    def offset(self, consumer):
+        """The consumer's committed position, or None for a new consumer"""
+        with connect(self.db_path, readonly=True) as conn:
+            row = conn.execute('SELECT last_seq FROM change_consumers WHERE consumer = ?', (consumer,)).fetchone()
+        return row[0] if row else None
+
+    def ack(self, consumer, seq):
+        """Commit that `consumer` has applied every change up to `seq`"""
+        with connect(self.db_path) as conn:
+            conn.execute('''INSERT INTO change_consumers (consumer, last_seq, updated_at) VALUES (?, ?, ?)
+                            ON CONFLICT(consumer) DO UPDATE SET
+                                last_seq = MAX(last_seq, excluded.last_seq), updated_at = excluded.updated_at''',
+                         (consumer, seq, datetime.now().isoformat()))
+
+    def consumers(self):
+        with connect(self.db_path, readonly=True) as conn:
+            rows = conn.execute('SELECT consumer, last_seq, updated_at FROM change_consumers ORDER BY consumer')
+            return {consumer: {'last_seq': seq, 'updated_at': updated} for consumer, seq, updated in rows}
+
+    def prune(self, retention=CHANGE_LOG_RETENTION):
+        """Delete changes older than `retention` seconds from the oldest end; returns rows deleted"""
+        cutoff = time() - retention
+        deleted = 0
+        with connect(self.db_path) as conn:
+            c = conn.cursor()
+            while True:
+                # The newest expired change within the next chunk from the oldest end
+                c.execute('''SELECT MAX(seq) FROM (
+                                 SELECT seq, changed_at FROM change_log ORDER BY seq LIMIT ?
+                             ) WHERE changed_at < ?''', (PRUNE_CHUNK, cutoff))
+                through = c.fetchone()[0]
+                if through is None:
+                    break
+                c.execute('DELETE FROM change_log WHERE seq <= ?', (through,))
+                deleted += c.rowcount
+                c.execute('''INSERT INTO change_log_pruned (id, through_seq) VALUES (1, ?)
+                             ON CONFLICT(id) DO UPDATE SET through_seq = excluded.through_seq''', (through,))
+                conn.commit()
+        return deleted
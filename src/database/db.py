@@ -4,15 +4,106 @@ from pathlib import Path
 from datetime import datetime, timedelta
 import zlib
 import json
+from src.database.querystats import TracedConnection
 
 DB_PATH = Path("data/tweets.db")
 
+# Connection profile. The collector and the API write and read the same file from
+# separate processes; in WAL mode readers never block the writer or each other.
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # Stored in the file, so set once by init_db
+BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "20"))  # Seconds a writer waits for the write lock
+PRAGMAS = {
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # Durable at checkpoints; no fsync per commit in WAL
+    "cache_size": -1024 * int(os.getenv("SQLITE_CACHE_MB", "64")),  # Negative values are KiB
+    "mmap_size": 1024 * 1024 * int(os.getenv("SQLITE_MMAP_MB", "256")),
+    "temp_store": "MEMORY",
+    "journal_size_limit": 64 * 1024 * 1024  # Truncate the WAL back to this after a checkpoint
+}
+
+def connect(path=DB_PATH, timeout=BUSY_TIMEOUT, readonly=False, uri=False):
+    """Open a connection with the PRAGMAS profile, timed and planned into QUERY_STATS.
+
+    `readonly` connections refuse writes, for API reads that must not hold
+    the write lock. `uri` allows "file:...?mode=ro" names, also in ATTACH.
+    """
+    conn = sqlite3.connect(path, timeout=timeout, factory=TracedConnection, uri=uri)
+    pragmas = {**PRAGMAS, "query_only": int(readonly)}
+    conn.executescript("".join(f"PRAGMA {name} = {value};" for name, value in pragmas.items()))
+    return conn
+
+def checkpoint_wal(path=DB_PATH, mode="PASSIVE"):
+    """Copy WAL pages back into the database; PASSIVE never waits for readers or writers.
+
+    Returns (busy, wal_pages, checkpointed_pages).
+    """
+    conn = connect(path)
+    try:
+        return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.close()
+
+def optimize(path=DB_PATH):
+    """Refresh planner statistics for tables whose queries would benefit"""
+    conn = connect(path)
+    try:
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+# Tables whose inserts and updates are appended to change_log, with their key columns
+CDC_TABLES = {
+    'tweets': ('id',),
+    'tweet_mentions': ('tweet_id', 'mentioned_username'),
+    'token_mentions': ('tweet_id', 'token_symbol'),
+    'account_followings': ('follower', 'following'),
+    'trend_events': ('id',)
+}
+
+# Columns derived after the row is written, or bookkeeping, whose updates alone are not logged;
+# they are logged with the row's next change
+CDC_UNLOGGED_COLUMNS = {
+    'tweets': ('cluster_id', 'spam_score'),  # Near-duplicate clusters, see src/database/near_duplicates.py
+    'account_followings': ('swept_at',)  # Sweep that last saw the edge, see the following crawl
+}
+
+def _create_change_triggers(c):
+    """(Re)create the triggers feeding change_log, so they cover columns added since"""
+    for table, keys in CDC_TABLES.items():
+        c.execute(f'PRAGMA table_info({table})')
+        columns = [row[1] for row in c.fetchall()]
+        compared = [name for name in columns if name not in CDC_UNLOGGED_COLUMNS.get(table, ())]
+        row_key = 'json_array(' + ', '.join(f'NEW.{key}' for key in keys) + ')'
+        row_data = 'json_object(' + ', '.join(f"'{name}', NEW.{name}" for name in columns) + ')'
+        old_values = ', '.join(f'OLD.{name}' for name in compared)
+        new_values = ', '.join(f'NEW.{name}' for name in compared)
+        for op, condition in (('insert', ''), ('update', f'WHEN ({old_values}) IS NOT ({new_values})')):
+            c.execute(f'DROP TRIGGER IF EXISTS trg_cdc_{table}_{op}')
+            c.execute(f'''CREATE TRIGGER trg_cdc_{table}_{op}
+                          AFTER {op.upper()} ON {table}
+                          {condition}
+                          BEGIN
+                              INSERT INTO change_log (table_name, op, row_key, row_data)
+                              VALUES ('{table}', '{op}', {row_key}, {row_data});
+                          END''')
+
+def _add_missing_columns(c, table, columns):
+    """Add columns introduced after a table was first created"""
+    c.execute(f'PRAGMA table_info({table})')
+    existing = {row[1] for row in c.fetchall()}
+    added = []
+    for name, column_type in columns.items():
+        if name not in existing:
+            c.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+            added.append(name)
+    return added
+
 def init_db():
     # Create all parent directories
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
+    c.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
     
     # Create tables if they don't exist
     c.execute('''CREATE TABLE IF NOT EXISTS users
@@ -30,7 +121,13 @@ def init_db():
                   profile_image_url TEXT,
                   profile_banner_url TEXT,
                   last_tweet_check TEXT,
-                  last_following_check TEXT)''')
+                  last_following_check TEXT,
+                  profile_fetched_at TEXT,
+                  stored_tweet_count INTEGER DEFAULT 0)''')
+    added = _add_missing_columns(c, 'users', {
+        'profile_fetched_at': 'TEXT',
+        'stored_tweet_count': 'INTEGER DEFAULT 0'
+    })
 
     c.execute('''CREATE TABLE IF NOT EXISTS api_calls
                  (timestamp TEXT,
@@ -67,7 +164,138 @@ def init_db():
                   coordinates_lat REAL,
                   coordinates_long REAL,
                   edit_history_tweet_ids TEXT,
-                  edit_controls TEXT)''')
+                  edit_controls TEXT,
+                  in_reply_to_id TEXT,
+                  cluster_id TEXT,
+                  spam_score REAL)''')
+    _add_missing_columns(c, 'tweets', {'in_reply_to_id': 'TEXT', 'cluster_id': 'TEXT', 'spam_score': 'REAL'})
+
+    if 'stored_tweet_count' in added:
+        # Backfill running tweet counts once; the trigger below keeps them current
+        c.execute('''INSERT OR IGNORE INTO users (username)
+                     SELECT DISTINCT author_username FROM tweets WHERE author_username IS NOT NULL''')
+        c.execute('''UPDATE users SET stored_tweet_count =
+                     (SELECT COUNT(*) FROM tweets WHERE author_username = users.username)''')
+
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_tweets_author_count
+                 AFTER INSERT ON tweets
+                 WHEN NEW.author_username IS NOT NULL
+                 BEGIN
+                     INSERT INTO users (username, stored_tweet_count)
+                     VALUES (NEW.author_username, 1)
+                     ON CONFLICT(username) DO UPDATE SET
+                         stored_tweet_count = COALESCE(stored_tweet_count, 0) + 1;
+                 END''')
+
+    # Engagement time series: every change of a tweet's counts is logged by the trigger
+    # below as deltas, keyed by the second it was seen, so curves are rebuilt by summing
+    c.execute('''CREATE TABLE IF NOT EXISTS engagement_snapshots
+                 (tweet_id TEXT NOT NULL,
+                  observed_at INTEGER NOT NULL,
+                  likes INTEGER DEFAULT 0,
+                  retweets INTEGER DEFAULT 0,
+                  views INTEGER DEFAULT 0,
+                  bookmarks INTEGER DEFAULT 0,
+                  replies INTEGER DEFAULT 0,
+                  quotes INTEGER DEFAULT 0,
+                  PRIMARY KEY (tweet_id, observed_at)) WITHOUT ROWID''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_tweets_engagement_snapshot
+                 AFTER UPDATE OF likes, retweets, views, bookmark_count, reply_counts, quote_counts ON tweets
+                 WHEN (OLD.likes, OLD.retweets, OLD.views, OLD.bookmark_count, OLD.reply_counts, OLD.quote_counts)
+                      IS NOT (NEW.likes, NEW.retweets, NEW.views, NEW.bookmark_count, NEW.reply_counts, NEW.quote_counts)
+                 BEGIN
+                     INSERT INTO engagement_snapshots
+                     (tweet_id, observed_at, likes, retweets, views, bookmarks, replies, quotes)
+                     VALUES (NEW.id, CAST(strftime('%s', 'now') AS INTEGER),
+                             COALESCE(NEW.likes, 0) - COALESCE(OLD.likes, 0),
+                             COALESCE(NEW.retweets, 0) - COALESCE(OLD.retweets, 0),
+                             COALESCE(NEW.views, 0) - COALESCE(OLD.views, 0),
+                             COALESCE(NEW.bookmark_count, 0) - COALESCE(OLD.bookmark_count, 0),
+                             COALESCE(NEW.reply_counts, 0) - COALESCE(OLD.reply_counts, 0),
+                             COALESCE(NEW.quote_counts, 0) - COALESCE(OLD.quote_counts, 0))
+                     ON CONFLICT(tweet_id, observed_at) DO UPDATE SET
+                         likes = likes + excluded.likes,
+                         retweets = retweets + excluded.retweets,
+                         views = views + excluded.views,
+                         bookmarks = bookmarks + excluded.bookmarks,
+                         replies = replies + excluded.replies,
+                         quotes = quotes + excluded.quotes;
+                 END''')
+
+    # Re-poll schedule of tweets whose engagement may still be growing, see repoll.py
+    c.execute('''CREATE TABLE IF NOT EXISTS engagement_repolls
+                 (tweet_id TEXT PRIMARY KEY,
+                  next_poll_at REAL NOT NULL,
+                  interval REAL NOT NULL,
+                  polls INTEGER NOT NULL DEFAULT 0,
+                  last_score INTEGER,
+                  last_polled_at REAL,
+                  velocity REAL,
+                  state TEXT NOT NULL DEFAULT 'active')''')
+
+    # Near-duplicate index: MinHash signatures, their LSH band buckets and cluster sizes,
+    # see src/database/near_duplicates.py
+    c.execute('''CREATE TABLE IF NOT EXISTS tweet_minhash
+                 (tweet_id TEXT PRIMARY KEY,
+                  cluster_id TEXT NOT NULL,
+                  signature BLOB NOT NULL,
+                  indexed_at REAL NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS tweet_lsh_buckets
+                 (bucket INTEGER NOT NULL,
+                  tweet_id TEXT NOT NULL,
+                  PRIMARY KEY (bucket, tweet_id)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS tweet_clusters
+                 (cluster_id TEXT PRIMARY KEY,
+                  size INTEGER NOT NULL,
+                  spam_score REAL NOT NULL,
+                  first_seen REAL,
+                  last_seen REAL)''')
+    _add_missing_columns(c, 'tweet_clusters', {'scored_at': 'REAL'})
+
+    # Terms seen bursting above their baseline by the collector's trend detector
+    c.execute('''CREATE TABLE IF NOT EXISTS trend_events
+                 (id INTEGER PRIMARY KEY,
+                  kind TEXT NOT NULL,
+                  term TEXT NOT NULL,
+                  count REAL,
+                  baseline REAL,
+                  z_score REAL,
+                  detected_at TEXT NOT NULL,
+                  collector_id TEXT)''')
+
+    # Rowid and change_log watermarks of the Parquet export, see src/database/export.py
+    c.execute('''CREATE TABLE IF NOT EXISTS export_watermarks
+                 (table_name TEXT PRIMARY KEY,
+                  last_rowid INTEGER NOT NULL,
+                  exported_rows INTEGER DEFAULT 0,
+                  updated_at TEXT)''')
+    _add_missing_columns(c, 'export_watermarks', {'last_seq': 'INTEGER DEFAULT 0',
+                                                  'unlogged_through': 'REAL DEFAULT 0'})
+
+    # Monthly archives of tweets, see src/database/partitions.py
+    c.execute('''CREATE TABLE IF NOT EXISTS tweet_partitions
+                 (month TEXT PRIMARY KEY,
+                  path TEXT NOT NULL,
+                  row_count INTEGER,
+                  size_bytes INTEGER,
+                  sealed_at TEXT)''')
+
+    # Change data capture: every insert and update of CDC_TABLES, in commit order.
+    # AUTOINCREMENT keeps sequence numbers from being reused once old changes are pruned.
+    c.execute('''CREATE TABLE IF NOT EXISTS change_log
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                  table_name TEXT NOT NULL,
+                  op TEXT NOT NULL,
+                  row_key TEXT NOT NULL,
+                  row_data TEXT,
+                  changed_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS change_consumers
+                 (consumer TEXT PRIMARY KEY,
+                  last_seq INTEGER NOT NULL,
+                  updated_at TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS change_log_pruned
+                 (id INTEGER PRIMARY KEY CHECK (id = 1),
+                  through_seq INTEGER NOT NULL)''')
 
     c.execute('''CREATE TABLE IF NOT EXISTS tweet_mentions
                  (tweet_id TEXT NOT NULL,
@@ -122,6 +350,13 @@ def init_db():
                   following_id TEXT,
                   discovered_at TEXT,
                   PRIMARY KEY (follower, following))''')
+    _add_missing_columns(c, 'account_followings', {'swept_at': 'TEXT'})
+    # Edges dropped by full following sweeps, for the following graph to catch up on
+    c.execute('''CREATE TABLE IF NOT EXISTS account_following_removals
+                 (id INTEGER PRIMARY KEY,
+                  follower TEXT NOT NULL,
+                  following TEXT NOT NULL,
+                  removed_at TEXT NOT NULL)''')
 
     c.execute('''CREATE TABLE IF NOT EXISTS our_following
                  (username TEXT,
@@ -135,6 +370,15 @@ def init_db():
                   checked_at TEXT,
                   PRIMARY KEY (username, page_checked))''')
 
+    c.execute('''CREATE TABLE IF NOT EXISTS following_crawl_state
+                 (username TEXT PRIMARY KEY,
+                  cursor TEXT,
+                  pages_done INTEGER,
+                  last_full_sweep_at TEXT,
+                  following_count_at_sweep INTEGER,
+                  updated_at TEXT)''')
+    _add_missing_columns(c, 'following_crawl_state', {'sweep_started_at': 'TEXT'})
+
     c.execute('''CREATE TABLE IF NOT EXISTS tweet_engagements
                  (tweet_id TEXT,
                   author_username TEXT,
@@ -156,21 +400,97 @@ def init_db():
                   last_searched_at TEXT,
                   PRIMARY KEY (search_type, term))''')
 
+    c.execute('''CREATE TABLE IF NOT EXISTS api_call_yield
+                 (period TEXT NOT NULL,
+                  endpoint TEXT NOT NULL,
+                  account TEXT NOT NULL,
+                  step TEXT NOT NULL,
+                  error_class TEXT NOT NULL,
+                  collector_id TEXT NOT NULL,
+                  calls INTEGER DEFAULT 0,
+                  errors INTEGER DEFAULT 0,
+                  latency REAL DEFAULT 0,
+                  response_size INTEGER DEFAULT 0,
+                  new_tweets INTEGER DEFAULT 0,
+                  new_followings INTEGER DEFAULT 0,
+                  new_threads INTEGER DEFAULT 0,
+                  new_mentions INTEGER DEFAULT 0,
+                  new_tokens INTEGER DEFAULT 0,
+                  new_hashtags INTEGER DEFAULT 0,
+                  PRIMARY KEY (period, endpoint, account, step, error_class, collector_id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS graph_nodes
+                 (node_id INTEGER PRIMARY KEY,
+                  username TEXT UNIQUE NOT NULL)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS account_frontier
+                 (username TEXT PRIMARY KEY,
+                  score REAL NOT NULL,
+                  tracked_followers INTEGER,
+                  avg_engagement REAL,
+                  discovered_at TEXT NOT NULL,
+                  updated_at TEXT NOT NULL,
+                  promoted_at TEXT)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS engagement_candidates
+                 (tweet_id TEXT PRIMARY KEY,
+                  author_username TEXT,
+                  score INTEGER NOT NULL,
+                  queued_at TEXT NOT NULL,
+                  updated_at TEXT NOT NULL,
+                  processed_at TEXT,
+                  status TEXT)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS tracked_accounts
+                 (username TEXT PRIMARY KEY COLLATE NOCASE,
+                  priority INTEGER NOT NULL DEFAULT 0,
+                  tags TEXT,
+                  shard INTEGER NOT NULL,
+                  state TEXT NOT NULL DEFAULT 'active',
+                  source TEXT,
+                  added_at TEXT NOT NULL,
+                  last_fetched_at TEXT,
+                  next_fetch_at REAL NOT NULL DEFAULT 0,
+                  sort_key INTEGER NOT NULL DEFAULT 0)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS account_imports
+                 (path TEXT PRIMARY KEY,
+                  mtime REAL,
+                  size INTEGER,
+                  rows INTEGER,
+                  imported_at TEXT)''')
+
     # Create indexes
     c.execute('CREATE INDEX IF NOT EXISTS idx_tweets_author ON tweets(author_username)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_followings_follower ON account_followings(follower)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_followings_following ON account_followings(following)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_api_calls_endpoint ON api_calls(endpoint)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_api_calls_collector_time ON api_calls(collector_id, timestamp)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_hashtags ON tweet_hashtags(hashtag)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_engagements_time ON tweet_engagements(engaged_at)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_hashtags_time ON tweet_hashtags(discovered_at)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_our_following_day ON our_following(collector_id, followed_at)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_tweets_created ON tweets(created_at)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_tweets_engagement ON tweets(likes, retweets)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tweets_reply_to ON tweets(in_reply_to_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tweets_cluster ON tweets(cluster_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_minhash_indexed ON tweet_minhash(indexed_at)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_mentions_username ON tweet_mentions(mentioned_username)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_threads_conversation ON tweet_threads(conversation_id)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_threads_root ON tweet_threads(root_tweet_id)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_token_mentions_symbol ON token_mentions(token_symbol)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_token_mentions_author ON token_mentions(author_username)')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_engagement_candidates_pending
+                 ON engagement_candidates(score DESC) WHERE processed_at IS NULL''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tracked_due ON tracked_accounts(state, next_fetch_at, sort_key)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tracked_shard_due ON tracked_accounts(shard, state, next_fetch_at, sort_key)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_trend_events_time ON trend_events(detected_at)')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_repolls_due ON engagement_repolls(next_poll_at) WHERE state = 'active'")
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_frontier_pending
+                 ON account_frontier(score DESC) WHERE promoted_at IS NULL''')
+
+    _create_change_triggers(c)
 
     conn.commit()
     conn.close()
@@ -180,7 +500,7 @@ class Database:
         self.db_path = db_path
         
     def get_connection(self):
-        return sqlite3.connect(self.db_path, timeout=20)
+        return connect(self.db_path)
         
     def execute(self, query, params=None):
         with self.get_connection() as conn:
@@ -0,0 +1,245 @@
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from time import time
+from src.database.db import DB_PATH, CDC_TABLES, connect
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional "analytics" extra; without it the exporter is disabled
+    pa = pq = None
+
+EXPORT_DIR = DB_PATH.parent / "parquet"
+EXPORT_BATCH_ROWS = 100_000  # Rows read per batch; each batch writes one file per month
+
+# Exported tables and the timestamp column whose month partitions them
+EXPORT_TABLES = {
+    'tweets': 'created_at',
+    'token_mentions': 'mentioned_at',
+    'tweet_hashtags': 'discovered_at',
+    'account_followings': 'discovered_at',
+    'tweet_engagements': 'engaged_at'
+}
+
+# Rowids of rows whose CDC_UNLOGGED_COLUMNS changed after a Unix time: members of rescored clusters
+UNLOGGED_UPDATES = {
+    'tweets': '''SELECT t.rowid FROM tweet_clusters k JOIN tweets t ON t.cluster_id = k.cluster_id
+                 WHERE k.scored_at > ?'''
+}
+
+logger = logging.getLogger(__name__)
+
+def _column(name, declared):
+    """SELECT expression and Arrow type for a column, by its declared SQLite type"""
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return f'CAST({name} AS INTEGER)', pa.int64()
+    if any(affinity in declared for affinity in ('REAL', 'FLOA', 'DOUB')):
+        return f'CAST({name} AS REAL)', pa.float64()
+    return f'CAST({name} AS TEXT)', pa.string()
+
+def _key_match(table):
+    """Join condition between rows `t` of a CDC table and change_log entries `u`"""
+    return ' AND '.join(f"t.{key} = json_extract(u.row_key, '$[{i}]')" for i, key in enumerate(CDC_TABLES[table]))
+
+class ParquetExporter:
+    """Appends new rows of EXPORT_TABLES to Hive-partitioned Parquet files.
+
+    Files are laid out as EXPORT_DIR/<table>/month=YYYY-MM/part-<rowid>.parquet
+    and each table's rowid watermark is kept in `export_watermarks`. A
+    file is named after the first rowid of its batch, so a run that dies
+    before advancing the watermark rewrites the same files rather than
+    duplicating rows. Rows rewritten by INSERT OR REPLACE get a new rowid
+    and are exported again. Rows of CDC_TABLES updated in place keep their
+    rowid, so their `update` entries in change_log, past the table's
+    `last_seq`, are exported again as update-<seq>.parquet, and rows found
+    by UNLOGGED_UPDATES since `unlogged_through` as
+    update-<seq>-unlogged-<time>.parquet, numbered past the change_log
+    head. Readers keep the copy from the last file by name per key, as
+    AnalyticsEngine does.
+    Columns are cast to their declared SQLite affinity so every file of a
+    table has the same types; columns added later appear in later files.
+    """
+
+    def __init__(self, db_path=DB_PATH, export_dir=EXPORT_DIR, tables=EXPORT_TABLES):
+        self.db_path = db_path
+        self.export_dir = Path(export_dir)
+        self.tables = tables
+
+    @property
+    def available(self):
+        return pa is not None
+
+    def watermarks(self):
+        with connect(self.db_path) as conn:
+            rows = conn.execute('SELECT table_name, last_rowid, last_seq, exported_rows, updated_at FROM export_watermarks')
+            return {row[0]: dict(zip(('last_rowid', 'last_seq', 'exported_rows', 'updated_at'), row[1:])) for row in rows}
+
+    def export(self):
+        """Export every table's new and updated rows; returns {table: rows exported}"""
+        if not self.available:
+            return {}
+        return {table: self.export_table(table) for table in self.tables}
+
+    def export_table(self, table, batch_size=EXPORT_BATCH_ROWS):
+        month_column = self.tables[table]
+        exported = 0
+        started = time()
+        with connect(self.db_path, readonly=True) as conn:
+            columns = {row[1]: _column(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info({table})')}
+            schema = pa.schema([(name, arrow_type) for name, (_, arrow_type) in columns.items()])
+            select = ', '.join(expression for expression, _ in columns.values())
+            row = conn.execute('SELECT last_rowid FROM export_watermarks WHERE table_name = ?', (table,)).fetchone()
+            watermark = row[0] if row else 0
+            head = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+            previous = watermark
+
+            c = conn.cursor()
+            while True:
+                c.execute(f'SELECT rowid, {select} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                          (watermark, batch_size))
+                rows = c.fetchall()
+                if not rows:
+                    break
+                self._write_batch(table, schema, month_column, rows, f"part-{watermark + 1:012d}")
+                watermark = rows[-1][0]
+                exported += len(rows)
+                self._save_watermark(table, watermark, len(rows))
+
+            if table in CDC_TABLES:
+                if not previous:  # Every row was just read as it is now
+                    self._save_update_watermark(table, head, 0)
+                else:
+                    exported += self._export_updates(c, table, schema, month_column, select, watermark, batch_size)
+
+            if table in UNLOGGED_UPDATES:
+                # Rows past the previous watermark were read after `started`
+                if not previous:
+                    self._save_unlogged_watermark(table, started, 0)
+                else:
+                    exported += self._export_unlogged(c, table, schema, month_column, select, previous, head, started)
+
+        if exported:
+            logger.info(f"Exported {exported} rows of {table} to Parquet")
+        return exported
+
+    def unexported(self, c, table):
+        """(rowid watermark, rowids updated since they were exported) of `table`, read with cursor `c`.
+
+        Rows past the watermark or among those updated are not in Parquet
+        as they are now, so they must stay in the table until the next export.
+        """
+        c.execute('SELECT last_rowid, last_seq, unlogged_through FROM export_watermarks WHERE table_name = ?',
+                  (table,))
+        last_rowid, last_seq, through = c.fetchone() or (0, 0, 0)
+        updated = set()
+        if table in CDC_TABLES:
+            c.execute(f'''SELECT t.rowid FROM {table} t
+                            JOIN (SELECT DISTINCT row_key FROM change_log
+                                  WHERE seq > ? AND table_name = ? AND op = 'update') u ON {_key_match(table)}''',
+                      (last_seq or 0, table))
+            updated.update(rowid for rowid, in c.fetchall())
+        if table in UNLOGGED_UPDATES:
+            c.execute(UNLOGGED_UPDATES[table], (through or 0,))
+            updated.update(rowid for rowid, in c.fetchall())
+        return last_rowid, updated
+
+    def _export_updates(self, c, table, schema, month_column, select, watermark, batch_size):
+        """Export again the rows updated in place since the table's change_log watermark"""
+        c.execute('SELECT last_seq FROM export_watermarks WHERE table_name = ?', (table,))
+        row = c.fetchone()
+        last_seq = (row[0] if row else 0) or 0
+        c.execute('SELECT through_seq FROM change_log_pruned WHERE id = 1')
+        row = c.fetchone()
+        if row and row[0] > last_seq:
+            logger.warning(f"Changes of {table} up to {row[0]} were pruned before export; "
+                           f"rows updated before then may be stale in Parquet")
+            last_seq = row[0]
+            self._save_update_watermark(table, last_seq, 0)
+
+        key_match = _key_match(table)
+        exported = 0
+        while True:
+            c.execute('''SELECT MIN(seq), MAX(seq) FROM (
+                             SELECT seq FROM change_log WHERE seq > ? AND table_name = ? AND op = 'update'
+                             ORDER BY seq LIMIT ?
+                         )''', (last_seq, table, batch_size))
+            first_seq, through = c.fetchone()
+            if through is None:
+                break
+            # Rows past the rowid watermark were written since the pass above and are exported as new next time
+            c.execute(f'''SELECT t.rowid, {select} FROM {table} t
+                            JOIN (SELECT DISTINCT row_key FROM change_log
+                                  WHERE seq BETWEEN ? AND ? AND table_name = ? AND op = 'update') u ON {key_match}
+                            WHERE t.rowid <= ?''', (first_seq, through, table, watermark))
+            rows = c.fetchall()
+            if rows:
+                self._write_batch(table, schema, month_column, rows, f"update-{first_seq:012d}")
+            exported += len(rows)
+            last_seq = through
+            self._save_update_watermark(table, last_seq, len(rows))
+        return exported
+
+    def _export_unlogged(self, c, table, schema, month_column, select, watermark, head, started):
+        """Export again the rows UNLOGGED_UPDATES finds changed since the last export"""
+        c.execute('SELECT unlogged_through FROM export_watermarks WHERE table_name = ?', (table,))
+        since = c.fetchone()[0] or 0
+        c.execute(f'SELECT rowid, {select} FROM {table} WHERE rowid IN ({UNLOGGED_UPDATES[table]}) AND rowid <= ?',
+                  (since, watermark))
+        rows = c.fetchall()
+        if rows:
+            # Numbered past every change read so far, so this copy sorts after theirs
+            self._write_batch(table, schema, month_column, rows, f"update-{head + 1:012d}-unlogged-{int(started)}")
+        self._save_unlogged_watermark(table, started, len(rows))
+        return len(rows)
+
+    def _write_batch(self, table, schema, month_column, rows, name):
+        month_index = schema.names.index(month_column) + 1  # Rows start with the rowid
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[str(row[month_index] or 'unknown')[:7]].append(row[1:])
+
+        for month, month_rows in by_month.items():
+            directory = self.export_dir / table / f"month={month}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{name}.parquet"
+            columns = list(zip(*month_rows))
+            batch = pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            )
+            tmp_path = path.with_suffix('.tmp')
+            pq.write_table(batch, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+
+    def _save_watermark(self, table, watermark, rows):
+        with connect(self.db_path) as conn:
+            conn.execute('''INSERT INTO export_watermarks (table_name, last_rowid, exported_rows, updated_at)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT(table_name) DO UPDATE SET
+                                last_rowid = excluded.last_rowid,
+                                exported_rows = exported_rows + excluded.exported_rows,
+                                updated_at = excluded.updated_at''',
+                         (table, watermark, rows, datetime.now().isoformat()))
+
+    def _save_update_watermark(self, table, last_seq, rows):
+        with connect(self.db_path) as conn:
+            conn.execute('''INSERT INTO export_watermarks (table_name, last_rowid, last_seq, exported_rows, updated_at)
+                            VALUES (?, 0, ?, ?, ?)
+                            ON CONFLICT(table_name) DO UPDATE SET
+                                last_seq = excluded.last_seq,
+                                exported_rows = exported_rows + excluded.exported_rows,
+                                updated_at = excluded.updated_at''',
+                         (table, last_seq, rows, datetime.now().isoformat()))
+
+    def _save_unlogged_watermark(self, table, through, rows):
+        with connect(self.db_path) as conn:
+            conn.execute('''INSERT INTO export_watermarks (table_name, last_rowid, unlogged_through, exported_rows, updated_at)
+                            VALUES (?, 0, ?, ?, ?)
+                            ON CONFLICT(table_name) DO UPDATE SET
+                                unlogged_through = excluded.unlogged_through,
+                                exported_rows = exported_rows + excluded.exported_rows,
+                                updated_at = excluded.updated_at''',
+                         (table, through, rows, datetime.now().isoformat()))
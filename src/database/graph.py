@@ -0,0 +1,293 @@
+import functools
+import json
+import os
+import threading
+from pathlib import Path
+from datetime import datetime
+from time import monotonic
+import numpy as np
+from src.database.db import DB_PATH, connect
+
+GRAPH_DIR = Path("data/graph")
+REFRESH_INTERVAL = 30  # Seconds between checks for new edges; each merge rebuilds the CSR arrays
+
+def _locked(method):
+    """Run `method` holding the graph's lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class FollowingGraph:
+    """Following graph kept as memory-mapped CSR arrays.
+
+    Usernames map to dense integer ids in the `graph_nodes` table. Row `i` of
+    the CSR holds the accounts node `i` follows, sorted by node id:
+    `indices[indptr[i]:indptr[i + 1]]`. New rows of `account_followings` are
+    merged in by `refresh()` using the table's rowid as a watermark, and
+    edges dropped by following sweeps are taken out by the id of their
+    `account_following_removals` row.
+
+    Refreshes and queries hold `lock`, so the graph can be shared between
+    threads; the CSR arrays are only ever replaced together.
+    """
+
+    def __init__(self, db_path=DB_PATH, graph_dir=GRAPH_DIR):
+        self.db_path = db_path
+        self.graph_dir = Path(graph_dir)
+        self.node_ids = {}
+        self.usernames = []
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.watermark = 0
+        self.removed_through = 0
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+        self._pagerank = None
+        self._load()
+
+    @property
+    def num_nodes(self):
+        return len(self.usernames)
+
+    @property
+    def num_edges(self):
+        return int(self.indptr[-1])
+
+    def _load(self):
+        """Load node mapping and CSR arrays from disk"""
+        with connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT node_id, username FROM graph_nodes ORDER BY node_id')
+            self.usernames = [username for _, username in c.fetchall()]
+        self.node_ids = {username: i for i, username in enumerate(self.usernames)}
+
+        meta_path = self.graph_dir / "meta.json"
+        if meta_path.exists():
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.watermark = meta["watermark"]
+            self.removed_through = meta.get("removed_through", 0)
+            self.indptr = np.load(self.graph_dir / "indptr.npy", mmap_mode='r')
+            self.indices = np.load(self.graph_dir / "indices.npy", mmap_mode='r')
+        self.indptr = self._padded(self.indptr)
+
+    def _padded(self, indptr):
+        """`indptr` with an empty row for each node added after the last build"""
+        missing = self.num_nodes + 1 - len(indptr)
+        if missing > 0:
+            indptr = np.concatenate([indptr, np.full(missing, indptr[-1], dtype=np.int64)])
+        return indptr
+
+    def _save(self):
+        """Write CSR arrays atomically, meta last so a partial write is just re-merged"""
+        self.graph_dir.mkdir(parents=True, exist_ok=True)
+        for name, array in (("indptr", self.indptr), ("indices", self.indices)):
+            tmp_path = self.graph_dir / f"{name}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, self.graph_dir / f"{name}.npy")
+
+        tmp_path = self.graph_dir / "meta.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "watermark": self.watermark,
+                "removed_through": self.removed_through,
+                "num_nodes": self.num_nodes,
+                "num_edges": self.num_edges,
+                "built_at": datetime.now().isoformat()
+            }, f)
+        os.replace(tmp_path, self.graph_dir / "meta.json")
+
+        self.indptr, self.indices = (np.load(self.graph_dir / "indptr.npy", mmap_mode='r'),
+                                     np.load(self.graph_dir / "indices.npy", mmap_mode='r'))
+
+    def _intern(self, c, usernames):
+        """Assign dense ids to unseen usernames"""
+        new_rows = []
+        for username in usernames:
+            if username not in self.node_ids:
+                self.node_ids[username] = len(self.usernames)
+                self.usernames.append(username)
+                new_rows.append((self.node_ids[username], username))
+        if new_rows:
+            c.executemany('INSERT INTO graph_nodes (node_id, username) VALUES (?, ?)', new_rows)
+
+    @_locked
+    def refresh(self, batch_size=1_000_000, min_interval=REFRESH_INTERVAL):
+        """Merge edges added to account_followings since the last build and drop removed ones.
+
+        Checks at most every `min_interval` seconds, and all changes are
+        merged in one rebuild. Returns edges added.
+        """
+        now = monotonic()
+        if self.refreshed_at is not None and now - self.refreshed_at < min_interval:
+            return 0
+        self.refreshed_at = now
+
+        added, sources, targets = 0, [], []
+        watermark = self.watermark
+        with connect(self.db_path) as conn:
+            c = conn.cursor()
+            while True:
+                c.execute('''
+                    SELECT rowid, follower, following FROM account_followings
+                    WHERE rowid > ? ORDER BY rowid LIMIT ?
+                ''', (watermark, batch_size))
+                rows = c.fetchall()
+                if not rows:
+                    break
+
+                followers = [row[1].lower() for row in rows]
+                followings = [row[2].lower() for row in rows]
+                self._intern(c, followers)
+                self._intern(c, followings)
+                conn.commit()
+
+                sources.append(np.fromiter((self.node_ids[u] for u in followers), dtype=np.int64, count=len(rows)))
+                targets.append(np.fromiter((self.node_ids[u] for u in followings), dtype=np.int64, count=len(rows)))
+                watermark = rows[-1][0]
+                added += len(rows)
+
+            # Removals only drop edges of earlier builds, so an edge followed again since its removal stays
+            c.execute('SELECT id, follower, following FROM account_following_removals WHERE id > ? ORDER BY id',
+                      (self.removed_through,))
+            removals = c.fetchall()
+
+        removed = [(self.node_ids[follower.lower()], self.node_ids[following.lower()])
+                   for _, follower, following in removals
+                   if follower.lower() in self.node_ids and following.lower() in self.node_ids]
+        if added or removals:
+            self._merge(np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64),
+                        np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64),
+                        np.array(removed, dtype=np.int64).reshape(-1, 2))
+            self.watermark = watermark
+            if removals:
+                self.removed_through = removals[-1][0]
+            self._save()
+            self._pagerank = None
+        return added
+
+    def _merge(self, src, dst, removed=None):
+        """Merge new edges into the CSR arrays, dropping duplicates and the (src, dst) pairs in `removed`"""
+        n = self.num_nodes
+        indptr = self._padded(self.indptr)
+        old_src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+        old_keys = old_src * n + np.asarray(self.indices, dtype=np.int64)
+        if removed is not None and len(removed):
+            old_keys = np.setdiff1d(old_keys, removed[:, 0] * n + removed[:, 1])
+        keys = np.unique(np.concatenate([old_keys, src * n + dst]))
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+        self.indptr, self.indices = indptr, (keys % n).astype(np.int32)
+
+    def _node(self, username):
+        node = self.node_ids.get(username.lower())
+        if node is None:
+            raise KeyError(f"Unknown account: {username}")
+        return node
+
+    def _row(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def _edge_sources(self):
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    def _tracked_mask(self, tracked=None):
+        """Boolean mask of tracked accounts; defaults to every account we crawled"""
+        if tracked is None:
+            return np.diff(self.indptr) > 0
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        nodes = [self.node_ids[u.lower()] for u in tracked if u.lower() in self.node_ids]
+        mask[nodes] = True
+        return mask
+
+    @_locked
+    def in_degree(self, tracked=None, limit=50):
+        """Most followed accounts, counting only follows from tracked accounts"""
+        mask = self._tracked_mask(tracked)
+        degrees = np.bincount(self.indices[mask[self._edge_sources()]], minlength=self.num_nodes)
+        top = np.argsort(degrees)[::-1][:limit]
+        return [{"username": self.usernames[i], "in_degree": int(degrees[i])}
+                for i in top if degrees[i] > 0]
+
+    @_locked
+    def jaccard(self, username_a, username_b):
+        """Co-following overlap between two accounts"""
+        row_a = self._row(self._node(username_a))
+        row_b = self._row(self._node(username_b))
+        overlap = len(np.intersect1d(row_a, row_b, assume_unique=True))
+        union = len(row_a) + len(row_b) - overlap
+        return {
+            "overlap": overlap,
+            "union": union,
+            "jaccard": overlap / union if union else 0.0
+        }
+
+    @_locked
+    def similar(self, username, limit=20):
+        """Accounts whose followings overlap most with `username` by Jaccard"""
+        node = self._node(username)
+        row = self._row(node)
+        marked = np.zeros(self.num_nodes, dtype=np.int64)
+        marked[row] = 1
+
+        degrees = np.diff(self.indptr)
+        cumulative = np.concatenate([[0], np.cumsum(marked[self.indices])])
+        overlap = cumulative[self.indptr[1:]] - cumulative[self.indptr[:-1]]
+        union = len(row) + degrees - overlap
+        scores = np.divide(overlap, union, out=np.zeros(self.num_nodes), where=union > 0)
+        scores[node] = 0
+
+        top = np.argsort(scores)[::-1][:limit]
+        return [{"username": self.usernames[i], "jaccard": float(scores[i]), "overlap": int(overlap[i])}
+                for i in top if scores[i] > 0]
+
+    @_locked
+    def reach(self, username):
+        """Number of distinct accounts within one and two follow hops"""
+        node = self._node(username)
+        first_hop = np.asarray(self._row(node))
+
+        starts = self.indptr[first_hop]
+        lengths = self.indptr[first_hop + 1] - starts
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        second_hop = self.indices[offsets + np.arange(lengths.sum())]
+
+        reached = np.unique(np.concatenate([first_hop, second_hop]))
+        reached = reached[reached != node]
+        return {"one_hop": len(first_hop), "two_hop": len(reached)}
+
+    @_locked
+    def pagerank(self, damping=0.85, max_iter=50, tol=1e-6, limit=50):
+        """Top accounts by PageRank, cached until the next refresh"""
+        if self._pagerank is None:
+            n = self.num_nodes
+            if n == 0:
+                return []
+            src = self._edge_sources()
+            out_degree = np.diff(self.indptr).astype(np.float64)
+            dangling = out_degree == 0
+            inv_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+
+            ranks = np.full(n, 1.0 / n)
+            for _ in range(max_iter):
+                spread = np.bincount(self.indices, weights=(ranks * inv_degree)[src], minlength=n)
+                new_ranks = (1 - damping) / n + damping * (spread + ranks[dangling].sum() / n)
+                converged = np.abs(new_ranks - ranks).sum() < tol
+                ranks = new_ranks
+                if converged:
+                    break
+            self._pagerank = ranks
+
+        top = np.argsort(self._pagerank)[::-1][:limit]
+        return [{"username": self.usernames[i], "pagerank": float(self._pagerank[i])} for i in top]
+
+    @_locked
+    def stats(self):
+        return {
+            "nodes": self.num_nodes,
+            "edges": self.num_edges,
+            "watermark": self.watermark
+        }
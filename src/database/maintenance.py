@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from time import time
+from src.database.db import DB_PATH, checkpoint_wal, optimize
+from src.database.partitions import TweetPartitions
+from src.database.export import ParquetExporter
+from src.database.changes import ChangeLog
+from src.database.near_duplicates import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_TICK = 15           # Seconds between checks for due jobs
+WAL_CHECKPOINT_INTERVAL = 300   # Seconds between passive WAL checkpoints
+DB_OPTIMIZE_INTERVAL = 3600     # Seconds between PRAGMA optimize runs
+ARCHIVE_INTERVAL = 6 * 3600     # Seconds between moves of past months' tweets into archives
+EXPORT_INTERVAL = 3600          # Seconds between incremental Parquet exports
+CHANGE_LOG_PRUNE_INTERVAL = 3600  # Seconds between deletions of expired change log entries
+NEAR_DUPLICATE_PRUNE_INTERVAL = 3600  # Seconds between drops of quiet tweets from the near-duplicate index
+
+class DatabaseMaintenance:
+    """Periodic upkeep of the database, run as its own task by the collector.
+
+    Checkpoints the WAL, runs PRAGMA optimize, exports to Parquet, archives
+    past months and prunes the change log and near-duplicate index, each
+    when its interval has passed and off the event loop. Archiving exports
+    first and moves only tweets exported as they are now, and doesn't run
+    without the export. The last checkpoint's page counts are kept for the
+    collector's metrics.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.jobs = {
+            'checkpoint': (WAL_CHECKPOINT_INTERVAL, self._checkpoint),
+            'optimize': (DB_OPTIMIZE_INTERVAL, lambda: optimize(self.db_path)),
+            'export': (EXPORT_INTERVAL, lambda: ParquetExporter(self.db_path).export()),
+            'archive': (ARCHIVE_INTERVAL, self._archive),
+            'changes': (CHANGE_LOG_PRUNE_INTERVAL, lambda: ChangeLog(self.db_path).prune()),
+            'near_duplicates': (NEAR_DUPLICATE_PRUNE_INTERVAL, lambda: NearDuplicateIndex(self.db_path).prune())
+        }
+        # PRAGMA optimize is pointless right after startup; everything else runs on the first tick
+        self.last_runs = {name: 0 for name in self.jobs}
+        self.last_runs['optimize'] = time()
+        self.last_checkpoint = None  # (busy, wal_pages, checkpointed_pages)
+
+    def _checkpoint(self):
+        self.last_checkpoint = checkpoint_wal(self.db_path)
+        busy, wal_pages, checkpointed = self.last_checkpoint
+        if busy:
+            logger.debug(f"WAL checkpoint blocked; {checkpointed}/{wal_pages} pages copied")
+
+    def _archive(self):
+        exporter = ParquetExporter(self.db_path)
+        if not exporter.available:
+            logger.debug("Parquet export unavailable; not archiving tweets")
+            return
+        exporter.export()  # Raises on failure, which skips the archive
+        TweetPartitions(self.db_path).archive(exporter=exporter)
+
+    async def run_due(self):
+        """Run every job whose interval has passed; a failing job doesn't hold up the rest"""
+        for name, (interval, job) in self.jobs.items():
+            now = time()
+            if now - self.last_runs[name] < interval:
+                continue
+            self.last_runs[name] = now
+            try:
+                await asyncio.to_thread(job)
+            except Exception as e:
+                logger.warning(f"Database maintenance job {name} failed: {str(e)}")
+
+    async def run(self):
+        """Run due jobs until cancelled"""
+        while True:
+            await self.run_due()
+            await asyncio.sleep(MAINTENANCE_TICK)
@@ -38,6 +38,7 @@ class Tweet:
     has_media: bool = False
     media_type: Optional[str] = None
     media_url: Optional[str] = None
+    in_reply_to_id: Optional[str] = None
 
 @dataclass
 class Following:
@@ -0,0 +1,222 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from time import time
+import numpy as np
+from src.database.db import DB_PATH, connect
+
+NUM_PERM = 64              # MinHash permutations, so similarity is estimated to about +-0.06
+LSH_BANDS = 16             # Bands of NUM_PERM // LSH_BANDS rows; pairs above ~0.5 similarity share a bucket
+SHINGLE_CHARS = 5          # Character shingles of the normalized text
+MIN_CHARS = 20             # Shorter normalized texts ("gm") are not clustered
+SIMILARITY = 0.7           # Estimated Jaccard similarity that makes a near-duplicate
+INDEX_SIMILARITY = 0.9     # Closer copies join their cluster without being indexed themselves
+SPAM_CLUSTER_SIZE = 5      # Copies beyond the first at which a cluster scores 1.0
+SPAM_THRESHOLD = 0.8       # spam_score at which callers exclude a tweet
+RETENTION = 14 * 24 * 3600  # Seconds a tweet stays matchable once its cluster goes quiet
+SIGNATURE_CHUNK = 50_000   # Shingles hashed per vectorized step, bounding memory to ~25 MB
+LOOKUP_CHUNK = 500         # Buckets per IN (...) lookup
+
+_PRIME = 4294967311  # First prime above 2**32, so a * x + b fits in 64 bits
+
+def _constants(name, count, bits):
+    """Fixed pseudo-random integers, identical in every process and release"""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(f"{name}{i}".encode(), digest_size=8).digest(), 'little') % (1 << bits) | 1
+        for i in range(count)
+    ], dtype=np.uint64)
+
+_A = _constants('minhash-a', NUM_PERM, 32)
+_B = _constants('minhash-b', NUM_PERM, 32)
+_BAND_MULTIPLIERS = _constants('lsh-row', NUM_PERM // LSH_BANDS, 64)
+_BAND_SALTS = _constants('lsh-band', LSH_BANDS, 64)
+
+_URLS = re.compile(r'https?://\S+')
+_MENTIONS = re.compile(r'@\w+')
+_SEPARATORS = re.compile(r'[^\w$#]+')
+
+def normalize_text(text):
+    """Lowercased text without links and @mentions, which vary between copies"""
+    text = _MENTIONS.sub(' ', _URLS.sub(' ', text.lower()))
+    return _SEPARATORS.sub(' ', text).strip()
+
+def _shingles(text):
+    return np.fromiter({zlib.crc32(text[i:i + SHINGLE_CHARS].encode())
+                        for i in range(len(text) - SHINGLE_CHARS + 1)}, dtype=np.uint64)
+
+def signatures(texts):
+    """MinHash signatures of normalized texts, one uint32 row of NUM_PERM per text.
+
+    Shingle hashes of many texts are permuted in one (shingles, NUM_PERM)
+    array and reduced per text with minimum.reduceat.
+    """
+    shingles = [_shingles(text) for text in texts]
+    result = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        end, size = start, 0
+        while end < len(texts) and (end == start or size + len(shingles[end]) <= SIGNATURE_CHUNK):
+            size += len(shingles[end])
+            end += 1
+        hashes = np.concatenate(shingles[start:end])
+        offsets = np.cumsum([0] + [len(s) for s in shingles[start:end - 1]])
+        permuted = (hashes[:, None] * _A + _B) % _PRIME
+        result[start:end] = np.minimum.reduceat(permuted, offsets, axis=0)
+        start = end
+    return result
+
+def band_buckets(signatures):
+    """LSH bucket of each band of each signature, as (texts, LSH_BANDS) signed 64-bit keys"""
+    bands = signatures.reshape(len(signatures), LSH_BANDS, -1).astype(np.uint64)
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64) + _BAND_SALTS
+    keys ^= keys >> np.uint64(31)
+    return keys.view(np.int64)
+
+def spam_score(size):
+    return min(1.0, (size - 1) / SPAM_CLUSTER_SIZE)
+
+class NearDuplicateIndex:
+    """Clusters copy-paste tweets with MinHash signatures and LSH banding.
+
+    Each indexed tweet's signature is kept in `tweet_minhash` and its band
+    buckets in `tweet_lsh_buckets`, so finding candidates for a batch is one
+    primary-key lookup per bucket. A tweet joins the cluster of its most
+    similar candidate at or above SIMILARITY, or starts its own cluster
+    named after it; copies this close to an indexed tweet are not indexed
+    themselves, which keeps buckets of large spam clusters small. Every
+    member of a cluster carries the cluster's `spam_score`, which grows
+    with its size; rescoring members sets the cluster's `scored_at` instead
+    of logging each member to change_log. Retweets are never clustered.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def assign(self, c, tweets):
+        """Cluster newly seen tweets, within the caller's transaction.
+
+        Takes (tweet_id, text) pairs and returns {tweet_id: spam_score} for
+        those of them that have a score, including ones clustered before.
+        """
+        ids = list(dict.fromkeys(str(tweet_id) for tweet_id, _ in tweets))
+        known = self._known(c, ids)
+        batch = {}
+        for tweet_id, text in tweets:
+            tweet_id = str(tweet_id)
+            if tweet_id in known or tweet_id in batch or not text or text.startswith('RT @'):
+                continue
+            normalized = normalize_text(text)
+            if len(normalized) >= MIN_CHARS:
+                batch[tweet_id] = normalized
+
+        if batch:
+            signed = signatures(list(batch.values()))
+            self._cluster(c, list(batch), signed, band_buckets(signed))
+        return self._scores(c, ids)
+
+    def _in_chunks(self, c, query, values):
+        """Rows of `query` with its {} replaced by each chunk's placeholders"""
+        rows = []
+        for start in range(0, len(values), LOOKUP_CHUNK):
+            chunk = values[start:start + LOOKUP_CHUNK]
+            c.execute(query.format(','.join('?' for _ in chunk)), chunk)
+            rows.extend(c.fetchall())
+        return rows
+
+    def _known(self, c, ids):
+        rows = self._in_chunks(c, 'SELECT id FROM tweets WHERE id IN ({}) AND cluster_id IS NOT NULL', ids)
+        return {tweet_id for tweet_id, in rows}
+
+    def _scores(self, c, ids):
+        rows = self._in_chunks(c, 'SELECT id, spam_score FROM tweets WHERE id IN ({}) AND spam_score IS NOT NULL', ids)
+        return dict(rows)
+
+    def _cluster(self, c, ids, signed, buckets):
+        matches = defaultdict(list)
+        for bucket, tweet_id in self._in_chunks(c, 'SELECT bucket, tweet_id FROM tweet_lsh_buckets WHERE bucket IN ({})',
+                                                np.unique(buckets).tolist()):
+            matches[bucket].append(tweet_id)
+        stored = {
+            tweet_id: (np.frombuffer(signature, dtype=np.uint32), cluster_id)
+            for tweet_id, signature, cluster_id in self._in_chunks(
+                c, 'SELECT tweet_id, signature, cluster_id FROM tweet_minhash WHERE tweet_id IN ({})',
+                list({tweet_id for found in matches.values() for tweet_id in found}))
+        }
+
+        now = time()
+        indexed, bucket_rows = [], []
+        for i, tweet_id in enumerate(ids):
+            tweet_buckets = buckets[i].tolist()
+            candidates = list({candidate for bucket in tweet_buckets for candidate in matches.get(bucket, ())
+                               if candidate in stored})
+            cluster_id, similarity = tweet_id, 0.0
+            if candidates:
+                similarities = (np.stack([stored[candidate][0] for candidate in candidates]) == signed[i]).mean(axis=1)
+                best = int(similarities.argmax())
+                if similarities[best] >= SIMILARITY:
+                    cluster_id, similarity = stored[candidates[best]][1], float(similarities[best])
+
+            score = self._join(c, cluster_id, now) if cluster_id != tweet_id else 0.0
+            c.execute('UPDATE tweets SET cluster_id = ?, spam_score = ? WHERE id = ?', (cluster_id, score, tweet_id))
+            if similarity < INDEX_SIMILARITY:
+                stored[tweet_id] = (signed[i], cluster_id)
+                indexed.append((tweet_id, cluster_id, signed[i].tobytes(), now))
+                for bucket in tweet_buckets:
+                    matches[bucket].append(tweet_id)
+                    bucket_rows.append((bucket, tweet_id))
+
+        c.executemany('''INSERT OR REPLACE INTO tweet_minhash (tweet_id, cluster_id, signature, indexed_at)
+                         VALUES (?, ?, ?, ?)''', indexed)
+        c.executemany('INSERT OR IGNORE INTO tweet_lsh_buckets (bucket, tweet_id) VALUES (?, ?)', bucket_rows)
+
+    def _join(self, c, cluster_id, now):
+        """Count one more copy in a cluster and return its spam_score, rescoring members while it changes"""
+        c.execute('''INSERT INTO tweet_clusters (cluster_id, size, spam_score, first_seen, last_seen)
+                     VALUES (?, 2, ?, ?, ?)
+                     ON CONFLICT(cluster_id) DO UPDATE SET size = size + 1, last_seen = excluded.last_seen''',
+                  (cluster_id, spam_score(2), now, now))
+        size = c.execute('SELECT size FROM tweet_clusters WHERE cluster_id = ?', (cluster_id,)).fetchone()[0]
+        score = spam_score(size)
+        if spam_score(size - 1) < 1.0:
+            c.execute('UPDATE tweet_clusters SET spam_score = ?, scored_at = ? WHERE cluster_id = ?',
+                      (score, now, cluster_id))
+            c.execute('UPDATE tweets SET spam_score = ? WHERE cluster_id = ?', (score, cluster_id))
+        return score
+
+    def prune(self, retention=RETENTION):
+        """Stop matching against tweets indexed before `retention` whose cluster has gone quiet; returns tweets dropped"""
+        cutoff = time() - retention
+        with connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT m.tweet_id, m.signature FROM tweet_minhash m
+                         LEFT JOIN tweet_clusters k ON k.cluster_id = m.cluster_id
+                         WHERE m.indexed_at < ? AND COALESCE(k.last_seen, 0) < ?''', (cutoff, cutoff))
+            rows = c.fetchall()
+            if not rows:
+                return 0
+            # Buckets are recomputed from the signatures, so each delete is a key lookup
+            buckets = band_buckets(np.stack([np.frombuffer(signature, dtype=np.uint32) for _, signature in rows]))
+            c.executemany('DELETE FROM tweet_lsh_buckets WHERE bucket = ? AND tweet_id = ?',
+                          [(bucket, tweet_id) for (tweet_id, _), row in zip(rows, buckets.tolist()) for bucket in row])
+            c.executemany('DELETE FROM tweet_minhash WHERE tweet_id = ?', [(tweet_id,) for tweet_id, _ in rows])
+            c.execute('DELETE FROM tweet_clusters WHERE last_seen < ?', (cutoff,))
+            conn.commit()
+        return len(rows)
+
+    def cluster(self, cluster_id, limit=100):
+        """A cluster's size and score with its most recently collected members"""
+        with connect(self.db_path, readonly=True) as conn:
+            row = conn.execute('SELECT size, spam_score, first_seen, last_seen FROM tweet_clusters WHERE cluster_id = ?',
+                               (cluster_id,)).fetchone()
+            members = conn.execute('''SELECT id, author_username, text, created_at FROM tweets
+                                      WHERE cluster_id = ? ORDER BY collected_at DESC LIMIT ?''',
+                                   (cluster_id, limit)).fetchall()
+        if row is None and not members:
+            return None
+        size, score, first_seen, last_seen = row or (1, 0.0, None, None)
+        return {
+            'cluster_id': cluster_id, 'size': size, 'spam_score': score,
+            'first_seen': first_seen, 'last_seen': last_seen,
+            'members': [dict(zip(('id', 'author_username', 'text', 'created_at'), member)) for member in members]
+        }
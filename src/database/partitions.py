@@ -0,0 +1,248 @@
+import logging
+import os
+import re
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from src.database.db import DB_PATH, connect
+
+ARCHIVE_DIR = DB_PATH.parent / "archive"
+ARCHIVE_CHUNK_ROWS = 10000   # Tweets moved per transaction, so collector writes are not held up
+TABLE = 'tweets'
+
+logger = logging.getLogger(__name__)
+
+def month_of(timestamp):
+    """'YYYY-MM' of an ISO-like timestamp, the partition key"""
+    return str(timestamp)[:7]
+
+def next_month(month):
+    year, mon = map(int, month.split('-'))
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+def _schema_name(month):
+    return 'p_' + month.replace('-', '_')
+
+class TweetPartitions:
+    """Monthly archives of the `tweets` table in separate SQLite files.
+
+    The main database keeps the current month hot. `archive()` moves older
+    months into ARCHIVE_DIR/tweets_YYYY_MM.db, one file per month, then
+    VACUUMs each file and marks it read-only. Archives are listed in the
+    `tweet_partitions` table, so a file can be moved to other storage by
+    updating its path (see `move()`).
+
+    `connect(since, until)` is the query router: it ATTACHes only the
+    archives overlapping the time range, read-only, under a `tweets_all`
+    view. `ranges()` splits a range needing more archives than SQLite can
+    attach into ranges that each fit, newest first. A tweet seen again after its month was archived is inserted
+    into the hot table; the view prefers that copy and the next
+    `archive()` replaces the archived one. Counts kept by the insert
+    trigger on `tweets` are not decremented when rows move.
+    """
+
+    def __init__(self, db_path=DB_PATH, archive_dir=ARCHIVE_DIR):
+        self.db_path = db_path
+        self.archive_dir = Path(archive_dir)
+
+    def partitions(self):
+        """{month: path} of every archive, oldest first"""
+        with connect(self.db_path) as conn:
+            rows = conn.execute('SELECT month, path FROM tweet_partitions ORDER BY month').fetchall()
+        return {month: Path(path) for month, path in rows}
+
+    def _columns(self, conn, schema):
+        return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({TABLE})').fetchall()]
+
+    def _create_archive(self, conn, path):
+        """Create or update an archive file with the hot table's columns and indexes"""
+        ddl = [sql for sql, in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index') AND sql IS NOT NULL "
+            "ORDER BY type DESC", (TABLE,)
+        )]
+        columns = dict(row[1:3] for row in conn.execute(f'PRAGMA main.table_info({TABLE})'))
+        if path.exists():
+            os.chmod(path, 0o644)
+        archive = sqlite3.connect(path)
+        try:
+            for sql in ddl:
+                archive.execute(re.sub(r'^CREATE (TABLE|INDEX) ', r'CREATE \1 IF NOT EXISTS ', sql))
+            existing = {row[1] for row in archive.execute(f'PRAGMA table_info({TABLE})')}
+            for name, column_type in columns.items():
+                if name not in existing:
+                    archive.execute(f'ALTER TABLE {TABLE} ADD COLUMN {name} {column_type}')
+            archive.commit()
+        finally:
+            archive.close()
+
+    def _seal(self, path):
+        """Compact an archive and make it read-only"""
+        archive = sqlite3.connect(path)
+        try:
+            archive.execute('ANALYZE')
+            archive.execute('VACUUM')
+        finally:
+            archive.close()
+        os.chmod(path, 0o444)
+
+    def archive(self, before=None, exporter=None):
+        """Move tweets created before `before` (default: this month) into monthly archives.
+
+        Runs chunk by chunk, copying into the archive before deleting from the
+        hot table, so an interrupted run repeats cleanly. With `exporter`, a
+        ParquetExporter, tweets it has not exported as they are now stay hot
+        until a later run. Returns rows moved.
+        """
+        boundary = month_of(before or datetime.now().isoformat())
+        moved = 0
+        with connect(self.db_path) as conn:
+            months = [month for month, in conn.execute(
+                f'SELECT DISTINCT substr(created_at, 1, 7) FROM {TABLE} WHERE created_at < ?', (boundary,)
+            ).fetchall()]
+            known = dict(conn.execute('SELECT month, path FROM tweet_partitions').fetchall())
+        if not months:
+            return 0
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        for month in months:
+            path = Path(known.get(month) or self.archive_dir / f"tweets_{month.replace('-', '_')}.db")
+            with connect(self.db_path) as conn:
+                self._create_archive(conn, path)
+            count, rows = self._move_month(month, path, exporter)
+            self._seal(path)
+            with connect(self.db_path) as conn:
+                conn.execute('''INSERT INTO tweet_partitions (month, path, row_count, size_bytes, sealed_at)
+                                VALUES (?, ?, ?, ?, ?)
+                                ON CONFLICT(month) DO UPDATE SET
+                                    path = excluded.path, row_count = excluded.row_count,
+                                    size_bytes = excluded.size_bytes, sealed_at = excluded.sealed_at''',
+                             (month, str(path), rows, path.stat().st_size, datetime.now().isoformat()))
+            moved += count
+            logger.info(f"Archived {count} tweets from {month} to {path} ({rows} in archive)")
+        return moved
+
+    def _move_month(self, month, path, exporter=None):
+        """Move one month's hot rows into its archive; returns (rows moved, rows in archive)"""
+        moved = 0
+        conn = connect(self.db_path)
+        try:
+            c = conn.cursor()
+            c.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id TEXT PRIMARY KEY)')
+            c.execute('CREATE TEMP TABLE IF NOT EXISTS archive_held (row INTEGER PRIMARY KEY)')
+            c.execute('DELETE FROM temp.archive_held')
+            held = ''
+            if exporter is not None:
+                last_rowid, updated = exporter.unexported(c, TABLE)
+                c.executemany('INSERT INTO temp.archive_held (row) VALUES (?)', [(rowid,) for rowid in updated])
+                conn.commit()
+                held = f'AND rowid <= {int(last_rowid)} AND rowid NOT IN (SELECT row FROM temp.archive_held)'
+            conn.execute('ATTACH DATABASE ? AS archive', (str(path),))
+            columns = ', '.join(self._columns(conn, 'main'))
+            # One transaction per chunk; closing the connection rolls back a failed one
+            while True:
+                c.execute('DELETE FROM temp.archive_batch')
+                # The newest row stays: SQLite reuses the highest rowid once it is
+                # deleted, which would slip new rows past rowid watermarks
+                c.execute(f'''INSERT INTO temp.archive_batch
+                              SELECT id FROM main.{TABLE}
+                              WHERE created_at >= ? AND created_at < ?
+                                AND rowid < (SELECT MAX(rowid) FROM main.{TABLE}) {held}
+                              LIMIT ?''', (month, next_month(month), ARCHIVE_CHUNK_ROWS))
+                if c.rowcount <= 0:
+                    conn.commit()
+                    break
+                c.execute(f'''INSERT OR REPLACE INTO archive.{TABLE} ({columns})
+                              SELECT {columns} FROM main.{TABLE}
+                              WHERE id IN (SELECT id FROM temp.archive_batch)''')
+                c.execute(f'DELETE FROM main.{TABLE} WHERE id IN (SELECT id FROM temp.archive_batch)')
+                moved += c.rowcount
+                conn.commit()
+            rows = c.execute(f'SELECT COUNT(*) FROM archive.{TABLE}').fetchone()[0]
+            conn.execute('DETACH DATABASE archive')
+        finally:
+            conn.close()
+        return moved, rows
+
+    def move(self, month, directory):
+        """Relocate one archive, e.g. to cheaper storage, and repoint the router at it"""
+        path = self.partitions()[month]
+        target = Path(directory) / path.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(target))
+        with connect(self.db_path) as conn:
+            conn.execute('UPDATE tweet_partitions SET path = ? WHERE month = ?', (str(target), month))
+        return target
+
+    def months_between(self, since=None, until=None):
+        """Archived months overlapping [since, until), newest first"""
+        lower = month_of(since) if since else None
+        upper = month_of(until) if until else None
+        return [
+            month for month in sorted(self.partitions(), reverse=True)
+            # `until` is exclusive, so a range ending at a month's start doesn't need it
+            if (lower is None or month >= lower) and (upper is None or month < upper or str(until) > month)
+        ]
+
+    def attach_limit(self):
+        with connect(self.db_path) as conn:
+            return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+    def ranges(self, since=None, until=None):
+        """[since, until) split into (since, until) ranges that `connect` can serve, newest first.
+
+        Each range but the last starts at the first of its archived months;
+        the last keeps `since`, so hot rows older than every archive are covered.
+        """
+        months = self.months_between(since, until)
+        limit = self.attach_limit()
+        ranges, upper = [], until
+        for start in range(0, len(months), limit):
+            chunk = months[start:start + limit]
+            lower = chunk[-1] if start + limit < len(months) else since
+            ranges.append((lower, upper))
+            upper = lower
+        return ranges or [(since, until)]
+
+    @contextmanager
+    def connect(self, since=None, until=None):
+        """Read-only connection whose `tweets_all` view covers the range.
+
+        The view spans the hot table plus the archives the range needs, so
+        recent-data queries never touch the archives. Raises ValueError when
+        the range needs more archives than SQLite can attach at once.
+        """
+        conn = connect(self.db_path, uri=True)
+        try:
+            paths = self.partitions()
+            months = self.months_between(since, until)
+            limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+            if len(months) > limit:
+                raise ValueError(f"Range spans {len(months)} monthly archives; at most {limit} can be queried at once")
+
+            columns = self._columns(conn, 'main')
+            selects = [f"SELECT {', '.join(columns)} FROM main.{TABLE}"]
+            for month in months:
+                schema = _schema_name(month)
+                conn.execute('ATTACH DATABASE ? AS ' + schema, (f"file:{paths[month]}?mode=ro",))
+                archived = set(self._columns(conn, schema))
+                select = ', '.join(name if name in archived else f'NULL AS {name}' for name in columns)
+                selects.append(f'''SELECT {select} FROM {schema}.{TABLE} AS a
+                                   WHERE NOT EXISTS (SELECT 1 FROM main.{TABLE} AS h WHERE h.id = a.id)''')
+            conn.execute(f"CREATE TEMP VIEW tweets_all AS {' UNION ALL '.join(selects)}")
+            # Only now, since query_only also refuses the temp view
+            conn.execute('PRAGMA query_only = 1')
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self):
+        with connect(self.db_path) as conn:
+            hot = conn.execute(f'SELECT COUNT(*), MIN(created_at) FROM {TABLE}').fetchone()
+            archives = conn.execute('''SELECT month, path, row_count, size_bytes, sealed_at
+                                       FROM tweet_partitions ORDER BY month''').fetchall()
+        return {
+            'hot': {'rows': hot[0], 'oldest': hot[1]},
+            'archives': [dict(zip(('month', 'path', 'rows', 'size_bytes', 'sealed_at'), row)) for row in archives]
+        }
@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter, time
+
+QUERY_STATS_DIR = Path("data/querystats")
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", "100")) / 1000
+PROGRESS_STEPS = 1000   # VM instructions between progress callbacks; the step count's resolution
+MAX_STATEMENTS = 2000   # Distinct normalized statements tracked before the rest share one entry
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)
+def normalize(sql):
+    """Statement text with literals and IN lists folded, so variants share one entry"""
+    sql = _SPACE.sub(" ", sql).strip().rstrip(";")
+    sql = _LITERALS.sub("?", sql)
+    return _IN_LISTS.sub("(?, ...)", sql)
+
+def is_scan(detail):
+    """Whether an EXPLAIN QUERY PLAN line walks a whole table or index"""
+    return detail.startswith("SCAN ")
+
+class _Entry:
+    __slots__ = ('statement', 'calls', 'seconds', 'max_seconds', 'rows', 'steps', 'slow', 'plan')
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.steps = 0
+        self.slow = 0
+        self.plan = None
+
+    def to_dict(self):
+        return {
+            'statement': self.statement,
+            'calls': self.calls,
+            'total_ms': round(self.seconds * 1000, 3),
+            'mean_ms': round(self.seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_seconds * 1000, 3),
+            'rows': self.rows,
+            'vm_steps': self.steps,
+            'slow': self.slow,
+            'full_scan': any(is_scan(detail) for detail in self.plan or ()),
+            'plan': self.plan
+        }
+
+class _Statement:
+    """One execution: its time and steps across execute() and the fetches that follow"""
+    __slots__ = ('entry', 'sql', 'parameters', 'expanded', 'seconds', 'steps', 'logged')
+
+    def __init__(self, entry, sql, parameters):
+        self.entry = entry
+        self.sql = sql
+        self.parameters = parameters
+        self.expanded = None
+        self.seconds = 0.0
+        self.steps = 0
+        self.logged = False
+
+class QueryStats:
+    """Per-statement latency, rows and VM steps for this process, by normalized statement.
+
+    Steps come from the connection's progress handler and grow with the
+    rows a statement visits, so a cheap-looking query that scans a table
+    stands out even before it gets slow. Each distinct statement is
+    planned once with EXPLAIN QUERY PLAN; executions slower than
+    SLOW_QUERY_SECONDS are logged with their bound values and plan.
+    """
+
+    def __init__(self, slow_seconds=SLOW_QUERY_SECONDS):
+        self.slow_seconds = slow_seconds
+        self.entries = {}
+        self.started_at = time()
+        self._lock = threading.Lock()
+
+    def begin(self, sql, parameters):
+        statement = normalize(sql)
+        with self._lock:
+            entry = self.entries.get(statement)
+            if entry is None:
+                if len(self.entries) >= MAX_STATEMENTS:
+                    statement = '<other>'
+                    entry = self.entries.get(statement)
+                if entry is None:
+                    entry = self.entries[statement] = _Entry(statement)
+            entry.calls += 1
+        return _Statement(entry, sql, parameters)
+
+    def record(self, conn, statement, seconds, steps, rows):
+        """Add one execute() or fetch to its statement; plans and logs outside the lock"""
+        entry = statement.entry
+        statement.seconds += seconds
+        statement.steps += steps
+        with self._lock:
+            entry.seconds += seconds
+            entry.max_seconds = max(entry.max_seconds, statement.seconds)
+            entry.rows += rows
+            entry.steps += steps
+            needs_plan = entry.plan is None
+            if needs_plan:
+                entry.plan = []
+            slow = not statement.logged and statement.seconds >= self.slow_seconds
+            if slow:
+                statement.logged = True
+                entry.slow += 1
+
+        if needs_plan:
+            entry.plan = self.explain(conn, statement)
+        if slow:
+            plan = "; ".join(entry.plan) or "no plan"
+            logger.warning(f"Slow query ({statement.seconds * 1000:.0f} ms, ~{statement.steps} VM steps): "
+                           f"{statement.expanded or statement.sql} [plan: {plan}]")
+
+    def explain(self, conn, statement):
+        """EXPLAIN QUERY PLAN detail lines, on an untraced cursor of the same connection"""
+        if statement.parameters is None:
+            return []
+        try:
+            c = sqlite3.Cursor(conn)
+            c.execute(f"EXPLAIN QUERY PLAN {statement.sql}", statement.parameters)
+            return [row[3] for row in c.fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def summary(self, limit=20, sort='total_ms'):
+        """The top `limit` statements by `sort` (any numeric field of an entry)"""
+        with self._lock:
+            entries = [entry.to_dict() for entry in self.entries.values()]
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        return entries[:limit]
+
+    def write(self, path):
+        """Atomically write all entries so the API process can serve them"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'written_at': time(), 'started_at': self.started_at,
+                       'entries': self.summary(limit=None)}, f)
+        os.replace(tmp_path, path)
+
+QUERY_STATS = QueryStats()
+
+def read_query_stats(directory=QUERY_STATS_DIR, max_age=300):
+    """Entries written by other processes, keyed by the file's stem; stale files are skipped"""
+    stats = {}
+    for path in Path(directory).glob('*.json'):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if time() - data.get('written_at', 0) <= max_age:
+            stats[path.stem] = data['entries']
+    return stats
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times execute() and fetches into QUERY_STATS"""
+
+    _statement = None
+
+    def _timed(self, method, *args):
+        conn = self.connection
+        steps = conn.steps
+        start = perf_counter()
+        result = method(*args)
+        return result, perf_counter() - start, conn.steps - steps
+
+    def execute(self, sql, parameters=()):
+        self._statement = QUERY_STATS.begin(sql, parameters)
+        _, seconds, steps = self._timed(super().execute, sql, parameters)
+        self._statement.expanded = self.connection.last_sql
+        QUERY_STATS.record(self.connection, self._statement, seconds, steps, max(self.rowcount, 0))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        # Only a list can be replayed for the plan; generators are consumed by the call
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, list) and seq_of_parameters else None
+        self._statement = QUERY_STATS.begin(sql, first)
+        _, seconds, steps = self._timed(super().executemany, sql, seq_of_parameters)
+        QUERY_STATS.record(self.connection, self._statement, seconds, steps, max(self.rowcount, 0))
+        return self
+
+    def _fetch(self, method, *args):
+        result, seconds, steps = self._timed(method, *args)
+        if self._statement is not None:
+            rows = len(result) if isinstance(result, list) else int(result is not None)
+            QUERY_STATS.record(self.connection, self._statement, seconds, steps, rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+class TracedConnection(sqlite3.Connection):
+    """Connection factory for sqlite3.connect() that feeds QUERY_STATS.
+
+    The trace callback keeps the last statement with its bound values for
+    the slow-query log, and the progress handler counts VM steps. Iterating
+    a cursor directly still counts its steps but not its time.
+
+    Leaving a `with connect() as conn:` block commits or rolls back as
+    usual and then closes the connection: sqlite3 connections sit in a
+    reference cycle through their statement cache, so unclosed ones keep
+    their file handles until the cyclic garbage collector runs. The
+    callbacks hold the connection weakly so as not to add another cycle.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.steps = 0
+        self.last_sql = None
+        ref = weakref.ref(self)
+        self.set_trace_callback(lambda sql: TracedConnection._trace(ref(), sql))
+        self.set_progress_handler(lambda: TracedConnection._progress(ref()), PROGRESS_STEPS)
+
+    @staticmethod
+    def _trace(conn, sql):
+        # Trigger bodies are reported as "-- TRIGGER name" comments
+        if conn is not None and not sql.startswith("--"):
+            conn.last_sql = sql
+
+    @staticmethod
+    def _progress(conn):
+        if conn is not None:
+            conn.steps += PROGRESS_STEPS
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self.close()
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
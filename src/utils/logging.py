@@ -1,19 +1,111 @@
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
+import random
+import sys
 from pathlib import Path
 import json
 from datetime import datetime
 
-class TweetFilter(logging.Filter):
+# Loggers that are chatty at INFO; their per-request lines are only wanted when asked for
+DEFAULT_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING"}
+
+_listener = None
+_log_queue = None
+_sample_rate = 0.01
+
+class SampleFilter(logging.Filter):
+    """Let through a random share of records; attached to the per-item loggers from `sampled()`"""
+
     def filter(self, record):
-        return "HTTP Request" not in record.msg
+        return _sample_rate >= 1 or random.random() < _sample_rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields passed to the log call"""
+
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in self.RESERVED})
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records with their message rendered and traceback kept as a separate field"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _stop_listener():
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+atexit.register(_stop_listener)
+
+def log_queue_depth():
+    """Records waiting for the listener thread"""
+    return _log_queue.qsize() if _log_queue else 0
+
+def sampled(logger):
+    """Child of `logger` that keeps only LOG_SAMPLE_RATE of its records, for per-tweet lines.
+
+    Records are dropped before any handler sees them, so unsampled lines
+    cost a random() call and no formatting or I/O.
+    """
+    child = logger.getChild("sampled")
+    if not any(isinstance(f, SampleFilter) for f in child.filters):
+        child.addFilter(SampleFilter())
+    return child
+
+def setup_logging(level="INFO", fmt="text", levels=None, sample_rate=0.01):
+    """Route all logging through a queue to a background thread writing to stdout.
+
+    Log calls on the event loop only enqueue the record; formatting and the
+    blocking write happen in the QueueListener's thread. `levels` maps
+    logger names (e.g. "src.collectors.twitter.timeline") to their levels.
+    """
+    global _listener, _log_queue, _sample_rate
+    _sample_rate = sample_rate
+
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s %(name)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+
+    root = logging.getLogger()
+    _stop_listener()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+
+    _log_queue = queue.SimpleQueue()
+    root.addHandler(LogQueueHandler(_log_queue))
+    root.setLevel(level)
+    for name, logger_level in {**DEFAULT_LEVELS, **(levels or {})}.items():
+        logging.getLogger(name).setLevel(logger_level)
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    logging.getLogger().addFilter(TweetFilter())
+    _listener = logging.handlers.QueueListener(_log_queue, handler, respect_handler_level=True)
+    _listener.start()
 
 def update_status(task, next_run=None, status_file=Path("data/collector_status.json")):
     status = {
@@ -22,4 +114,4 @@ def update_status(task, next_run=None, status_file=Path("data/collector_status.j
         "last_update": datetime.now().isoformat()
     }
     with open(status_file, "w") as f:
-        json.dump(status, f) 
\ No newline at end of file
+        json.dump(status, f)
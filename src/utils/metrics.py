@@ -0,0 +1,174 @@
+import json
+import math
+import os
+from bisect import bisect_left
+from pathlib import Path
+from time import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+class _Metric:
+    """A metric family; `labels(...)` returns the child holding one series.
+
+    Children are cached per label tuple, so hot paths can keep the child
+    and pay only an attribute update per observation. Updates are not
+    locked: the collector records from a single event loop thread.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self._child()
+        return child
+
+    def samples(self):
+        """(suffix, labels dict, value) for every series"""
+        for key, child in self.children.items():
+            labels = dict(zip(self.labelnames, key))
+            yield from ((suffix, {**labels, **extra}, value) for suffix, extra, value in child.samples())
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        return [('', {}, self.value)]
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        samples = []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            samples.append(('_bucket', {'le': '+Inf' if bound == math.inf else repr(float(bound))}, cumulative))
+        samples.append(('_sum', {}, self.sum))
+        samples.append(('_count', {}, cumulative))
+        return samples
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _child(self):
+        return _Value()
+
+    def samples(self):
+        return ((suffix or '_total', labels, value) for suffix, labels, value in super().samples())
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def _child(self):
+        return _Value()
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        """Plain data for every family, to render here or write for another process"""
+        return {
+            name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'samples': [[name + suffix, labels, value] for suffix, labels, value in metric.samples()]
+            }
+            for name, metric in self.metrics.items()
+        }
+
+REGISTRY = MetricsRegistry()
+
+def write_snapshot(path, registry=REGISTRY):
+    """Atomically write the registry so another process can serve it"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({'written_at': time(), 'families': registry.snapshot()}, f)
+    os.replace(tmp_path, path)
+
+def read_snapshots(directory, max_age=300):
+    """Families written by other processes, keyed by the file's stem; stale files are skipped"""
+    snapshots = {}
+    for path in Path(directory).glob('*.json'):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if time() - data.get('written_at', 0) <= max_age:
+            snapshots[path.stem] = data['families']
+    return snapshots
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+def render(sources):
+    """Prometheus text exposition of several snapshots, each tagged with a `process` label.
+
+    `sources` maps a process name to a snapshot; families with the same name
+    are merged so each gets a single HELP/TYPE header.
+    """
+    families = {}
+    for process, snapshot in sources.items():
+        for name, family in snapshot.items():
+            merged = families.setdefault(name, {'type': family['type'], 'help': family['help'], 'samples': []})
+            merged['samples'].extend(
+                (sample, {'process': process, **labels}, value) for sample, labels, value in family['samples']
+            )
+
+    lines = []
+    for name, family in sorted(families.items()):
+        lines.append(f"# HELP {name} {_escape(family['help'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for sample, labels, value in family['samples']:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{sample}{{{label_text}}} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,73 @@
+import hashlib
+import numpy as np
+
+class WindowedCountMin:
+    """A ring of Count-Min sketches, one per time window, sharing hash functions.
+
+    Counts live in one (windows, depth, width) array, so a term's count in
+    every window is a single fancy-indexed read. Updates are conservative:
+    only the rows holding the current minimum are raised, which keeps
+    overestimates from colliding terms low. Estimates never undercount.
+    """
+
+    def __init__(self, windows, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = np.arange(depth)
+        self.counts = np.zeros((windows, depth, width), dtype=np.int32)
+
+    def indexes(self, item):
+        """Column of `item` in each row, by double hashing one 64-bit digest"""
+        digest = hashlib.blake2b(item.encode(), digest_size=8).digest()
+        h1 = int.from_bytes(digest[:4], 'little')
+        h2 = int.from_bytes(digest[4:], 'little') | 1
+        return (h1 + self.rows * h2) % self.width
+
+    def add(self, window, indexes, count=1):
+        cells = self.counts[window, self.rows, indexes]
+        target = cells.min() + count
+        self.counts[window, self.rows, indexes] = np.maximum(cells, target)
+        return int(target)
+
+    def estimates(self, indexes):
+        """The item's estimated count in every window"""
+        return self.counts[:, self.rows, indexes].min(axis=1)
+
+    def clear(self, window):
+        self.counts[window] = 0
+
+class SpaceSaving:
+    """The `k` most frequent items of a stream in O(k) memory (Metwally et al.).
+
+    An item not tracked while all `k` slots are taken replaces the least
+    counted one and inherits its count, recorded as the error bound, so
+    every item with more than n / k occurrences is guaranteed a slot.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item, count=1):
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.k:
+            self.counts[item] = count
+            self.errors[item] = 0
+            return
+        evicted = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(evicted)
+        del self.errors[evicted]
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+
+    def top(self, n=None):
+        """(item, count, error) by count, highest first"""
+        items = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)
+        return [(item, count, self.errors[item]) for item, count in items[:n]]
+
+    def clear(self):
+        self.counts.clear()
+        self.errors.clear()
@@ -0,0 +1,77 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from time import time
+
+HEADER = struct.Struct('16s')  # digest of the bucket layout
+SLOT = struct.Struct('dd')     # tokens, last refill time
+
+class SharedTokenBuckets:
+    """Token buckets in a memory-mapped file, shared by every process that opens it.
+
+    `buckets` maps a bucket name to (capacity, refill rate per second). A
+    reservation takes the file lock, refills the bucket, takes one token and
+    returns how long the caller must wait for it. Tokens may go negative,
+    so concurrent callers queue up behind each other rather than bursting.
+    """
+
+    def __init__(self, path, buckets):
+        self.path = Path(path)
+        self.buckets = buckets
+        self.slots = {name: i for i, name in enumerate(sorted(buckets))}
+        self.size = HEADER.size + SLOT.size * len(self.slots)
+        self.digest = hashlib.md5(repr(sorted(buckets.items())).encode()).digest()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked():
+            if os.fstat(self.fd).st_size != self.size:
+                os.ftruncate(self.fd, self.size)
+            self.map = mmap.mmap(self.fd, self.size)
+            if HEADER.unpack_from(self.map, 0)[0] != self.digest:
+                # New file or a different bucket layout: start every bucket full
+                now = time()
+                HEADER.pack_into(self.map, 0, self.digest)
+                for name, slot in self.slots.items():
+                    SLOT.pack_into(self.map, self._offset(slot), buckets[name][0], now)
+
+    def _offset(self, slot):
+        return HEADER.size + slot * SLOT.size
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def reserve(self, name, tokens=1):
+        """Take tokens from a bucket; returns seconds to wait before using them"""
+        capacity, rate = self.buckets[name]
+        offset = self._offset(self.slots[name])
+        with self._locked():
+            available, last = SLOT.unpack_from(self.map, offset)
+            now = time()
+            available = min(capacity, available + (now - last) * rate) - tokens
+            SLOT.pack_into(self.map, offset, available, now)
+        return max(0.0, -available / rate)
+
+    def levels(self):
+        """Current token count per bucket"""
+        now = time()
+        with self._locked():
+            levels = {}
+            for name, slot in self.slots.items():
+                capacity, rate = self.buckets[name]
+                available, last = SLOT.unpack_from(self.map, self._offset(slot))
+                levels[name] = round(min(capacity, available + (now - last) * rate), 2)
+        return levels
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
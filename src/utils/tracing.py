@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter, time
+from weakref import WeakKeyDictionary
+
+TRACE_DIR = Path("data/traces")
+FLUSH_EVENTS = 200  # Buffered spans before they are appended to the trace file
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+class Tracer:
+    """Timed spans with parent links, written as Chrome trace events.
+
+    Each span becomes a complete ("X") event in a JSON array file per
+    process name and day under TRACE_DIR, which chrome://tracing, Perfetto
+    and speedscope open directly (the format allows the closing bracket to
+    be missing). The parent comes from a context variable, so spans nest
+    per asyncio task; each task gets its own track, forgotten with the task.
+    Spans filling the buffer on the event loop are written from a worker thread.
+    """
+
+    def __init__(self, name="collector", directory=TRACE_DIR, enabled=True):
+        self.name = name
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.events = []
+        self.task_tracks = WeakKeyDictionary()
+        self.thread_tracks = {}
+        self.track_ids = itertools.count(1)
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _track(self):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        tracks, key = (self.task_tracks, task) if task is not None else (self.thread_tracks, threading.get_ident())
+        if key not in tracks:
+            tracks[key] = next(self.track_ids)
+        return tracks[key]
+
+    @contextmanager
+    def span(self, name, category="", **args):
+        """Record the enclosed block as a span; yields the span's args dict to add results to"""
+        if not self.enabled:
+            yield args
+            return
+
+        span_id = next(_span_ids)
+        parent_id = _current_span.get()
+        token = _current_span.set(span_id)
+        ts = time()
+        start = perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            duration = perf_counter() - start
+            _current_span.reset(token)
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": int(ts * 1e6),
+                "dur": int(duration * 1e6),
+                "pid": self.pid,
+                "tid": self._track(),
+                "args": {"span_id": span_id, "parent_id": parent_id, **args}
+            })
+            if len(self.events) >= FLUSH_EVENTS:
+                self._flush_in_background()
+
+    def path(self, day=None):
+        return self.directory / f"{self.name}_{day or datetime.now().strftime('%Y-%m-%d')}.json"
+
+    def _flush_in_background(self):
+        """Hand buffered spans to a worker thread when on the event loop, else write them here"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        events, self.events = self.events, []
+        loop.run_in_executor(None, self._write, events)
+
+    def flush(self):
+        """Append buffered spans to today's trace file"""
+        events, self.events = self.events, []
+        self._write(events)
+
+    async def flush_async(self):
+        """flush() for the event loop: spans are taken here and written from a worker thread"""
+        events, self.events = self.events, []
+        await asyncio.to_thread(self._write, events)
+
+    def _write(self, events):
+        if not events:
+            return
+        with self._lock:
+            path = self.path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not path.exists()
+            with open(path, "a") as f:
+                if new_file:
+                    f.write("[\n")
+                    f.write(json.dumps({"name": "process_name", "ph": "M", "pid": self.pid,
+                                        "args": {"name": self.name}}) + ",\n")
+                f.writelines(json.dumps(event, default=str) + ",\n" for event in events)
+
+TRACER = Tracer(enabled=False)
+
+def configure_tracing(name, enabled=True, directory=TRACE_DIR):
+    """Name this process's trace file and switch tracing on or off"""
+    TRACER.flush()
+    TRACER.name = name
+    TRACER.enabled = enabled
+    TRACER.directory = Path(directory)
+    TRACER.pid = os.getpid()
+
+def span(name, category="", **args):
+    return TRACER.span(name, category, **args)
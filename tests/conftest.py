@@ -0,0 +1,9 @@
+import pytest
+from src.database.db import init_db
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database: DB_PATH is relative, so it resolves under `tmp_path`"""
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    return tmp_path
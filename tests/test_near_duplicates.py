@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from src.database import near_duplicates
+from src.database.db import connect
+from src.database.near_duplicates import (
+    LSH_BANDS, NUM_PERM, SIMILARITY, SPAM_CLUSTER_SIZE, NearDuplicateIndex,
+    band_buckets, normalize_text, signatures, spam_score
+)
+
+SPAM = "Claim your free airdrop tokens now, only 24 hours left before the snapshot closes"
+OTHER = "Quarterly earnings beat expectations while guidance for next year stays unchanged"
+
+def similarity(a, b):
+    return float((a == b).mean())
+
+def test_normalize_text_drops_links_and_mentions():
+    assert normalize_text("GM @alice!! See https://t.co/x1 $BTC #Crypto") == "gm see $btc #crypto"
+
+def test_signatures_are_deterministic():
+    texts = [normalize_text(text) for text in (SPAM, SPAM, SPAM + " today", OTHER)]
+    signed = signatures(texts)
+    assert signed.shape == (4, NUM_PERM) and signed.dtype == np.uint32
+    assert (signed == signatures(texts)).all()
+    assert (signed[0] == signed[1]).all()
+    assert similarity(signed[0], signed[2]) >= SIMILARITY
+    assert similarity(signed[0], signed[3]) < 0.2
+
+def test_signatures_in_chunks_match_one_at_a_time(monkeypatch):
+    texts = [normalize_text(f"{SPAM} number {n}") for n in range(20)]
+    whole = signatures(texts)
+    monkeypatch.setattr(near_duplicates, 'SIGNATURE_CHUNK', 100)  # A few texts per step
+    assert (signatures(texts) == whole).all()
+    assert (np.vstack([signatures([text]) for text in texts]) == whole).all()
+
+def test_band_buckets_match_only_on_equal_bands():
+    signed = signatures([normalize_text(text) for text in (SPAM, SPAM, OTHER)])
+    buckets = band_buckets(signed)
+    assert buckets.shape == (3, LSH_BANDS) and buckets.dtype == np.int64
+    assert (buckets[0] == buckets[1]).all()
+    assert not (buckets[0] == buckets[2]).any()
+    # A band's bucket depends on its position, not just its values
+    assert len(set(band_buckets(np.zeros((1, NUM_PERM), dtype=np.uint32))[0].tolist())) == LSH_BANDS
+
+def store(c, tweets):
+    c.executemany('''INSERT INTO tweets (id, author_username, text, created_at, collected_at)
+                     VALUES (?, 'author', ?, '2026-10-01T00:00:00', '2026-10-01T00:00:00')''', tweets)
+
+def clusters(c):
+    return dict(c.execute('SELECT id, cluster_id FROM tweets WHERE cluster_id IS NOT NULL'))
+
+def test_assign_clusters_copies_and_rescores_members(db):
+    index = NearDuplicateIndex()
+    with connect() as conn:
+        c = conn.cursor()
+        store(c, [('1', SPAM), ('2', OTHER)])
+        assert index.assign(c, [('1', SPAM), ('2', OTHER)]) == {'1': 0.0, '2': 0.0}
+        assert clusters(c) == {'1': '1', '2': '2'}
+
+        for n in range(2, SPAM_CLUSTER_SIZE + 3):
+            copy = (str(n + 1), f"@someone {SPAM} https://t.co/{n}")
+            store(c, [copy])
+            scores = index.assign(c, [copy])
+            assert scores == {copy[0]: spam_score(n)}
+            rows = c.execute("SELECT DISTINCT spam_score FROM tweets WHERE cluster_id = '1'").fetchall()
+            assert rows == [(spam_score(n),)]
+        conn.commit()
+
+        assert spam_score(SPAM_CLUSTER_SIZE + 1) == 1.0
+        size, score = c.execute("SELECT size, spam_score FROM tweet_clusters WHERE cluster_id = '1'").fetchone()
+        assert (size, score) == (SPAM_CLUSTER_SIZE + 2, 1.0)
+        assert index.cluster('1')['size'] == size
+        assert c.execute("SELECT spam_score FROM tweets WHERE id = '2'").fetchone() == (0.0,)
+
+def test_assign_skips_retweets_short_and_known_tweets(db):
+    index = NearDuplicateIndex()
+    with connect() as conn:
+        c = conn.cursor()
+        tweets = [('1', SPAM), ('2', f"RT @someone: {SPAM}"), ('3', "gm gm"), ('4', None)]
+        store(c, tweets)
+        assert index.assign(c, tweets) == {'1': 0.0}
+        assert clusters(c) == {'1': '1'}
+
+        # A tweet seen again is neither re-clustered nor counted twice
+        store(c, [('5', SPAM)])
+        assert index.assign(c, [('5', SPAM), ('5', SPAM)]) == {'5': spam_score(2)}
+        assert index.assign(c, [('5', SPAM), ('1', SPAM)]) == {'1': spam_score(2), '5': spam_score(2)}
+        assert c.execute("SELECT size FROM tweet_clusters WHERE cluster_id = '1'").fetchone() == (2,)
+
+def test_clustering_is_not_logged_as_changes(db):
+    index = NearDuplicateIndex()
+    with connect() as conn:
+        c = conn.cursor()
+        for n in range(4):
+            store(c, [(str(n), SPAM)])
+            index.assign(c, [(str(n), SPAM)])
+        conn.commit()
+        ops = c.execute("SELECT op, COUNT(*) FROM change_log WHERE table_name = 'tweets' GROUP BY op").fetchall()
+    assert ops == [('insert', 4)]
+
+def test_prune_stops_matching_quiet_clusters(db):
+    index = NearDuplicateIndex()
+    with connect() as conn:
+        c = conn.cursor()
+        store(c, [('1', SPAM), ('2', SPAM)])
+        index.assign(c, [('1', SPAM), ('2', SPAM)])
+        conn.commit()
+
+    assert index.prune(retention=-1) == 1  # Only '1' was indexed; '2' is a close copy
+    with connect() as conn:
+        c = conn.cursor()
+        assert c.execute('SELECT COUNT(*) FROM tweet_lsh_buckets').fetchone() == (0,)
+        assert c.execute('SELECT COUNT(*) FROM tweet_clusters').fetchone() == (0,)
+        store(c, [('3', SPAM)])
+        assert index.assign(c, [('3', SPAM)]) == {'3': 0.0}
+        assert clusters(c)['3'] == '3'
+    assert index.prune(retention=-1) == 1
+    assert index.prune() == 0
+
+@pytest.mark.parametrize('size, score', [(1, 0.0), (2, 1 / SPAM_CLUSTER_SIZE), (SPAM_CLUSTER_SIZE + 1, 1.0), (50, 1.0)])
+def test_spam_score_grows_with_cluster_size(size, score):
+    assert spam_score(size) == pytest.approx(score)
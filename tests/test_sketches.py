@@ -0,0 +1,58 @@
+import numpy as np
+from src.utils.sketches import WindowedCountMin, SpaceSaving
+
+def test_count_min_never_undercounts_and_updates_conservatively():
+    sketch = WindowedCountMin(2, width=16, depth=3)  # Narrow, so terms collide
+    plain = np.zeros((3, 16), dtype=np.int64)  # The same sketch with every row raised
+    rng = np.random.default_rng(7)
+    truth = {}
+    for term in (f"term{n}" for n in rng.zipf(1.5, 2000) % 200):
+        truth[term] = truth.get(term, 0) + 1
+        indexes = sketch.indexes(term)
+        sketch.add(0, indexes)
+        plain[sketch.rows, indexes] += 1
+
+    for term, count in truth.items():
+        indexes = sketch.indexes(term)
+        estimate = sketch.estimates(indexes)[0]
+        assert estimate >= count
+        assert estimate <= plain[sketch.rows, indexes].min()
+    assert (sketch.counts[0] <= plain).all()
+    assert sketch.counts[0].sum() < plain.sum()
+
+def test_count_min_windows_are_independent():
+    sketch = WindowedCountMin(3, width=64, depth=2)
+    indexes = sketch.indexes('btc')
+    assert sketch.add(1, indexes, count=5) == 5
+    assert sketch.add(1, indexes) == 6
+    sketch.add(2, indexes)
+    assert sketch.estimates(indexes).tolist() == [0, 6, 1]
+
+    sketch.clear(1)
+    assert sketch.estimates(indexes).tolist() == [0, 0, 1]
+    assert (sketch.indexes('btc') == indexes).all()
+
+def test_space_saving_evicts_the_least_counted():
+    top = SpaceSaving(2)
+    for item in 'aaab':
+        top.add(item)
+    top.add('c')
+    # 'c' takes the slot of 'b' and inherits its count as the error bound
+    assert top.top() == [('a', 3, 0), ('c', 2, 1)]
+
+    top.add('d', count=4)
+    assert top.top(1) == [('d', 6, 2)]
+    assert 'a' in top.counts and 'c' not in top.errors
+
+def test_space_saving_keeps_frequent_items():
+    top = SpaceSaving(10)
+    stream = [f"rare{n}" for n in range(500)]
+    stream[::4] = ['hot'] * len(stream[::4])  # More than n / k occurrences
+    for item in stream:
+        top.add(item)
+    item, count, error = top.top(1)[0]
+    assert item == 'hot'
+    assert count - error <= stream.count('hot') <= count
+
+    top.clear()
+    assert top.top() == []
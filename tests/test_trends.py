@@ -0,0 +1,68 @@
+import pytest
+from src.collectors.twitter import trends
+from src.collectors.twitter.constants import TREND_MIN_BASELINE, TREND_WINDOW
+from src.collectors.twitter.trends import TrendDetector
+
+START = 1_800_000_000 // TREND_WINDOW * TREND_WINDOW  # A window boundary
+
+class Collector:
+    collector_id = 'test'
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [float(START)]
+    monkeypatch.setattr(trends, 'time', lambda: now[0])
+    return now
+
+def mention(detector, text, count):
+    for _ in range(count):
+        detector.ids += 1
+        detector.observe(detector.ids, None, text)
+
+@pytest.fixture
+def detector(clock):
+    detector = TrendDetector(Collector())
+    detector.ids = 0
+    return detector
+
+def score(detector, term, clock):
+    return detector._score('cashtag', detector.sketches['cashtag'].indexes(term), clock[0])
+
+def test_score_waits_for_a_baseline(detector, clock):
+    for _ in range(TREND_MIN_BASELINE):
+        clock[0] += TREND_WINDOW
+        mention(detector, "$BTC", 4)
+    # At a window's start all of the previous window still counts
+    count, baseline, z = score(detector, 'BTC', clock)
+    assert count == 8 and baseline is None and z is None
+
+def test_score_slides_over_the_previous_window(detector, clock):
+    for _ in range(TREND_MIN_BASELINE + 2):
+        clock[0] += TREND_WINDOW
+        mention(detector, "$BTC", 4)
+    # Halfway into a quiet window: half the previous window still counts
+    clock[0] += TREND_WINDOW * 1.5
+    detector._advance(clock[0])
+    count, baseline, z = score(detector, 'BTC', clock)
+    assert count == pytest.approx(2.0)
+    # Every baseline window held 4; the deviation floor is sqrt(4)
+    assert baseline == pytest.approx(4.0)
+    assert z == pytest.approx(-1.0)
+
+def test_burst_is_flagged_once(detector, clock):
+    for _ in range(TREND_MIN_BASELINE + 2):
+        clock[0] += TREND_WINDOW
+        mention(detector, "gm $BTC", 4)
+    clock[0] += TREND_WINDOW
+    mention(detector, "$PEPE to the moon", 30)
+
+    count, baseline, z = score(detector, 'PEPE', clock)
+    assert (count, baseline) == (30, 0) and z == pytest.approx(30)
+    assert [event[:2] for event in detector.pending_events] == [('cashtag', 'PEPE')]
+    assert [entry['term'] for entry in detector.trends(1)['cashtag']] == ['PEPE']
+
+def test_old_and_repeated_tweets_are_not_counted(detector, clock):
+    mention(detector, "$BTC", 1)
+    detector.observe(detector.ids, None, "$BTC")
+    detector.observe('old', '2020-01-01T00:00:00+00:00', "$BTC")
+    assert score(detector, 'BTC', clock)[0] == 1